@@ -1,9 +1,61 @@
-from blog.models import Post, Tag, Comment
+from blog.cache import invalidate_everything
+from blog.models import PopularPost, Post, PostTag, Tag, Comment
+from blog.pagination import EstimatedCountPaginator
+from blog.ranking import rebuild_ranking
+from blog.signals import recount_tags
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+
+
+class ListDeferMixin:
+    """
+    Defers list_defer fields on the changelist only: the change form
+    shows them and would load every deferred field in its own query.
+    """
+
+    list_defer = ()
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        url_name = getattr(request.resolver_match, 'url_name', None) or ''
+        if url_name.endswith('_changelist'):
+            return queryset.defer(*self.list_defer)
+        return queryset
+
+
+class PostTagInline(admin.TabularInline):
+
+    model = PostTag
+    fields = ('tag',)
+    raw_id_fields = ('tag',)
+    extra = 1
+
+
+class EstimatedCountChangeList(ChangeList):
+
+    def get_results(self, request):
+        super().get_results(request)
+        # страница могла уточнить оценку и смениться на последнюю
+        self.result_count = self.paginator.count
+        self.multi_page = self.result_count > self.list_per_page
+        self.page_num = min(self.page_num, self.paginator.num_pages)
+
+
+class EstimatedCountMixin:
+    """
+    Changelist of a big table without COUNT(*) over it, the template
+    marks the amount of rows as estimated or capped.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return EstimatedCountChangeList
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(EstimatedCountMixin, ListDeferMixin, admin.ModelAdmin):
 
     readonly_fields = ('published_at',)
 
@@ -12,16 +64,41 @@ class PostAdmin(admin.ModelAdmin):
                     'image',
                     'author',
                     'published_at',
+                    'likes_count',
+                    'comments_count',
                     )
+    list_select_related = ('author',)
+    list_defer = ('text',)
+    list_filter = ('published_at',)
+    date_hierarchy = 'published_at'
+    actions = ['recount_counters']
 
-    raw_id_fields = ('likes', 'author', 'tags',)
+    raw_id_fields = ('likes', 'author',)
+    inlines = [PostTagInline]
 
     class Meta:
         ordering = ['-published_at']
 
+    def save_related(self, request, form, formsets, change):
+        # строки инлайна сохраняются без m2m_changed, счётчики тегов
+        # пересчитываются здесь
+        post = form.instance
+        tag_ids = set(post.tags.values_list('id', flat=True))
+        super().save_related(request, form, formsets, change)
+        tag_ids ^= set(post.tags.values_list('id', flat=True))
+        recount_tags(tag_ids, {post.pk}, sender=Post)
+
+    @admin.action(description='Пересчитать лайки и комментарии')
+    def recount_counters(self, request, queryset):
+        posts_amount = queryset.order_by().update_counters()
+        rebuild_ranking(PopularPost)
+        invalidate_everything()
+        self.message_user(request, f'Пересчитано постов: {posts_amount}')
+
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(EstimatedCountMixin, ListDeferMixin,
+                   admin.ModelAdmin):
 
     readonly_fields = ('published_at',)
 
@@ -30,6 +107,11 @@ class CommentAdmin(admin.ModelAdmin):
                     'text',
                     'post',
                     )
+    list_select_related = ('author', 'post')
+    # у поста в списке нужен только заголовок
+    list_defer = ('post__text', 'post__image_variants')
+    list_filter = ('published_at',)
+    date_hierarchy = 'published_at'
 
     raw_id_fields = ('author', 'post',)
 
@@ -37,10 +119,20 @@ class CommentAdmin(admin.ModelAdmin):
         ordering = ['published_at']
 
 
+@admin.register(Post.likes.through)
+class LikeAdmin(EstimatedCountMixin, ListDeferMixin, admin.ModelAdmin):
+
+    list_display = ('post', 'user')
+    list_select_related = ('post', 'user')
+    list_defer = ('post__text', 'post__image_variants')
+
+    raw_id_fields = ('post', 'user',)
+
+
 @admin.register(Tag)
-class CommentAdmin(admin.ModelAdmin):
+class TagAdmin(admin.ModelAdmin):
 
-    list_display = ('title', )
+    list_display = ('title', 'slug', 'posts_count')
 
     class Meta:
-        ordering = ["title"]
\ No newline at end of file
+        ordering = ["title"]
@@ -0,0 +1,221 @@
+from datetime import datetime, timezone
+
+from blog.cache import get_site_version
+from blog.cards import TEASER_LENGTH, get_post_tags
+from blog.images import serialize_image
+from blog.models import Comment, Post, Tag
+from blog.pagination import paginate_by_keyset
+from django.db.models.functions import Substr
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import condition, require_safe
+from marshmallow import Schema, fields
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class TagSchema(Schema):
+    title = fields.String()
+    slug = fields.String()
+    posts_with_tag = fields.Integer()
+
+
+class CommentSchema(Schema):
+    text = fields.String()
+    published_at = fields.DateTime()
+    author = fields.String(attribute='author__username')
+
+
+class PostSchema(Schema):
+    title = fields.String()
+    slug = fields.String()
+    teaser_text = fields.String()
+    text = fields.String()
+    author = fields.String(attribute='author__username')
+    published_at = fields.DateTime()
+    image_url = fields.Method('get_image_url')
+    image_srcset = fields.Method('get_image_srcset')
+    image_webp_srcset = fields.Method('get_image_webp_srcset')
+    likes_amount = fields.Integer(attribute='likes_count')
+    comments_amount = fields.Integer(attribute='comments_count')
+    tags = fields.List(fields.Nested(TagSchema))
+
+    def get_image_url(self, post):
+        if not post['image']:
+            return None
+        return Post._meta.get_field('image').storage.url(post['image'])
+
+    def get_image_srcset(self, post):
+        return serialize_image(post['image'],
+                               post['image_variants'])['image_srcset']
+
+    def get_image_webp_srcset(self, post):
+        return serialize_image(post['image'],
+                               post['image_variants'])['image_webp_srcset']
+
+
+# какие колонки нужны в SELECT для каждого поля ответа
+POST_COLUMNS = {
+    'title': ['title'],
+    'slug': ['slug'],
+    'teaser_text': ['teaser_text'],
+    'text': ['text'],
+    'author': ['author__username'],
+    'published_at': [],
+    'image_url': ['image'],
+    'image_srcset': ['image', 'image_variants'],
+    'image_webp_srcset': ['image', 'image_variants'],
+    'likes_amount': ['likes_count'],
+    'comments_amount': ['comments_count'],
+    'tags': [],
+}
+POST_LIST_FIELDS = [field for field in POST_COLUMNS if field != 'text']
+COMMENT_COLUMNS = {
+    'text': ['text'],
+    'published_at': [],
+    'author': ['author__username'],
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def get_fields(request, allowed, default):
+    """
+    Sparse fieldset from ?fields=title,slug.
+    """
+    if not request.GET.get('fields'):
+        return list(default)
+    requested = [field.strip() for field in request.GET['fields'].split(',')
+                 if field.strip()]
+    unknown = set(requested) - set(allowed)
+    if unknown:
+        raise BadRequest(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return requested
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def get_columns(selected_fields, columns):
+    """
+    Only the columns of requested fields plus keyset columns.
+    """
+    selected_columns = ['id', 'published_at']
+    for field in selected_fields:
+        selected_columns.extend(columns[field])
+    return list(dict.fromkeys(selected_columns))
+
+
+def get_post_rows(posts, selected_fields):
+    if 'teaser_text' in selected_fields:
+        posts = posts.annotate(
+            teaser_text=Substr('text', 1, TEASER_LENGTH))
+    return posts.values(*get_columns(selected_fields, POST_COLUMNS))
+
+
+def add_tags(rows, selected_fields):
+    if 'tags' in selected_fields and rows:
+        post_tags = get_post_tags([row['id'] for row in rows])
+        for row in rows:
+            row['tags'] = post_tags[row['id']]
+    return rows
+
+
+def get_next_url(request, next_cursor):
+    if next_cursor is None:
+        return None
+    query = request.GET.copy()
+    query['after'] = next_cursor
+    return f'{request.path}?{query.urlencode()}'
+
+
+def get_api_etag(request, *args, **kwargs):
+    return f'"{get_site_version():x}"'
+
+
+def get_api_last_modified(request, *args, **kwargs):
+    return datetime.fromtimestamp(get_site_version() // 1000, timezone.utc)
+
+
+def api_view(view):
+    """
+    Read-only JSON endpoint answering 304 while the site is unchanged.
+    """
+    @require_safe
+    @condition(etag_func=get_api_etag,
+               last_modified_func=get_api_last_modified)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return JsonResponse(view(request, *args, **kwargs))
+        except BadRequest as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        except Http404 as error:
+            return JsonResponse({'error': str(error)}, status=404)
+    return wrapper
+
+
+@api_view
+def posts_list(request):
+    selected_fields = get_fields(request, POST_COLUMNS, POST_LIST_FIELDS)
+    rows, next_cursor = paginate_by_keyset(
+        get_post_rows(Post.objects.all(), selected_fields),
+        request.GET.get('after'), get_limit(request))
+    add_tags(rows, selected_fields)
+    return {
+        'results': PostSchema(only=selected_fields, many=True).dump(rows),
+        'next': get_next_url(request, next_cursor),
+    }
+
+
+@api_view
+def post_detail(request, slug):
+    selected_fields = get_fields(request, POST_COLUMNS, POST_COLUMNS)
+    rows = list(get_post_rows(Post.objects.filter(slug=slug),
+                              selected_fields))
+    if not rows:
+        raise Http404('Такого поста нет')
+    add_tags(rows, selected_fields)
+    return PostSchema(only=selected_fields).dump(rows[0])
+
+
+@api_view
+def post_comments(request, slug):
+    selected_fields = get_fields(request, COMMENT_COLUMNS, COMMENT_COLUMNS)
+    comments = Comment.objects.filter(post__slug=slug). \
+        values(*get_columns(selected_fields, COMMENT_COLUMNS))
+    rows, next_cursor = paginate_by_keyset(
+        comments, request.GET.get('after'), get_limit(request),
+        descending=False)
+    if not rows and not Post.objects.filter(slug=slug).exists():
+        raise Http404('Такого поста нет')
+    return {
+        'results': CommentSchema(only=selected_fields, many=True).dump(rows),
+        'next': get_next_url(request, next_cursor),
+    }
+
+
+@api_view
+def tags_list(request):
+    """
+    Tags are ordered by unique title, so the title itself is the cursor.
+    """
+    limit = get_limit(request)
+    tags = Tag.objects.order_by('title')
+    if request.GET.get('after'):
+        tags = tags.filter(title__gt=request.GET['after'])
+    rows = list(tags.values('title', 'slug', 'posts_count')[:limit + 1])
+    next_cursor = rows[limit - 1]['title'] if len(rows) > limit else None
+    rows = [{'title': row['title'], 'slug': row['slug'],
+             'posts_with_tag': row['posts_count']}
+            for row in rows[:limit]]
+    return {
+        'results': TagSchema(many=True).dump(rows),
+        'next': get_next_url(request, next_cursor),
+    }
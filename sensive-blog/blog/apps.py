@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class BlogConfig(AppConfig):
     name = 'blog'
+
+    def ready(self):
+        from blog import (  # noqa: F401
+            cache, images, ranking, search, signals, sqlite, trending)
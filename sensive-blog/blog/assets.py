@@ -0,0 +1,249 @@
+import gzip
+import os
+import posixpath
+import re
+
+import brotli
+from django.conf import settings
+from django.contrib.staticfiles.finders import FileSystemFinder
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.template.utils import get_app_template_dirs
+
+STATIC_TAG = re.compile(r"""{%\s*static\s+['"]([^'"]+)['"]""")
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+CSS_IMPORT = re.compile(r"""@import\s+[^;]+;""")
+CSS_TOKENS = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/)""",
+                        re.DOTALL)
+CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+# шаблонная строка или строка, продолженная \ в конце строки файла
+JS_MULTILINE_STRING = re.compile(r'`|\\\r?$', re.MULTILINE)
+
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.svg', '.eot', '.ttf', '.json')
+
+
+def get_bundles():
+    """
+    {bundle name: [source static paths]} from settings.STATIC_BUNDLES.
+    """
+    return getattr(settings, 'STATIC_BUNDLES', {})
+
+
+def is_external(url):
+    return url.startswith(('data:', '#', '/', 'http:', 'https:'))
+
+
+def resolve_css_url(url, css_path):
+    """
+    Static path of a relative url() of the css file,
+    without its query string and fragment.
+    """
+    url = url.split('#')[0].split('?')[0]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(css_path), url))
+
+
+def get_template_dirs():
+    dirs = [directory for engine in settings.TEMPLATES
+            for directory in engine.get('DIRS', [])]
+    return [*dirs, *get_app_template_dirs('templates')]
+
+
+def template_dir_files(template_dir):
+    for root, _, files in os.walk(template_dir):
+        for file_name in files:
+            yield os.path.join(root, file_name)
+
+
+def find_template_assets():
+    """
+    Static paths in {% static %} tags of all project and app templates.
+    """
+    assets = set()
+    for template_dir in get_template_dirs():
+        for path in sorted(template_dir_files(template_dir)):
+            with open(path, encoding='utf-8', errors='ignore') as template:
+                assets.update(STATIC_TAG.findall(template.read()))
+    return assets
+
+
+def get_referenced_assets(find):
+    """
+    Assets used by templates and bundles plus fonts and images
+    their css files point to. find(path) returns the file path, or an
+    empty list as FileSystemFinder does when there is no such file.
+    """
+    pending = find_template_assets() | {
+        source for sources in get_bundles().values() for source in sources}
+    assets = set()
+    while pending:
+        asset = pending.pop()
+        if asset in assets:
+            continue
+        assets.add(asset)
+        path = find(asset)
+        if not path or not asset.endswith('.css'):
+            continue
+        with open(path, encoding='utf-8', errors='ignore') as css_file:
+            for _, url in CSS_URL.findall(css_file.read()):
+                if not is_external(url):
+                    pending.add(resolve_css_url(url, asset))
+    return assets
+
+
+class ReferencedFilesFinder(FileSystemFinder):
+    """
+    STATICFILES_DIRS finder which gives collectstatic only the files
+    templates and bundles use, not the whole vendored theme. Finding
+    single files works as usual, so runserver serves everything.
+    """
+
+    def list(self, ignore_patterns):
+        referenced = get_referenced_assets(self.find)
+        for path, storage in super().list(ignore_patterns):
+            if path.replace('\\', '/') in referenced:
+                yield path, storage
+
+
+def minify_css(css):
+    parts = []
+    for index, part in enumerate(CSS_TOKENS.split(css)):
+        if index % 2:
+            # строки остаются как есть, комментарии выбрасываются
+            if not part.startswith('/*'):
+                parts.append(part)
+            continue
+        part = CSS_PUNCTUATION.sub(r'\1', re.sub(r'\s+', ' ', part))
+        parts.append(part.replace(';}', '}'))
+    return ''.join(parts).strip()
+
+
+def minify_js(js):
+    """
+    Drops indentation and empty lines only: line breaks stay where
+    they are, so automatic semicolons keep working. A file with template
+    literals or strings continued by a backslash is left as it is,
+    its lines may be inside a string.
+    """
+    if JS_MULTILINE_STRING.search(js):
+        return js
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def is_minified(path):
+    return '.min.' in posixpath.basename(path)
+
+
+def rebase_css_urls(css, source, bundle_name):
+    """
+    Relative url() of the source rewritten for the bundle directory.
+    """
+    bundle_dir = posixpath.dirname(bundle_name) or '.'
+
+    def rebase(match):
+        quote, url = match.groups()
+        if is_external(url):
+            return match.group(0)
+        suffix = url[len(url.split('#')[0].split('?')[0]):]
+        path = resolve_css_url(url, source)
+        return f'url({quote}{posixpath.relpath(path, bundle_dir)}' \
+               f'{suffix}{quote})'
+
+    return CSS_URL.sub(rebase, css)
+
+
+def bundle_css(sources, bundle_name):
+    """
+    Concatenated css of (path, text) pairs. @import is valid only
+    at the start of a file, so all of them go to the top.
+    """
+    imports, bodies = [], []
+    for source, css in sources:
+        css = rebase_css_urls(css, source, bundle_name)
+        imports.extend(CSS_IMPORT.findall(css))
+        bodies.append(CSS_IMPORT.sub('', css))
+    return ''.join(imports) + '\n'.join(bodies)
+
+
+def bundle_js(sources, bundle_name):
+    # файл без ; в конце не должен склеиться со следующим
+    return ';\n'.join(js for _, js in sources)
+
+
+BUNDLERS = {'.css': bundle_css, '.js': bundle_js}
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+class AssetStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic storage which minifies css and js, concatenates
+    STATIC_BUNDLES, gives every file a content hash in its name
+    and puts .gz and .br copies next to the hashed files.
+    {% static %} finds hashed names in the manifest at render time.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = self.build_bundles(self.minify_files(paths))
+        yield from super().post_process(paths, dry_run, **options)
+        if not dry_run:
+            for hashed_name in set(self.hashed_files.values()):
+                self.compress(hashed_name)
+
+    def url_converter(self, name, hashed_files, template=None):
+        convert = super().url_converter(name, hashed_files, template)
+
+        def converter(match):
+            try:
+                return convert(match)
+            except ValueError:
+                # в теме есть ссылки на файлы, которых в ней нет
+                return match.group(0)
+
+        return converter
+
+    def replace(self, name, content):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(content))
+
+    def read_text(self, storage, path):
+        with storage.open(path) as source:
+            return source.read().decode('utf-8')
+
+    def minify_files(self, paths):
+        paths = dict(paths)
+        for name, (storage, path) in list(paths.items()):
+            minify = MINIFIERS.get(posixpath.splitext(name)[1])
+            if minify is None or is_minified(name):
+                continue
+            self.replace(name, minify(self.read_text(storage, path)).encode())
+            paths[name] = (self, name)
+        return paths
+
+    def build_bundles(self, paths):
+        for bundle_name, sources in get_bundles().items():
+            missing = [source for source in sources if source not in paths]
+            if missing:
+                raise ImproperlyConfigured(
+                    f'{bundle_name}: не найдены {", ".join(missing)}')
+            bundle = BUNDLERS[posixpath.splitext(bundle_name)[1]]
+            self.replace(bundle_name, bundle(
+                [(source, self.read_text(*paths[source]))
+                 for source in sources],
+                bundle_name).encode())
+            paths[bundle_name] = (self, bundle_name)
+        return paths
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSED_EXTENSIONS):
+            return
+        with self.open(name) as original:
+            content = original.read()
+        for suffix, compressed in (
+                ('.gz', gzip.compress(content, 9, mtime=0)),
+                ('.br', brotli.compress(content))):
+            # мелкие файлы сжатием только увеличиваются
+            if len(compressed) < len(content):
+                self.replace(f'{name}{suffix}', compressed)
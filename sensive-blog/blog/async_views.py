@@ -0,0 +1,93 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from blog.models import Post
+from blog.views import (get_comments_page, get_comments_url,
+                        get_next_page_url, get_page_cursor, get_page_posts,
+                        get_related_posts, get_sidebar_posts,
+                        get_sidebar_tags, get_tag, get_tag_cloud,
+                        get_tag_page_url, get_tag_posts,
+                        serialize_post_detail)
+from django.http import Http404
+from django.shortcuts import redirect, render
+
+
+async def fetch(func, *args):
+    """
+    Runs blocking ORM code in the thread of the request's sync middleware,
+    so QueryBudgetMiddleware, Server-Timing and the profiler see its
+    queries. Datasets of one page are loaded one after another there,
+    the event loop serves other requests meanwhile.
+    """
+    return await sync_to_async(func, thread_sensitive=True)(*args)
+
+
+def get_post(slug):
+    try:
+        return Post.objects.select_related('author').prefetch_tags(). \
+            get(slug=slug)
+    except Post.DoesNotExist:
+        raise Http404('Такого поста нет')
+
+
+async def index(request, page=1):
+    cursor = await fetch(get_page_cursor, request, page)
+    (page_posts, next_cursor), most_popular_posts, popular_tags = \
+        await asyncio.gather(
+            fetch(get_page_posts, cursor),
+            fetch(get_sidebar_posts),
+            fetch(get_sidebar_tags),
+        )
+
+    context = {
+        'most_popular_posts': most_popular_posts,
+        'page_posts': page_posts,
+        'popular_tags': popular_tags,
+        'page': page,
+        'next_page_url': get_next_page_url(page, next_cursor),
+    }
+    return await sync_to_async(render)(request, 'index.html', context)
+
+
+async def post_detail(request, slug):
+    post, (comments, next_cursor), related_posts, most_popular_posts, \
+        popular_tags = await asyncio.gather(
+            fetch(get_post, slug),
+            fetch(get_comments_page, slug),
+            fetch(get_related_posts, slug),
+            fetch(get_sidebar_posts),
+            fetch(get_sidebar_tags),
+        )
+
+    context = {
+        'post': serialize_post_detail(
+            post, comments, get_comments_url(slug, next_cursor)),
+        'related_posts': related_posts,
+        'popular_tags': popular_tags,
+        'most_popular_posts': most_popular_posts,
+    }
+    return await sync_to_async(render)(request, 'post-details.html', context)
+
+
+async def tag_filter(request, tag_slug):
+    tag, (posts, next_cursor), most_popular_posts, popular_tags, tag_cloud = \
+        await asyncio.gather(
+            fetch(get_tag, tag_slug),
+            fetch(get_tag_posts, tag_slug, request.GET.get('after')),
+            fetch(get_sidebar_posts),
+            fetch(get_sidebar_tags),
+            fetch(get_tag_cloud),
+        )
+    if tag.slug != tag_slug:
+        return redirect('tag_filter', tag_slug=tag.slug, permanent=True)
+
+    context = {
+        "tag": tag.title,
+        'tag_slug': tag.slug,
+        'popular_tags': popular_tags,
+        'tag_cloud': tag_cloud,
+        'posts': posts,
+        'most_popular_posts': most_popular_posts,
+        'next_page_url': get_tag_page_url(tag_slug, next_cursor),
+    }
+    return await sync_to_async(render)(request, 'posts-list.html', context)
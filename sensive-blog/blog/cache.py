@@ -0,0 +1,272 @@
+import time
+from datetime import timezone
+
+from blog.models import Comment, Post, Tag
+from blog.signals import counters_changed
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+POPULAR_POSTS_KEY = 'blog:sidebar:popular_posts'
+POPULAR_TAGS_KEY = 'blog:sidebar:popular_tags'
+TRENDING_POSTS_KEY = 'blog:sidebar:trending_posts'
+TAG_CLOUD_KEY = 'blog:tag_cloud'
+SITE_VERSION_KEY = 'blog:site_version'
+FEEDS_VERSION_KEY = 'blog:feeds_version'
+TAG_FEED_VERSION_KEY = 'blog:feeds_version:tag:{}'
+MONTH_FEED_VERSION_KEY = 'blog:feeds_version:month:{}-{}'
+
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 0.05
+
+
+def get_timeout():
+    return getattr(settings, 'SIDEBAR_CACHE_TIMEOUT', 300)
+
+
+def get_generation(key):
+    return cache.get(f'{key}:generation', 0)
+
+
+def drop(*keys):
+    """
+    Deletes cached values and moves their generations, so a build
+    started before the invalidation does not store its stale result.
+    """
+    for key in keys:
+        generation_key = f'{key}:generation'
+        cache.add(generation_key, 0, None)
+        try:
+            cache.incr(generation_key)
+        except ValueError:
+            # ключ успел вытесниться между add и incr
+            cache.set(generation_key, 1, None)
+    cache.delete_many(keys)
+
+
+def get_or_build(key, build, timeout=None):
+    """
+    Cached value of build() under key. The value is kept twice as long as
+    timeout: after timeout one caller takes the lock and rebuilds it while
+    the others keep serving the stale copy, so expiry causes no stampede.
+    """
+    timeout = timeout or get_timeout()
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None and entry['fresh_until'] > now:
+        return entry['value']
+
+    lock_key = f'{key}:lock'
+    is_locked = cache.add(lock_key, True, LOCK_TIMEOUT)
+    if not is_locked:
+        if entry is not None:
+            return entry['value']
+        # кто-то уже строит значение, ждём его вместо повторного запроса
+        deadline = now + LOCK_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(LOCK_WAIT)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry['value']
+    generation = get_generation(key)
+    try:
+        value = build()
+        # пока значение строилось, его могли сбросить — тогда оно уже старое
+        if get_generation(key) == generation:
+            cache.set(key, {'value': value,
+                            'fresh_until': time.time() + timeout},
+                      timeout * 2)
+    finally:
+        # чужую блокировку после истёкшего ожидания не снимаем
+        if is_locked:
+            cache.delete(lock_key)
+    return value
+
+
+def get_cached_value(key):
+    entry = cache.get(key)
+    return None if entry is None else entry['value']
+
+
+def invalidate_posts_block(key, post_ids=None):
+    """
+    Drop cached block of post cards. With post_ids given drop it only
+    when one of these posts is shown in the block.
+    """
+    if post_ids is not None:
+        # без значения в кеше его, возможно, сейчас строят — сбрасываем
+        cached_posts = get_cached_value(key)
+        if cached_posts is not None and \
+                not {post['id'] for post in cached_posts} & set(post_ids):
+            return
+    drop(key)
+
+
+def invalidate_popular_posts(post_ids=None):
+    invalidate_posts_block(POPULAR_POSTS_KEY, post_ids)
+
+
+def invalidate_trending_posts(post_ids=None):
+    invalidate_posts_block(TRENDING_POSTS_KEY, post_ids)
+
+
+def invalidate_popular_tags():
+    drop(POPULAR_TAGS_KEY, TAG_CLOUD_KEY)
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    previous_version = cache.get(key) or 0
+    version = max(int(time.time() * 1000), previous_version + 1)
+    cache.set(key, version, None)
+
+
+def get_site_version():
+    """
+    Millisecond timestamp of the last change of posts, comments, tags
+    or likes. Pages, ETags and Last-Modified are derived from it,
+    so it is read from cache without touching the DB.
+    """
+    return get_version(SITE_VERSION_KEY)
+
+
+def get_feeds_version():
+    """
+    Same timestamp for feeds and sitemaps, which show no likes
+    and comments, so it changes only with posts and tags.
+    """
+    return get_version(FEEDS_VERSION_KEY)
+
+
+@receiver(counters_changed)
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=Tag)
+def bump_site_version(sender, **kwargs):
+    bump_version(SITE_VERSION_KEY)
+
+
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=Tag)
+def bump_feeds_version(sender, **kwargs):
+    bump_version(FEEDS_VERSION_KEY)
+
+
+@receiver(counters_changed)
+def bump_feeds_version_on_tags(sender, tag_ids, **kwargs):
+    # теги поста есть в фидах, а лайки и комментарии нет
+    if tag_ids:
+        bump_version(FEEDS_VERSION_KEY)
+        bump_tag_feed_versions(tag_ids)
+
+
+def get_tag_feed_version(tag_id):
+    """
+    Timestamp of the last change of the tag feeds: posts of the tag
+    or titles of tags. New posts of other tags leave it as it is.
+    """
+    return get_version(TAG_FEED_VERSION_KEY.format(tag_id))
+
+
+def bump_tag_feed_versions(tag_ids):
+    for tag_id in tag_ids:
+        bump_version(TAG_FEED_VERSION_KEY.format(tag_id))
+
+
+@receiver(post_save, sender=Post)
+def bump_post_tag_feeds(sender, instance, created, raw=False, **kwargs):
+    # у нового поста тегов ещё нет, их привязку ловит counters_changed,
+    # как и удаление поста
+    if not created and not raw:
+        bump_tag_feed_versions(instance.tags.values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def bump_all_tag_feeds(sender, **kwargs):
+    # название тега видно у постов в фидах других тегов
+    bump_tag_feed_versions(Tag.objects.values_list('id', flat=True))
+
+
+def get_month_feed_version(year, month):
+    """
+    Timestamp of the last edit of posts published in the month, e.g.
+    of their slugs. New and deleted posts change the month sitemap
+    by themselves.
+    """
+    return get_version(MONTH_FEED_VERSION_KEY.format(year, month))
+
+
+def bump_month_feed_versions(months):
+    for month in months:
+        bump_version(MONTH_FEED_VERSION_KEY.format(month.year, month.month))
+
+
+@receiver(post_save, sender=Post)
+def bump_post_month_feed(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        bump_month_feed_versions(
+            [instance.published_at.astimezone(timezone.utc)])
+
+
+def bump_all_month_feeds():
+    bump_month_feed_versions(Post.objects.datetimes(
+        'published_at', 'month', tzinfo=timezone.utc))
+
+
+def invalidate_everything():
+    """
+    For bulk operations that bypass model signals.
+    """
+    invalidate_popular_posts()
+    invalidate_trending_posts()
+    invalidate_popular_tags()
+    bump_site_version(sender=None)
+    bump_feeds_version(sender=None)
+    bump_all_tag_feeds(sender=None)
+    bump_all_month_feeds()
+
+
+@receiver(counters_changed)
+def invalidate_sidebar(sender, post_ids, tag_ids, **kwargs):
+    if tag_ids:
+        # количества постов тегов видны и в облаке, и в карточках постов
+        invalidate_popular_tags()
+        invalidate_popular_posts()
+        invalidate_trending_posts()
+        return
+    # порядок тренда меняет только refresh_trending
+    invalidate_trending_posts(post_ids)
+    if sender is Comment:
+        # комментарии не меняют рейтинг, только числа в показанных карточках
+        invalidate_popular_posts(post_ids)
+    else:
+        invalidate_popular_posts()
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, created, **kwargs):
+    invalidate_popular_posts(None if created else {instance.pk})
+    invalidate_trending_posts(None if created else {instance.pk})
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_changed_tag(sender, **kwargs):
+    # название и адрес тега есть в облаке, топе тегов и карточках постов
+    invalidate_popular_tags()
+    invalidate_popular_posts()
+    invalidate_trending_posts()
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    invalidate_popular_posts({instance.pk})
+    invalidate_trending_posts({instance.pk})
@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+from blog.images import serialize_image
+from blog.models import Post
+from django.db.models.functions import Substr
+
+TEASER_LENGTH = 200
+
+
+def serialize_post(post, tags):
+    return {
+        "id": post['id'],
+        "title": post['title'],
+        "teaser_text": post['teaser_text'],
+        "author": post['author__username'],
+        "comments_amount": post['comments_count'],
+        **serialize_image(post['image'], post['image_variants']),
+        "published_at": post['published_at'],
+        "slug": post['slug'],
+        "tags": tags,
+        'first_tag_title': tags[0]['title'] if tags else None,
+        'first_tag_slug': tags[0]['slug'] if tags else None,
+        'likes_amount': post['likes_count'],
+    }
+
+
+def get_card_rows(posts):
+    return posts.annotate(teaser_text=Substr('text', 1, TEASER_LENGTH)). \
+        values('id', 'title', 'teaser_text', 'slug', 'image',
+               'image_variants', 'published_at', 'author__username',
+               'likes_count', 'comments_count')
+
+
+def get_post_tags(post_ids):
+    """
+    One query for tags of all posts, grouped by post in Python.
+    """
+    post_tags = defaultdict(list)
+    tag_rows = Post.tags.through.objects.filter(post_id__in=post_ids). \
+        order_by('tag__title'). \
+        values_list('post_id', 'tag__title', 'tag__slug', 'tag__posts_count')
+    for post_id, title, slug, posts_count in tag_rows:
+        post_tags[post_id].append({
+            'title': title,
+            'slug': slug,
+            'posts_with_tag': posts_count,
+        })
+    return post_tags
+
+
+def serialize_card_rows(rows):
+    post_tags = get_post_tags([row['id'] for row in rows])
+    return [serialize_post(row, post_tags[row['id']]) for row in rows]
+
+
+def load_post_cards(post_ids):
+    """
+    Cards of posts in the order of post_ids in two queries: post rows
+    with author and counters, and tags of all these posts at once.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return []
+    rows = get_card_rows(Post.objects.filter(id__in=post_ids).order_by())
+    rows = {row['id']: row for row in rows}
+    return serialize_card_rows(
+        [rows[post_id] for post_id in post_ids if post_id in rows])
+
+
+def load_queryset_cards(posts):
+    """
+    Same cards in the order of posts queryset, which may be sliced.
+    """
+    rows = list(get_card_rows(posts))
+    return serialize_card_rows(rows) if rows else []
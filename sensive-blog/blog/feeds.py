@@ -0,0 +1,316 @@
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape, quoteattr
+
+from blog.cache import (get_feeds_version, get_month_feed_version,
+                        get_tag_feed_version)
+from blog.cards import TEASER_LENGTH, get_post_tags
+from blog.models import Post, PostTag, Tag
+from django.db.models import Count, Max
+from django.db.models.functions import Substr, TruncMonth
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.views.decorators.http import condition, require_safe
+
+FEED_TITLE = 'Блог им. Юрия Григорьевича'
+FEED_DESCRIPTION = 'Советы по бизнесу, жизни и воспитанию детей'
+FEED_SIZE = 20
+# больше адресов в одном файле поисковики не читают
+SITEMAP_SIZE = 50000
+
+XML_HEADER = '<?xml version="1.0" encoding="utf-8"?>\n'
+SITEMAP_NAMESPACE = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def get_version_date(version):
+    return datetime.fromtimestamp(version // 1000, timezone.utc)
+
+
+def get_feeds_validator(request, *args, **kwargs):
+    version = get_feeds_version()
+    return f'"feeds-{version:x}"', get_version_date(version)
+
+
+def validated_by(get_validator):
+    """
+    Feed or sitemap answering 304 while get_validator(request, ...)
+    returns the same (ETag, Last-Modified) pair. (None, None) skips
+    the check, the view then answers 404 itself.
+    """
+    def get_cached(request, *args, **kwargs):
+        # condition() спрашивает ETag и Last-Modified по отдельности
+        if not hasattr(request, '_feed_validator'):
+            request._feed_validator = get_validator(request, *args, **kwargs)
+        return request._feed_validator
+
+    def decorator(view):
+        return require_safe(condition(
+            etag_func=lambda *args, **kwargs: get_cached(*args, **kwargs)[0],
+            last_modified_func=lambda *args, **kwargs:
+                get_cached(*args, **kwargs)[1])(view))
+
+    return decorator
+
+
+# до изменения постов или тегов повторные опросы читалок и поисковиков
+# не трогают ни базу, ни шаблоны
+feed_view = validated_by(get_feeds_validator)
+
+
+def stream_xml(chunks, content_type='application/xml'):
+    return StreamingHttpResponse(chunks,
+                                 content_type=f'{content_type}; charset=utf-8')
+
+
+def get_feed_posts(posts):
+    """
+    Latest posts as values() rows with their tags, two queries.
+    """
+    rows = list(
+        posts.order_by('-published_at', '-id').
+        annotate(teaser_text=Substr('text', 1, TEASER_LENGTH)).
+        values('id', 'title', 'slug', 'teaser_text', 'published_at',
+               'author__username')[:FEED_SIZE])
+    post_tags = get_post_tags([row['id'] for row in rows])
+    for row in rows:
+        row['tags'] = post_tags[row['id']]
+    return rows
+
+
+def get_post_url(request, slug):
+    return request.build_absolute_uri(
+        reverse('post_detail', kwargs={'slug': slug}))
+
+
+def render_rss(request, title, link, rows):
+    yield XML_HEADER
+    yield '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">' \
+          '<channel>'
+    yield f'<title>{escape(title)}</title><link>{escape(link)}</link>' \
+          f'<description>{escape(FEED_DESCRIPTION)}</description>' \
+          f'<atom:link href={quoteattr(request.build_absolute_uri())} ' \
+          f'rel="self"/>'
+    if rows:
+        yield f'<lastBuildDate>{rfc2822_date(rows[0]["published_at"])}' \
+              f'</lastBuildDate>'
+    for row in rows:
+        url = escape(get_post_url(request, row['slug']))
+        yield f'<item><title>{escape(row["title"])}</title>' \
+              f'<link>{url}</link><guid isPermaLink="true">{url}</guid>' \
+              f'<pubDate>{rfc2822_date(row["published_at"])}</pubDate>' \
+              f'<description>{escape(row["teaser_text"])}</description>'
+        for tag in row['tags']:
+            yield f'<category>{escape(tag["title"])}</category>'
+        yield '</item>'
+    yield '</channel></rss>'
+
+
+def render_atom(request, title, link, rows):
+    updated = rows[0]['published_at'] if rows else \
+        get_feed_last_modified(request)
+    yield XML_HEADER
+    yield '<feed xmlns="http://www.w3.org/2005/Atom">'
+    yield f'<title>{escape(title)}</title><id>{escape(link)}</id>' \
+          f'<link href={quoteattr(link)}/>' \
+          f'<link href={quoteattr(request.build_absolute_uri())} ' \
+          f'rel="self"/><updated>{rfc3339_date(updated)}</updated>' \
+          f'<subtitle>{escape(FEED_DESCRIPTION)}</subtitle>'
+    for row in rows:
+        url = get_post_url(request, row['slug'])
+        published_at = rfc3339_date(row['published_at'])
+        yield f'<entry><title>{escape(row["title"])}</title>' \
+              f'<link href={quoteattr(url)}/><id>{escape(url)}</id>' \
+              f'<published>{published_at}</published>' \
+              f'<updated>{published_at}</updated>' \
+              f'<author><name>{escape(row["author__username"])}</name>' \
+              f'</author><summary>{escape(row["teaser_text"])}</summary>'
+        for tag in row['tags']:
+            yield f'<category term={quoteattr(tag["title"])}/>'
+        yield '</entry>'
+    yield '</feed>'
+
+
+@feed_view
+def rss_feed(request):
+    return stream_xml(render_rss(
+        request, FEED_TITLE, request.build_absolute_uri(reverse('index')),
+        get_feed_posts(Post.objects.all())), 'application/rss+xml')
+
+
+@feed_view
+def atom_feed(request):
+    return stream_xml(render_atom(
+        request, FEED_TITLE, request.build_absolute_uri(reverse('index')),
+        get_feed_posts(Post.objects.all())), 'application/atom+xml')
+
+
+def get_feed_tag(request, tag_slug):
+    # тег нужен и для ETag, и самому фиду, читается один раз
+    if not hasattr(request, '_feed_tag'):
+        request._feed_tag = Tag.objects.only('title'). \
+            filter(slug=tag_slug).first()
+    return request._feed_tag
+
+
+def get_tag_feed_validator(request, tag_slug):
+    """
+    Version of the tag itself, so a new post of another tag keeps
+    this feed answering 304.
+    """
+    tag = get_feed_tag(request, tag_slug)
+    if tag is None:
+        return None, None
+    version = get_tag_feed_version(tag.id)
+    return f'"tag-feed-{tag.id}-{version:x}"', get_version_date(version)
+
+
+def get_tag_feed_args(request, tag_slug):
+    tag = get_feed_tag(request, tag_slug)
+    if tag is None:
+        raise Http404('Такого тега нет')
+    link = request.build_absolute_uri(
+        reverse('tag_filter', kwargs={'tag_slug': tag_slug}))
+    # последние посты тега идут по индексу PostTag без сортировки всех
+    tag_post_ids = PostTag.objects.filter(tag=tag). \
+        order_by('-published_at', '-post_id').values('post_id')[:FEED_SIZE]
+    return (request, f'{FEED_TITLE}: {tag.title}', link,
+            get_feed_posts(Post.objects.filter(id__in=tag_post_ids)))
+
+
+@validated_by(get_tag_feed_validator)
+def tag_rss_feed(request, tag_slug):
+    return stream_xml(render_rss(*get_tag_feed_args(request, tag_slug)),
+                      'application/rss+xml')
+
+
+@validated_by(get_tag_feed_validator)
+def tag_atom_feed(request, tag_slug):
+    return stream_xml(render_atom(*get_tag_feed_args(request, tag_slug)),
+                      'application/atom+xml')
+
+
+def render_urlset(request, urls):
+    """
+    urls are (path, lastmod or None) pairs.
+    """
+    yield XML_HEADER
+    yield f'<urlset xmlns="{SITEMAP_NAMESPACE}">'
+    for path, lastmod in urls:
+        yield f'<url><loc>{escape(request.build_absolute_uri(path))}</loc>'
+        if lastmod is not None:
+            yield f'<lastmod>{rfc3339_date(lastmod)}</lastmod>'
+        yield '</url>'
+    yield '</urlset>'
+
+
+def get_post_months():
+    """
+    (month, posts amount, last published_at) in one pass over
+    the (published_at, id) index.
+    """
+    return Post.objects.order_by(). \
+        annotate(month=TruncMonth('published_at', tzinfo=timezone.utc)). \
+        values('month'). \
+        annotate(amount=Count('id'), last_published_at=Max('published_at')). \
+        order_by('month'). \
+        values_list('month', 'amount', 'last_published_at')
+
+
+def get_sitemap_chunks():
+    yield reverse('sitemap_pages'), None
+    yield reverse('sitemap_tags'), None
+    for month, amount, last_published_at in get_post_months():
+        url = reverse('sitemap_posts', kwargs={'year': month.year,
+                                               'month': month.month})
+        yield url, last_published_at
+        for page in range(2, (amount - 1) // SITEMAP_SIZE + 2):
+            yield f'{url}?page={page}', last_published_at
+
+
+@feed_view
+def sitemap(request):
+    """
+    Sitemap index: pages, tags and posts by month of publication,
+    so crawlers refetch only months with new posts.
+    """
+    chunks = list(get_sitemap_chunks())
+
+    def render():
+        yield XML_HEADER
+        yield f'<sitemapindex xmlns="{SITEMAP_NAMESPACE}">'
+        for path, lastmod in chunks:
+            yield '<sitemap><loc>' \
+                  f'{escape(request.build_absolute_uri(path))}</loc>'
+            if lastmod is not None:
+                yield f'<lastmod>{rfc3339_date(lastmod)}</lastmod>'
+            yield '</sitemap>'
+        yield '</sitemapindex>'
+
+    return stream_xml(render())
+
+
+@feed_view
+def sitemap_pages(request):
+    return stream_xml(render_urlset(request, [
+        (reverse('index'), None), (reverse('contacts'), None)]))
+
+
+@feed_view
+def sitemap_tags(request):
+    urls = [
+        (reverse('tag_filter', kwargs={'tag_slug': slug}), None)
+        for slug in Tag.objects.order_by('slug').
+        values_list('slug', flat=True)
+    ]
+    return stream_xml(render_urlset(request, urls))
+
+
+def get_month_bounds(year, month):
+    try:
+        start = datetime(year, month, 1, tzinfo=timezone.utc)
+    except ValueError:
+        raise Http404('Неверный месяц')
+    if month == 12:
+        return start, start.replace(year=year + 1, month=1)
+    return start, start.replace(month=month + 1)
+
+
+def get_sitemap_page(request):
+    page = request.GET.get('page', '1')
+    if not page.isdigit() or int(page) < 1:
+        raise Http404('Неверный номер страницы')
+    return int(page)
+
+
+def get_month_validator(request, year, month):
+    """
+    Amount and last publication of the month's posts, one range over
+    the (published_at, id) index, and the version of their edits:
+    posts of other months keep this file answering 304.
+    """
+    start, end = get_month_bounds(year, month)
+    offset = (get_sitemap_page(request) - 1) * SITEMAP_SIZE
+    stats = Post.objects.filter(
+        published_at__gte=start, published_at__lt=end).aggregate(
+        amount=Count('id'), last_published_at=Max('published_at'))
+    if stats['amount'] <= offset:
+        return None, None
+    version = get_month_feed_version(year, month)
+    return f'"posts-{year}-{month}-{stats["amount"]}-{version:x}"', \
+        max(stats['last_published_at'], get_version_date(version))
+
+
+@validated_by(get_month_validator)
+def sitemap_posts(request, year, month):
+    start, end = get_month_bounds(year, month)
+    offset = (get_sitemap_page(request) - 1) * SITEMAP_SIZE
+    # адреса читаются до ответа, пока запрос ещё в синхронной части
+    rows = list(
+        Post.objects.filter(published_at__gte=start, published_at__lt=end).
+        order_by('published_at', 'id').
+        values_list('slug', 'published_at')[offset:offset + SITEMAP_SIZE])
+    if not rows:
+        raise Http404('За этот месяц постов нет')
+    return stream_xml(render_urlset(request, (
+        (reverse('post_detail', kwargs={'slug': slug}), published_at)
+        for slug, published_at in rows)))
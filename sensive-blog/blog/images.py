@@ -0,0 +1,226 @@
+import hashlib
+import io
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from blog.cache import (bump_site_version, invalidate_popular_posts,
+                        invalidate_trending_posts)
+from blog.models import Post
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+THUMBNAILS_DIR = 'thumbnails'
+# в имени уменьшенной копии есть хеш содержимого оригинала,
+# поэтому такой файл никогда не меняется и кешируется навсегда
+HASHED_NAME = re.compile(rf'^{THUMBNAILS_DIR}/[0-9a-f]{{16}}-\d+w\.\w+$')
+HASH_CHUNK_SIZE = 64 * 1024
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 82, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 80, 'method': 4},
+}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+_executor = None
+
+
+def get_thumbnail_widths():
+    return getattr(settings, 'THUMBNAIL_WIDTHS', [320, 640, 1024])
+
+
+def get_storage():
+    return Post._meta.get_field('image').storage
+
+
+def get_content_hash(image_file):
+    content_hash = hashlib.sha256()
+    for chunk in iter(lambda: image_file.read(HASH_CHUNK_SIZE), b''):
+        content_hash.update(chunk)
+    image_file.seek(0)
+    return content_hash.hexdigest()[:16]
+
+
+def to_rgb(image):
+    """
+    Palette and other modes resize badly or can't be saved as JPEG
+    and WebP, so the image is converted keeping its transparency.
+    """
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    has_alpha = image.mode in ('LA', 'PA') or \
+        'transparency' in image.info
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def get_fallback_format(image):
+    # прозрачность JPEG не сохранит
+    return 'PNG' if image.mode == 'RGBA' else 'JPEG'
+
+
+def save_variant(storage, image, name, image_format):
+    if storage.exists(name):
+        return name
+    content = io.BytesIO()
+    image.save(content, image_format, **SAVE_OPTIONS[image_format])
+    return storage.save(name, ContentFile(content.getvalue()))
+
+
+def make_variants(image_name):
+    """
+    Resizes the original to every configured width below its own
+    in the original format and in WebP. Runs in worker processes,
+    so it takes and returns plain values only.
+    """
+    storage = get_storage()
+    with storage.open(image_name) as image_file:
+        content_hash = get_content_hash(image_file)
+        with Image.open(image_file) as original:
+            original = to_rgb(ImageOps.exif_transpose(original))
+    image_formats = [get_fallback_format(original)]
+    if features.check('webp'):
+        image_formats.append('WEBP')
+
+    variants = []
+    for width in sorted(set(get_thumbnail_widths())):
+        if width >= original.width:
+            continue
+        height = round(original.height * width / original.width)
+        resized = original.resize((width, height), Image.LANCZOS)
+        for image_format in image_formats:
+            name = f'{THUMBNAILS_DIR}/{content_hash}-{width}w.' \
+                   f'{EXTENSIONS[image_format]}'
+            variants.append({
+                'name': save_variant(storage, resized, name, image_format),
+                'width': width,
+                'height': height,
+                'format': image_format.lower(),
+            })
+    return {
+        'source': image_name,
+        'width': original.width,
+        'height': original.height,
+        'variants': variants,
+    }
+
+
+def save_image_variants(post_id, image_variants):
+    # пока копии строились, картинку поста могли заменить
+    updated = Post.objects.filter(
+        id=post_id, image=image_variants['source']). \
+        update(image_variants=image_variants)
+    if updated:
+        # update() не шлёт сигналов, а карточки в кеше уже без srcset
+        invalidate_popular_posts({post_id})
+        invalidate_trending_posts({post_id})
+        bump_site_version(sender=Post)
+
+
+def build_image_variants(posts, workers=None):
+    """
+    Builds variants of (post_id, image_name) pairs in a process pool
+    and stores them. Yields post ids with the error if any.
+    """
+    posts = list(posts)
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [(post_id, executor.submit(make_variants, image_name))
+                   for post_id, image_name in posts]
+        for post_id, future in futures:
+            try:
+                save_image_variants(post_id, future.result())
+            except Exception as error:
+                yield post_id, error
+            else:
+                yield post_id, None
+
+
+def needs_variants(image_name, image_variants):
+    return bool(image_name) and \
+        (image_variants or {}).get('source') != image_name
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            getattr(settings, 'THUMBNAIL_WORKERS', 2))
+    return _executor
+
+
+def store_built_variants(post_id, future):
+    # колбэк выполняется в служебном потоке пула со своим подключением к БД
+    try:
+        save_image_variants(post_id, future.result())
+    except Exception:
+        logger.exception('Не удалось построить копии картинки поста %s',
+                         post_id)
+    finally:
+        close_old_connections()
+
+
+@receiver(post_save, sender=Post)
+def build_uploaded_image_variants(sender, instance, raw=False, **kwargs):
+    """
+    A new or replaced image gets its variants in the background,
+    the page shows the original until they are ready.
+    """
+    if raw or not needs_variants(instance.image.name,
+                                 instance.image_variants):
+        return
+    post_id, image_name = instance.id, instance.image.name
+
+    def build():
+        if not getattr(settings, 'THUMBNAIL_WORKERS', 2):
+            save_image_variants(post_id, make_variants(image_name))
+            return
+        future = get_executor().submit(make_variants, image_name)
+        future.add_done_callback(
+            lambda done: store_built_variants(post_id, done))
+
+    # картинка и пост должны быть видны воркеру и колбэку
+    transaction.on_commit(build)
+
+
+def get_srcset(image_variants, webp):
+    storage = get_storage()
+    return ', '.join(
+        f'{storage.url(variant["name"])} {variant["width"]}w'
+        for variant in image_variants.get('variants', [])
+        if (variant['format'] == 'webp') == webp)
+
+
+def serialize_image(image_name, image_variants):
+    """
+    Urls for <img srcset> and <source type="image/webp"> from the stored
+    variants, without touching the files.
+    """
+    if not image_name:
+        return {
+            'image_url': None,
+            'image_srcset': '',
+            'image_webp_srcset': '',
+            'image_width': None,
+            'image_height': None,
+        }
+    image_url = get_storage().url(image_name)
+    if not image_variants or image_variants.get('source') != image_name:
+        # копии ещё не построены или остались от прежней картинки
+        image_variants = {}
+    srcset = get_srcset(image_variants, webp=False)
+    if srcset:
+        srcset += f', {image_url} {image_variants["width"]}w'
+    return {
+        'image_url': image_url,
+        'image_srcset': srcset,
+        'image_webp_srcset': get_srcset(image_variants, webp=True),
+        'image_width': image_variants.get('width'),
+        'image_height': image_variants.get('height'),
+    }
@@ -0,0 +1,181 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from blog.models import Post
+from blog.signals import counters_changed
+from blog.trending import add_activity
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def get_flush_interval():
+    return getattr(settings, 'LIKES_FLUSH_INTERVAL', 1.0)
+
+
+def get_batch_size():
+    return getattr(settings, 'LIKES_BATCH_SIZE', 500)
+
+
+def group_by_delta(deltas):
+    post_ids_by_delta = defaultdict(list)
+    for post_id, delta in deltas.items():
+        if delta:
+            post_ids_by_delta[delta].append(post_id)
+    return post_ids_by_delta
+
+
+def drop_deleted(likes):
+    """
+    Leaves the likes whose post and user still exist: they may have been
+    deleted while the likes waited in the buffer, and one such like
+    would fail the whole INSERT with an IntegrityError.
+    """
+    post_ids = set(Post.objects.filter(
+        id__in={post_id for post_id, _ in likes}).values_list('id', flat=True))
+    user_ids = set(get_user_model().objects.filter(
+        id__in={user_id for _, user_id in likes}).values_list('id', flat=True))
+    kept = {(post_id, user_id): liked
+            for (post_id, user_id), liked in likes.items()
+            if post_id in post_ids and user_id in user_ids}
+    if len(kept) < len(likes):
+        logger.warning('Пропущено лайков удалённых постов или '
+                       'пользователей: %s', len(likes) - len(kept))
+    return kept
+
+
+def save_likes(likes):
+    """
+    Applies {(post_id, user_id): liked} to the through table:
+    one SELECT of the current rows, two checking posts and users of
+    the new likes, one bulk INSERT, one DELETE and
+    one UPDATE recounting likes_count of the changed posts.
+    Liking a liked post or unliking a not liked one changes nothing,
+    likes of deleted posts and users are dropped.
+    Returns changes of likes amount by post id.
+    """
+    PostLike = Post.likes.through
+    post_ids = {post_id for post_id, _ in likes}
+    user_ids = {user_id for _, user_id in likes}
+
+    with transaction.atomic():
+        existing = {
+            (post_id, user_id): like_id
+            for like_id, post_id, user_id in PostLike.objects.filter(
+                post_id__in=post_ids, user_id__in=user_ids).
+            values_list('id', 'post_id', 'user_id')
+        }
+        added = [pair for pair, liked in likes.items()
+                 if liked and pair not in existing]
+        if added:
+            # снятым лайкам удалённых постов и так нечего удалять
+            added = list(drop_deleted(dict.fromkeys(added, True)))
+        removed = [pair for pair, liked in likes.items()
+                   if not liked and pair in existing]
+
+        PostLike.objects.bulk_create(
+            [PostLike(post_id=post_id, user_id=user_id)
+             for post_id, user_id in added],
+            ignore_conflicts=True)
+        if removed:
+            PostLike.objects.filter(
+                id__in=[existing[pair] for pair in removed]).delete()
+
+        # ignore_conflicts молча пропускает лайки, которые уже вставил
+        # параллельный запрос, поэтому счётчик пересчитывается по таблице
+        changed_posts = Post.objects.filter(
+            id__in={post_id for post_id, _ in [*added, *removed]})
+        old_counts = dict(changed_posts.values_list('id', 'likes_count'))
+        changed_posts.update_likes_count()
+        deltas = {
+            post_id: likes_count - old_counts[post_id]
+            for post_id, likes_count in changed_posts.values_list(
+                'id', 'likes_count')
+        }
+        for delta, changed_post_ids in group_by_delta(deltas).items():
+            add_activity(changed_post_ids, likes=delta)
+
+    changed_post_ids = {post_id for post_id, delta in deltas.items() if delta}
+    if changed_post_ids:
+        counters_changed.send(sender=Post, post_ids=changed_post_ids,
+                              tag_ids=set())
+    return deltas
+
+
+class LikeBuffer:
+    """
+    Likes and unlikes of this process waiting to be written. Repeated
+    clicks on the same post by the same user collapse into the last one.
+    A background thread writes them every LIKES_FLUSH_INTERVAL seconds
+    or as soon as LIKES_BATCH_SIZE of them are waiting, and the rest
+    is written when the process exits.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def add(self, post_id, user_id, liked):
+        if not get_flush_interval():
+            save_likes({(post_id, user_id): liked})
+            return
+        with self.lock:
+            self.pending[(post_id, user_id)] = liked
+            is_full = len(self.pending) >= get_batch_size()
+            self.start()
+        if is_full:
+            self.wakeup.set()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True,
+                                           name='like-buffer')
+            self.thread.start()
+            atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            self.wakeup.wait(get_flush_interval())
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось записать лайки')
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        # flush_lock не даёт потоку и atexit писать одни лайки дважды
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+            batch_size = get_batch_size()
+            items = list(pending.items())
+            for start in range(0, len(items), batch_size):
+                try:
+                    save_likes(dict(items[start:start + batch_size]))
+                except OperationalError:
+                    # например, база занята: запишутся в следующий раз
+                    self.restore(items[start:])
+                    raise
+                except Exception:
+                    # повтор упадёт так же и застопорит все лайки после
+                    logger.exception('Отброшено лайков: %s',
+                                     len(items[start:start + batch_size]))
+        return len(pending)
+
+    def restore(self, items):
+        # более поздний клик по тому же посту важнее неудачно записанного
+        with self.lock:
+            for pair, liked in items:
+                self.pending.setdefault(pair, liked)
+
+
+like_buffer = LikeBuffer()
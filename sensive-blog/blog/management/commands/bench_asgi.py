@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from blog.management.commands.bench_views import (get_bench_urls,
+                                                  get_percentile)
+from blog.management.commands.check_query_plans import CHECK_SETTINGS
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+PAGE_VIEWS = ('index', 'post_detail', 'tag_filter')
+
+
+def get_request_urls(requests_amount):
+    urls_by_view = get_bench_urls(20)
+    urls = [url for view_name in PAGE_VIEWS for url in urls_by_view[view_name]]
+    return [random.choice(urls) for _ in range(requests_amount)]
+
+
+def run_wsgi(urls, concurrency):
+    def request(url):
+        started_at = time.perf_counter()
+        response = Client().get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url} ответил {response.status_code}')
+        return time.perf_counter() - started_at
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(request, urls))
+
+
+def run_asgi(urls, concurrency):
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def request(url):
+            async with semaphore:
+                started_at = time.perf_counter()
+                response = await client.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} ответил {response.status_code}')
+                return time.perf_counter() - started_at
+
+        return await asyncio.gather(*(request(url) for url in urls))
+
+    return asyncio.run(run())
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность и хвосты задержек ' \
+           'синхронных вьюх под WSGI и асинхронных под ASGI ' \
+           'при параллельных запросах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--warm-cache', action='store_true')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Куда сохранить результат в JSON')
+        parser.add_argument('--mode', choices=['wsgi', 'asgi'],
+                            help='Прогнать только один режим в этом процессе')
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            result = self.bench_mode(options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        # urls.py выбирает вьюхи при импорте, поэтому каждый режим
+        # меряется в отдельном процессе
+        report = {}
+        for mode in ('wsgi', 'asgi'):
+            report[mode] = self.run_mode_process(mode, options)
+            self.stdout.write(f'{mode}: {report[mode]}')
+        speedup = report['asgi']['rps'] / max(report['wsgi']['rps'], 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'ASGI/WSGI по пропускной способности: {speedup:.2f}x'))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+    def run_mode_process(self, mode, options):
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'),
+            'bench_asgi', '--mode', mode,
+            '--requests', str(options['requests']),
+            '--concurrency', str(options['concurrency']),
+            '--seed', str(options['seed']),
+        ]
+        if options['warm_cache']:
+            command.append('--warm-cache')
+        env = dict(os.environ, ASYNC_VIEWS='true' if mode == 'asgi' else '',
+                   DJANGO_SETTINGS_MODULE=os.environ.get(
+                       'DJANGO_SETTINGS_MODULE', 'sensive_blog.settings'))
+        completed = subprocess.run(command, env=env, capture_output=True,
+                                   text=True)
+        if completed.returncode:
+            raise CommandError(f'{mode}: {completed.stderr}')
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def bench_mode(self, options):
+        random.seed(options['seed'])
+        bench_settings = dict(CHECK_SETTINGS)
+        if options['warm_cache']:
+            bench_settings.pop('CACHES')
+        run = run_asgi if options['mode'] == 'asgi' else run_wsgi
+
+        with override_settings(**bench_settings):
+            urls = get_request_urls(options['requests'])
+            run(urls[:options['concurrency']], options['concurrency'])
+            started_at = time.perf_counter()
+            durations = run(urls, options['concurrency'])
+            total_duration = time.perf_counter() - started_at
+
+        durations = [duration * 1000 for duration in durations]
+        return {
+            'requests': len(durations),
+            'concurrency': options['concurrency'],
+            'rps': round(len(durations) / total_duration, 1),
+            'p50_ms': round(get_percentile(durations, 50), 2),
+            'p95_ms': round(get_percentile(durations, 95), 2),
+            'p99_ms': round(get_percentile(durations, 99), 2),
+        }
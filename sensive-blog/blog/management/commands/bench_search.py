@@ -0,0 +1,136 @@
+import json
+import random
+import re
+import time
+
+from blog.management.commands.bench_views import get_percentile
+from blog.models import Post, Tag
+from blog.search import (SEARCH_TABLE, is_search_supported,
+                         rebuild_search_index, search_posts)
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Min, Q
+
+RECOMMENDED_POSTS = 100000
+
+
+def get_sample_words(samples_amount):
+    """
+    Distinct words of random posts: the queries hit what is really
+    in the index, from words of almost every post to rare ones.
+    """
+    id_range = Post.objects.aggregate(Min('id'), Max('id'))
+    if id_range['id__min'] is None:
+        return []
+    post_ids = [random.randint(id_range['id__min'], id_range['id__max'])
+                for _ in range(samples_amount)]
+    words = set()
+    for title, text in Post.objects.filter(id__in=post_ids). \
+            values_list('title', 'text'):
+        words.update(word for word in re.findall(r'\w+', f'{title} {text}')
+                     if len(word) > 2)
+    return sorted(words)
+
+
+def get_timings(run, queries):
+    durations = []
+    found = 0
+    for query in queries:
+        started_at = time.perf_counter()
+        found += run(query)
+        durations.append((time.perf_counter() - started_at) * 1000)
+    return {
+        'queries': len(queries),
+        'p50_ms': round(get_percentile(durations, 50), 2),
+        'p95_ms': round(get_percentile(durations, 95), 2),
+        'p99_ms': round(get_percentile(durations, 99), 2),
+        'found_per_query': round(found / len(queries), 2),
+    }
+
+
+def search_with_like(query):
+    return len(Post.objects.filter(
+        Q(title__icontains=query) | Q(text__icontains=query)).
+        order_by('-published_at').values_list('id', flat=True)[:6])
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк полнотекстового поиска: время построения индекса ' \
+           'FTS5 и перцентили времени поиска по словам и тегам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=50,
+                            help='Запросов каждого вида')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--skip-rebuild', action='store_true',
+                            help='Не перестраивать индекс')
+        parser.add_argument('--compare-like', type=int, default=0,
+                            metavar='QUERIES',
+                            help='Сравнить с icontains на стольких запросах')
+        parser.add_argument('--output', help='Куда сохранить результат в JSON')
+
+    def handle(self, *args, **options):
+        if not is_search_supported():
+            raise CommandError('Поиск работает только на SQLite с FTS5')
+        random.seed(options['seed'])
+        posts_amount = Post.objects.count()
+        if posts_amount < RECOMMENDED_POSTS:
+            self.stderr.write(
+                f'В базе {posts_amount} постов, для сравнимых цифр нужно '
+                f'{RECOMMENDED_POSTS}: python manage.py generate_fake_data '
+                f'--posts {RECOMMENDED_POSTS}')
+
+        report = {'posts': posts_amount}
+        if not options['skip_rebuild']:
+            started_at = time.perf_counter()
+            with transaction.atomic():
+                rebuild_search_index()
+            report['index_build_s'] = round(
+                time.perf_counter() - started_at, 2)
+            self.stdout.write(f'Индекс построен за {report["index_build_s"]} с')
+
+        words = get_sample_words(options['queries'])
+        if not words:
+            raise CommandError('Нет постов для поиска')
+        queries_amount = options['queries']
+        tag_titles = list(Tag.objects.popular().
+                          values_list('title', flat=True)[:5])
+
+        cases = {
+            'one_word': (
+                lambda query: len(search_posts(query)[0]),
+                random.choices(words, k=queries_amount)),
+            'two_words': (
+                lambda query: len(search_posts(query)[0]),
+                [' '.join(random.choices(words, k=2))
+                 for _ in range(queries_amount)]),
+            'one_word_deep_page': (
+                lambda query: len(search_posts(query, page=20)[0]),
+                random.choices(words, k=queries_amount)),
+        }
+        if tag_titles:
+            cases['one_word_with_tag'] = (
+                lambda query: len(search_posts(
+                    query, [random.choice(tag_titles)])[0]),
+                random.choices(words, k=queries_amount))
+        if options['compare_like']:
+            cases['icontains'] = (
+                search_with_like,
+                random.choices(words, k=options['compare_like']))
+
+        report['search'] = {}
+        for case_name, (run, queries) in cases.items():
+            report['search'][case_name] = get_timings(run, queries)
+            self.stdout.write(f'{case_name}: {report["search"][case_name]}')
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE}_docsize')
+            report['indexed_posts'] = cursor.fetchone()[0]
+        if report['indexed_posts'] != posts_amount:
+            self.stderr.write(
+                f'В индексе {report["indexed_posts"]} постов из '
+                f'{posts_amount}, перестройте его')
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
@@ -0,0 +1,177 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from blog.likes import save_likes
+from blog.management.commands.bench_asgi import get_request_urls
+from blog.management.commands.bench_views import get_percentile
+from blog.models import Post
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import Client
+from django.test.utils import override_settings
+
+PROFILES = ['sensive_blog.settings', 'sensive_blog.settings_production']
+
+
+def request_pages(urls, concurrency):
+    """
+    Every thread has its own client and connection to the database
+    and opens urls one by one, like worker threads of a server do.
+    Locked database errors are counted, not raised.
+    """
+    local = threading.local()
+
+    def request(url):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        started_at = time.perf_counter()
+        try:
+            response = local.client.get(url)
+        except OperationalError:
+            return None
+        if response.status_code != 200:
+            raise CommandError(f'{url} ответил {response.status_code}')
+        return time.perf_counter() - started_at
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(request, urls))
+
+
+def write_likes(stop, post_ids, user_ids, written):
+    """
+    Likes and unlikes random posts while pages are read, as the like
+    buffer does, so the journal mode of the database matters.
+    """
+    try:
+        while not stop.is_set():
+            try:
+                save_likes({
+                    (random.choice(post_ids), random.choice(user_ids)):
+                    random.random() < 0.5,
+                })
+                written.append(1)
+            except OperationalError:
+                pass
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность вьюх с разными модулями ' \
+           'настроек, по умолчанию текущими и продакшен-профилем, ' \
+           'при параллельном чтении и записи лайков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', default=PROFILES,
+                            metavar='SETTINGS_MODULE')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=1,
+                            help='Потоков, пишущих лайки во время чтения')
+        parser.add_argument('--warm-cache', action='store_true')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Куда сохранить результат в JSON')
+        parser.add_argument('--single', action='store_true',
+                            help='Прогнать только настройки этого процесса')
+
+    def handle(self, *args, **options):
+        if options['single']:
+            self.stdout.write(json.dumps(self.bench_profile(options)))
+            return
+
+        # настройки читаются при старте, поэтому каждый профиль
+        # меряется в отдельном процессе
+        report = {}
+        for profile in options['profiles']:
+            report[profile] = self.run_profile_process(profile, options)
+            self.stdout.write(f'{profile}: {report[profile]}')
+        baseline, *others = options['profiles']
+        for profile in others:
+            speedup = report[profile]['rps'] / \
+                max(report[baseline]['rps'], 1e-6)
+            self.stdout.write(self.style.SUCCESS(
+                f'{profile}/{baseline} по пропускной способности: '
+                f'{speedup:.2f}x'))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+    def run_profile_process(self, profile, options):
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'),
+            'bench_settings', '--single', '--settings', profile,
+            '--requests', str(options['requests']),
+            '--concurrency', str(options['concurrency']),
+            '--writers', str(options['writers']),
+            '--seed', str(options['seed']),
+        ]
+        if options['warm_cache']:
+            command.append('--warm-cache')
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=profile)
+        completed = subprocess.run(command, env=env, capture_output=True,
+                                   text=True)
+        if completed.returncode:
+            raise CommandError(f'{profile}: {completed.stderr}')
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def bench_profile(self, options):
+        random.seed(options['seed'])
+        # DEBUG, приложения и шаблоны остаются как в профиле
+        bench_settings = {'ALLOWED_HOSTS': ['*']}
+        if not options['warm_cache']:
+            bench_settings['CACHES'] = {'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        if 'journal_mode' not in getattr(settings, 'SQLITE_PRAGMAS', {}):
+            # WAL запоминается в файле базы после прогона другого профиля
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode = delete')
+        post_ids = list(Post.objects.values_list('id', flat=True)[:1000])
+        user_ids = list(User.objects.values_list('id', flat=True)[:1000])
+        if not post_ids or not user_ids:
+            raise CommandError('Нет постов или пользователей')
+
+        with override_settings(**bench_settings):
+            urls = get_request_urls(options['requests'])
+            request_pages(urls[:options['concurrency']],
+                          options['concurrency'])
+            stop = threading.Event()
+            written = []
+            writers = [
+                threading.Thread(target=write_likes,
+                                 args=(stop, post_ids, user_ids, written))
+                for _ in range(options['writers'])
+            ]
+            for writer in writers:
+                writer.start()
+            started_at = time.perf_counter()
+            durations = request_pages(urls, options['concurrency'])
+            total_duration = time.perf_counter() - started_at
+            stop.set()
+            for writer in writers:
+                writer.join()
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        succeeded = [duration * 1000 for duration in durations
+                     if duration is not None]
+        return {
+            'debug': settings.DEBUG,
+            'journal_mode': journal_mode,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'requests': len(durations),
+            'locked_errors': len(durations) - len(succeeded),
+            'likes_written': len(written),
+            'rps': round(len(succeeded) / total_duration, 1),
+            'p50_ms': round(get_percentile(succeeded, 50), 2),
+            'p95_ms': round(get_percentile(succeeded, 95), 2),
+            'p99_ms': round(get_percentile(succeeded, 99), 2),
+        }
@@ -0,0 +1,171 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from blog.management.commands.check_query_plans import CHECK_SETTINGS
+from blog.models import Post, Tag
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+
+def get_percentile(durations, percent):
+    ordered = sorted(durations)
+    index = min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def get_bench_urls(samples_amount):
+    """
+    Urls per view. Posts and tags are picked by popularity,
+    like real visitors do, but never all the same page.
+    """
+    post_slugs = list(Post.objects.order_by('-likes_count').
+                      values_list('slug', flat=True)[:samples_amount * 5])
+    tag_slugs = list(Tag.objects.popular().
+                     values_list('slug', flat=True)[:samples_amount])
+    return {
+        'index': [reverse('index')],
+        'post_detail': [reverse('post_detail', kwargs={'slug': slug})
+                        for slug in post_slugs],
+        'tag_filter': [reverse('tag_filter', kwargs={'tag_slug': slug})
+                       for slug in tag_slugs],
+        'contacts': [reverse('contacts')],
+    }
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, cwd=settings.BASE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def bench_view(client, urls, requests_amount, memory_requests):
+    durations = []
+    queries = []
+    for _ in range(requests_amount):
+        url = random.choice(urls)
+        counter = QueryCounter()
+        started_at = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = client.get(url)
+        durations.append((time.perf_counter() - started_at) * 1000)
+        queries.append(counter.count)
+        if response.status_code != 200:
+            raise CommandError(f'{url} ответил {response.status_code}')
+
+    # tracemalloc замедляет код, поэтому память меряется отдельным прогоном
+    tracemalloc.start()
+    peak_memory = 0
+    for url in urls[:memory_requests]:
+        tracemalloc.reset_peak()
+        client.get(url)
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    return {
+        'requests': requests_amount,
+        'p50_ms': round(get_percentile(durations, 50), 2),
+        'p95_ms': round(get_percentile(durations, 95), 2),
+        'p99_ms': round(get_percentile(durations, 99), 2),
+        'mean_ms': round(statistics.mean(durations), 2),
+        'queries_per_request': round(statistics.mean(queries), 2),
+        'peak_memory_kb': round(peak_memory / 1024, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный бенчмарк вьюх блога через тестовый клиент: ' \
+           'перцентили времени ответа, запросы к БД и пик памяти'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на каждую вьюху')
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Не отключать кеш страниц и сайдбара')
+        parser.add_argument('--memory-requests', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Куда сохранить результат в JSON')
+        parser.add_argument('--compare',
+                            help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--max-regression', type=float, default=20,
+                            help='Допустимый рост p95 в процентах')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        bench_settings = dict(CHECK_SETTINGS)
+        if options['warm_cache']:
+            bench_settings.pop('CACHES')
+
+        results = {}
+        with override_settings(**bench_settings):
+            cache.clear()
+            client = Client()
+            for view_name, urls in get_bench_urls(20).items():
+                if not urls:
+                    self.stderr.write(f'{view_name}: нет данных, пропущено')
+                    continue
+                results[view_name] = bench_view(
+                    client, urls, options['requests'],
+                    options['memory_requests'])
+                self.stdout.write(f'{view_name}: {results[view_name]}')
+
+        report = {
+            'commit': get_git_commit(),
+            'created_at': timezone.now().isoformat(),
+            'warm_cache': options['warm_cache'],
+            'dataset': {
+                'posts': Post.objects.count(),
+                'tags': Tag.objects.count(),
+            },
+            'views': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
+        if options['compare']:
+            self.compare(report, options['compare'],
+                         options['max_regression'])
+
+    def compare(self, report, baseline_path, max_regression):
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = []
+        for view_name, result in report['views'].items():
+            previous = baseline['views'].get(view_name)
+            if not previous:
+                continue
+            change = (result['p95_ms'] / max(previous['p95_ms'], 1e-6) - 1) \
+                * 100
+            self.stdout.write(
+                f'{view_name}: p95 {previous["p95_ms"]} -> '
+                f'{result["p95_ms"]} мс ({change:+.0f}%), запросов '
+                f'{previous["queries_per_request"]} -> '
+                f'{result["queries_per_request"]}')
+            if change > max_regression:
+                regressions.append(view_name)
+        if regressions:
+            raise CommandError(
+                f'p95 вырос больше чем на {max_regression}%: '
+                f'{", ".join(regressions)}')
@@ -0,0 +1,37 @@
+import time
+
+from blog.cache import bump_site_version
+from blog.models import RelatedPost
+from blog.related import (get_posts_without_related, in_chunks,
+                          rebuild_related_posts, update_related_posts)
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Строит таблицу похожих постов по общим тегам и лайкам. ' \
+           'С --new досчитывает только посты, у которых похожих ещё нет: ' \
+           'запускайте так по расписанию, а полностью пересобирайте, ' \
+           'например, раз в сутки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--new', action='store_true',
+                            help='Только посты без похожих')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Сколько новых постов считать за раз')
+
+    def handle(self, *args, **options):
+        started_at = time.monotonic()
+        if options['new']:
+            post_ids = list(get_posts_without_related())
+            for batch in in_chunks(post_ids, options['batch_size']):
+                update_related_posts(batch)
+            message = f'Посчитаны похожие для {len(post_ids)} постов'
+        else:
+            posts_amount = rebuild_related_posts(options['chunk_size'])
+            message = f'Похожие есть у {posts_amount} постов'
+        bump_site_version(sender=RelatedPost)
+        self.stdout.write(self.style.SUCCESS(
+            f'{message}, строк в таблице '
+            f'{RelatedPost.objects.count()}, '
+            f'{time.monotonic() - started_at:.1f} с'))
@@ -0,0 +1,35 @@
+from blog.images import build_image_variants, needs_variants
+from blog.models import Post
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии картинок постов в нескольких ' \
+           'ширинах и в WebP для постов, у которых их ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Процессов, по умолчанию по числу ядер')
+        parser.add_argument('--force', action='store_true',
+                            help='Заново описать копии всех картинок, '
+                                 'например после смены THUMBNAIL_WIDTHS')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image=''). \
+            values_list('id', 'image', 'image_variants').iterator()
+        pending = [
+            (post_id, image_name)
+            for post_id, image_name, image_variants in posts
+            if options['force'] or needs_variants(image_name, image_variants)
+        ]
+
+        built_amount = 0
+        for post_id, error in build_image_variants(pending,
+                                                   options['workers']):
+            if error:
+                self.stderr.write(f'Пост {post_id}: {error}')
+            else:
+                built_amount += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Построены копии картинок {built_amount} постов '
+            f'из {len(pending)}'))
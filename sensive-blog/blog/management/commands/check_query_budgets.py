@@ -0,0 +1,35 @@
+from blog.management.commands.check_query_plans import (CHECK_SETTINGS,
+                                                        get_view_urls)
+from blog.middleware import QueryBudgetExceeded
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+
+class Command(BaseCommand):
+    help = 'Открывает страницы блога с пустым кешем и падает, ' \
+           'если вьюха превысила свой бюджет SQL-запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*',
+                            help='Адреса страниц, по умолчанию все вьюхи')
+
+    def handle(self, *args, **options):
+        middleware = 'blog.middleware.QueryBudgetMiddleware'
+        check_settings = dict(CHECK_SETTINGS, QUERY_BUDGET_STRICT=True)
+        if middleware not in settings.MIDDLEWARE:
+            check_settings['MIDDLEWARE'] = [middleware] + settings.MIDDLEWARE
+        failures = []
+        with override_settings(**check_settings):
+            for url in options['urls'] or get_view_urls():
+                try:
+                    response = Client().get(url)
+                except QueryBudgetExceeded as error:
+                    failures.append(str(error))
+                    continue
+                self.stdout.write(f'{url}: {response["Server-Timing"]}')
+        if failures:
+            raise CommandError('Превышен бюджет запросов:\n' +
+                               '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Все вьюхи уложились в бюджет'))
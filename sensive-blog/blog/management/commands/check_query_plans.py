@@ -0,0 +1,162 @@
+import re
+from urllib.parse import quote
+
+from blog.models import Post, PostTag, Tag
+from blog.pagination import find_page_cursor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import Http404
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+
+# скан по любому индексу, в том числе покрывающему, читает его целиком;
+# поиск FTS5 по MATCH идёт по своему индексу: VIRTUAL TABLE INDEX 0:M...
+FULL_SCAN = re.compile(
+    r'\bSCAN (?:TABLE )?(\w+)\b(?! VIRTUAL TABLE INDEX \d+:M)')
+INDEX_SCAN = re.compile(r'\bSCAN (?:TABLE )?\w+ USING (?:COVERING )?INDEX')
+LIMIT = re.compile(r'\bLIMIT \d+$')
+
+# в рейтингах не больше RANKING_SIZE строк
+BOUNDED_TABLES = {'blog_popularpost', 'blog_populartag'}
+# страницы, которым таблица нужна целиком: облако тегов и карта сайта
+ALLOWED_SCANS = {
+    'tag_filter': {'blog_tag'},
+    'sitemap': {'blog_post'},
+    'sitemap_tags': {'blog_tag'},
+}
+
+CHECK_SETTINGS = {
+    'ALLOWED_HOSTS': ['*'],
+    'DEBUG': False,
+    'CACHES': {'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+}
+
+
+def get_view_urls():
+    urls = [reverse('index'), reverse('contacts'), reverse('api_posts'),
+            reverse('api_tags'), reverse('rss_feed'), reverse('atom_feed'),
+            reverse('sitemap'), reverse('sitemap_pages'),
+            reverse('sitemap_tags')]
+    try:
+        second_page_cursor = find_page_cursor(Post.objects.all(), 2)
+    except Http404:
+        # постов на вторую страницу не набралось
+        pass
+    else:
+        urls.append(reverse('index', kwargs={'page': 2}) +
+                    f'?after={second_page_cursor}')
+    post = Post.objects.order_by('-likes_count').first()
+    if post:
+        urls.append(reverse('post_detail', kwargs={'slug': post.slug}))
+        urls.append(reverse('post_comments', kwargs={'slug': post.slug}))
+        urls.append(reverse('api_post', kwargs={'slug': post.slug}))
+        urls.append(reverse('api_post_comments',
+                            kwargs={'slug': post.slug}))
+        urls.append(reverse('search') + f'?q={quote(post.title)}')
+        urls.append(reverse('sitemap_posts', kwargs={
+            'year': post.published_at.year,
+            'month': post.published_at.month}))
+    tag = Tag.objects.popular().first()
+    if tag:
+        tag_url = reverse('tag_filter', kwargs={'tag_slug': tag.slug})
+        urls.append(tag_url)
+        urls.append(reverse('tag_rss_feed', kwargs={'tag_slug': tag.slug}))
+        try:
+            tag_cursor = find_page_cursor(PostTag.objects.filter(tag=tag),
+                                          2, id_field='post_id')
+        except Http404:
+            pass
+        else:
+            urls.append(f'{tag_url}?after={tag_cursor}')
+    return urls
+
+
+def capture_queries(url):
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with override_settings(**CHECK_SETTINGS):
+        with connection.execute_wrapper(record):
+            response = Client().get(url)
+    if response.status_code != 200:
+        raise CommandError(f'{url} ответил {response.status_code}')
+    return queries
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def is_top_rows(sql, plan):
+    """
+    ORDER BY ... LIMIT without WHERE, read in index order: SQLite
+    stops after LIMIT rows of the index, the scan is bounded.
+    """
+    return LIMIT.search(sql.rstrip()) is not None and \
+        ' WHERE ' not in sql and \
+        not any('TEMP B-TREE' in line for line in plan)
+
+
+def find_full_scans(sql, params, tables):
+    plan = explain(sql, params)
+    top_rows = is_top_rows(sql, plan)
+    scans = []
+    for line in plan:
+        match = FULL_SCAN.search(line)
+        if not match or match.group(1) not in tables:
+            continue
+        if top_rows and INDEX_SCAN.search(line):
+            continue
+        scans.append(line)
+    return scans
+
+
+def check_url(url, tables):
+    """
+    (queries amount, failures) of the page, the tables the page
+    is allowed to read whole are not checked.
+    """
+    queries = capture_queries(url)
+    url_name = resolve(url.split('?')[0]).url_name
+    tables = tables - BOUNDED_TABLES - ALLOWED_SCANS.get(url_name, set())
+    failures = []
+    for sql, params in queries:
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        scans = find_full_scans(sql, params, tables)
+        if scans:
+            failures.append(f'{url}: {sql}')
+            failures.extend(f'    {scan}' for scan in scans)
+    return len(queries), failures
+
+
+class Command(BaseCommand):
+    help = 'Проверяет через EXPLAIN QUERY PLAN, что запросы страниц ' \
+           'блога не сканируют таблицы целиком'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*',
+                            help='Адреса страниц, по умолчанию все вьюхи')
+        parser.add_argument('--allow', action='append', default=[],
+                            help='Таблица, которой разрешён полный скан')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Планы запросов проверяются только на SQLite')
+        tables = set(connection.introspection.table_names()) - \
+            set(options['allow'])
+        failures = []
+        for url in options['urls'] or get_view_urls():
+            queries_amount, url_failures = check_url(url, tables)
+            failures.extend(url_failures)
+            self.stdout.write(f'{url}: запросов {queries_amount}')
+        if failures:
+            raise CommandError('Полный скан таблицы:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Полных сканов нет'))
@@ -0,0 +1,98 @@
+import json
+import sys
+import time
+
+from blog.models import Comment, Post, Tag
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+
+def iterate_users(chunk_size):
+    users = User.objects.order_by('id'). \
+        values('username', 'first_name', 'last_name', 'is_staff')
+    for user in users.iterator(chunk_size):
+        yield dict(type='user', **user)
+
+
+def iterate_tags(chunk_size):
+    tags = Tag.objects.order_by('id').values('title', 'slug')
+    for tag in tags.iterator(chunk_size):
+        yield dict(type='tag', **tag)
+
+
+def iterate_posts(chunk_size):
+    posts = Post.objects.order_by('id').values(
+        'id', 'slug', 'title', 'text', 'image', 'published_at',
+        'author__username')
+    post_tags = Post.tags.through.objects.order_by('post_id'). \
+        values_list('post_id', 'tag__title')
+    tags_iterator = iter(post_tags.iterator(chunk_size))
+    next_tag = next(tags_iterator, None)
+    # посты и их теги читаются двумя курсорами по возрастанию id поста
+    for post in posts.iterator(chunk_size):
+        tags = []
+        while next_tag is not None and next_tag[0] <= post['id']:
+            if next_tag[0] == post['id']:
+                tags.append(next_tag[1])
+            next_tag = next(tags_iterator, None)
+        yield {
+            'type': 'post',
+            'slug': post['slug'],
+            'title': post['title'],
+            'text': post['text'],
+            'image': post['image'],
+            'published_at': post['published_at'].isoformat(),
+            'author': post['author__username'],
+            'tags': tags,
+        }
+
+
+def iterate_comments(chunk_size):
+    comments = Comment.objects.order_by('id').values_list(
+        'post__slug', 'author__username', 'text', 'published_at')
+    for slug, username, text, published_at in comments.iterator(chunk_size):
+        yield {
+            'type': 'comment',
+            'post': slug,
+            'author': username,
+            'text': text,
+            'published_at': published_at.isoformat(),
+        }
+
+
+def iterate_likes(chunk_size):
+    likes = Post.likes.through.objects.order_by('id'). \
+        values_list('post__slug', 'user__username')
+    for slug, username in likes.iterator(chunk_size):
+        yield {'type': 'like', 'post': slug, 'user': username}
+
+
+EXPORTERS = [iterate_users, iterate_tags, iterate_posts, iterate_comments,
+             iterate_likes]
+
+
+class Command(BaseCommand):
+    help = 'Выгружает пользователей, теги, посты, комментарии и лайки ' \
+           'в JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Куда писать, "-" — stdout')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        output = sys.stdout if options['path'] == '-' \
+            else open(options['path'], 'w', encoding='utf-8')
+        started_at = time.monotonic()
+        rows_amount = 0
+        try:
+            for exporter in EXPORTERS:
+                for row in exporter(options['chunk_size']):
+                    output.write(json.dumps(row, ensure_ascii=False) + '\n')
+                    rows_amount += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        duration = time.monotonic() - started_at
+        self.stderr.write(
+            f'Выгружено строк: {rows_amount} за {duration:.1f} с, '
+            f'{rows_amount / max(duration, 1e-6):.0f} строк/с')
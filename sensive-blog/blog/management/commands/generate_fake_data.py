@@ -0,0 +1,198 @@
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from blog.cache import invalidate_everything
+from blog.models import Comment, Post, PostTag, Tag
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+WORDS = (
+    'успех бизнес дети жизнь деньги время команда рынок клиент идея план '
+    'цель опыт совет работа семья привычка риск рост продажи лидер'
+).split()
+SYLLABLES = 'ба ве ги до жу за ки ло ми но па ре си то фу ха це ча ша ю'.split()
+
+
+def get_zipf_weights(amount, skew):
+    """
+    Cumulative weights where the i-th item is 1/i^skew times as popular
+    as the first one: few posts and tags get most of likes and comments.
+    """
+    return list(accumulate(1 / rank ** skew for rank in range(1, amount + 1)))
+
+
+def make_vocabulary(size):
+    """
+    Real words plus made-up ones from syllables, so the texts have
+    both very common and rare words, as search benchmarks need.
+    """
+    words = list(dict.fromkeys(WORDS))
+    known_words = set(words)
+    while len(words) < size:
+        word = ''.join(random.choices(SYLLABLES, k=random.randint(2, 4)))
+        if word not in known_words:
+            known_words.add(word)
+            words.append(word)
+    return words
+
+
+def make_text(words_amount, words=WORDS, cum_weights=None):
+    return ' '.join(random.choices(words, cum_weights=cum_weights,
+                                   k=words_amount)).capitalize() + '.'
+
+
+def bulk_create_in_chunks(model, objects, chunk_size, **kwargs):
+    chunk = []
+    for obj in objects:
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            model.objects.bulk_create(chunk, **kwargs)
+            chunk = []
+    if chunk:
+        model.objects.bulk_create(chunk, **kwargs)
+
+
+class Command(BaseCommand):
+    help = 'Наполняет БД синтетическими пользователями, постами, тегами, ' \
+           'комментариями и лайками с неравномерной популярностью'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--likes', type=int, default=50000)
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель закона Ципфа для популярности')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--vocabulary', type=int, default=5000,
+                            help='Сколько разных слов в текстах')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='fake',
+                            help='Префикс имён пользователей, slug и тегов')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.prefix = options['prefix']
+        # частоты слов в текстах тоже подчиняются закону Ципфа
+        self.words = make_vocabulary(options['vocabulary'])
+        self.word_weights = get_zipf_weights(len(self.words), 1)
+        started_at = time.monotonic()
+
+        with transaction.atomic():
+            user_ids = self.create_users(options['users'])
+            tag_ids = self.create_tags(options['tags'])
+            post_ids = self.create_posts(options['posts'], user_ids, tag_ids,
+                                         options['skew'])
+            # порядок постов перемешан, чтобы популярные не были самыми новыми
+            random.shuffle(post_ids)
+            post_weights = get_zipf_weights(len(post_ids), options['skew'])
+            self.create_comments(options['comments'], post_ids, post_weights,
+                                 user_ids)
+            likes_amount = self.create_likes(options['likes'], post_ids,
+                                             post_weights, user_ids)
+
+        call_command('recount_counters', stdout=self.stdout)
+        invalidate_everything()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(user_ids)}, тегов {len(tag_ids)}, '
+            f'постов {len(post_ids)}, комментариев {options["comments"]}, '
+            f'лайков {likes_amount} за {time.monotonic() - started_at:.1f} с'))
+
+    def make_text(self, words_amount):
+        return make_text(words_amount, self.words, self.word_weights)
+
+    def create_users(self, amount):
+        password = make_password(None)
+        bulk_create_in_chunks(User, (
+            User(username=f'{self.prefix}_user_{number}', password=password,
+                 is_staff=number % 20 == 0)
+            for number in range(amount)
+        ), self.chunk_size, ignore_conflicts=True)
+        return list(User.objects.filter(
+            username__startswith=f'{self.prefix}_user_').
+            order_by('id').values_list('id', flat=True))
+
+    def create_tags(self, amount):
+        # bulk_create не вызывает save(), поэтому slug задаём сами
+        slugs = Tag.objects.make_slugs(
+            [f'{self.prefix}{number}' for number in range(amount)])
+        bulk_create_in_chunks(Tag, (
+            Tag(title=title, slug=slug) for title, slug in slugs.items()
+        ), self.chunk_size, ignore_conflicts=True)
+        return list(Tag.objects.filter(title__startswith=self.prefix).
+                    order_by('id').values_list('id', flat=True))
+
+    def create_posts(self, amount, user_ids, tag_ids, skew):
+        staff_ids = list(User.objects.filter(
+            id__in=user_ids, is_staff=True).order_by('id').
+            values_list('id', flat=True)) \
+            or user_ids[:1]
+        now = timezone.now()
+        bulk_create_in_chunks(Post, (
+            Post(title=self.make_text(random.randint(3, 8)).rstrip('.'),
+                 text='\n\n'.join(self.make_text(random.randint(20, 60))
+                                  for _ in range(random.randint(2, 8))),
+                 slug=f'{self.prefix}-post-{number}',
+                 image='',
+                 published_at=now - timedelta(
+                     minutes=random.randint(0, 60 * 24 * 365 * 3)),
+                 author_id=random.choice(staff_ids))
+            for number in range(amount)
+        ), self.chunk_size, ignore_conflicts=True)
+        post_dates = dict(Post.objects.filter(
+            slug__startswith=f'{self.prefix}-post-').
+            order_by('id').values_list('id', 'published_at'))
+
+        tag_weights = get_zipf_weights(len(tag_ids), skew)
+        bulk_create_in_chunks(PostTag, (
+            PostTag(post_id=post_id, tag_id=tag_id, published_at=published_at)
+            for post_id, published_at in post_dates.items()
+            for tag_id in set(random.choices(
+                tag_ids, cum_weights=tag_weights, k=random.randint(1, 4)))
+        ), self.chunk_size, ignore_conflicts=True)
+        return list(post_dates)
+
+    def create_comments(self, amount, post_ids, post_weights, user_ids):
+        now = timezone.now()
+        bulk_create_in_chunks(Comment, (
+            Comment(post_id=random.choices(post_ids,
+                                           cum_weights=post_weights)[0],
+                    author_id=random.choice(user_ids),
+                    text=self.make_text(random.randint(5, 30)),
+                    published_at=now - timedelta(
+                        minutes=random.randint(0, 60 * 24 * 365)))
+            for _ in range(amount)
+        ), self.chunk_size)
+
+    def create_likes(self, amount, post_ids, post_weights, user_ids):
+        """
+        Likes amount of each post follows the same Zipf weights,
+        likers of one post are distinct users.
+        """
+        total_weight = post_weights[-1]
+        previous_weight = 0
+        likes_amount = 0
+        PostLike = Post.likes.through
+
+        def iterate_likes():
+            nonlocal previous_weight, likes_amount
+            for post_id, weight in zip(post_ids, post_weights):
+                post_likes = round(
+                    amount * (weight - previous_weight) / total_weight)
+                previous_weight = weight
+                post_likes = min(post_likes, len(user_ids))
+                likes_amount += post_likes
+                for user_id in random.sample(user_ids, post_likes):
+                    yield PostLike(post_id=post_id, user_id=user_id)
+
+        bulk_create_in_chunks(PostLike, iterate_likes(), self.chunk_size,
+                              ignore_conflicts=True)
+        return likes_amount
@@ -0,0 +1,180 @@
+import json
+import sys
+import time
+from itertools import groupby
+
+from blog.cache import invalidate_everything
+from blog.models import Comment, Post, PostTag, Tag
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+
+def get_ids(model, field, values):
+    return dict(model.objects.filter(**{f'{field}__in': set(values)}).
+                values_list(field, 'id'))
+
+
+def import_users(rows):
+    password = make_password(None)
+    User.objects.bulk_create([
+        User(username=row['username'], first_name=row.get('first_name', ''),
+             last_name=row.get('last_name', ''),
+             is_staff=row.get('is_staff', False), password=password)
+        for row in rows
+    ], ignore_conflicts=True)
+
+
+def import_tags(rows):
+    """
+    Returns warnings about the rows which were not imported: their slug
+    is taken by a tag with another title.
+    """
+    # в старых выгрузках slug нет, а bulk_create не вызывает save();
+    # явные slug пачки занимаются до того, как придумываются остальные
+    slugs = Tag.objects.make_slugs(
+        [row['title'] for row in rows if not row.get('slug')],
+        reserved_slugs=[row['slug'] for row in rows if row.get('slug')])
+    Tag.objects.bulk_create([
+        Tag(title=row['title'], slug=row.get('slug') or slugs[row['title']])
+        for row in rows
+    ], ignore_conflicts=True)
+    # ignore_conflicts молча пропускает строки с занятым slug
+    imported_ids = get_ids(Tag, 'title', [row['title'] for row in rows])
+    return [f'пропущена строка {json.dumps(row, ensure_ascii=False)}'
+            for row in rows if row['title'] not in imported_ids]
+
+
+def import_posts(rows):
+    """
+    Returns warnings about links to tags which were skipped on import,
+    the posts themselves are imported without these links.
+    """
+    author_ids = get_ids(User, 'username', [row['author'] for row in rows])
+    Post.objects.bulk_create([
+        Post(slug=row['slug'], title=row['title'], text=row['text'],
+             image=row.get('image', ''),
+             published_at=parse_datetime(row['published_at']),
+             author_id=author_ids[row['author']])
+        for row in rows
+    ], ignore_conflicts=True)
+
+    # SQLite не возвращает id из bulk_create, поэтому берём их по slug
+    # дату берём из базы: уже загруженный пост мог быть опубликован иначе
+    posts = {slug: (post_id, published_at)
+             for slug, post_id, published_at in Post.objects.filter(
+                 slug__in={row['slug'] for row in rows}).
+             values_list('slug', 'id', 'published_at')}
+    tag_ids = get_ids(Tag, 'title', [
+        title for row in rows for title in row.get('tags', [])])
+    PostTag.objects.bulk_create([
+        PostTag(post_id=posts[row['slug']][0], tag_id=tag_ids[title],
+                published_at=posts[row['slug']][1])
+        for row in rows for title in row.get('tags', [])
+        if title in tag_ids
+    ], ignore_conflicts=True)
+    return [f'{row["slug"]}: нет тега «{title}», пост загружен без него'
+            for row in rows for title in row.get('tags', [])
+            if title not in tag_ids]
+
+
+def import_comments(rows):
+    post_ids = get_ids(Post, 'slug', [row['post'] for row in rows])
+    author_ids = get_ids(User, 'username', [row['author'] for row in rows])
+    Comment.objects.bulk_create([
+        Comment(post_id=post_ids[row['post']],
+                author_id=author_ids[row['author']], text=row['text'],
+                published_at=parse_datetime(row['published_at']))
+        for row in rows
+    ])
+
+
+def import_likes(rows):
+    post_ids = get_ids(Post, 'slug', [row['post'] for row in rows])
+    user_ids = get_ids(User, 'username', [row['user'] for row in rows])
+    Post.likes.through.objects.bulk_create([
+        Post.likes.through(post_id=post_ids[row['post']],
+                           user_id=user_ids[row['user']])
+        for row in rows
+    ], ignore_conflicts=True)
+
+
+IMPORTERS = {
+    'user': import_users,
+    'tag': import_tags,
+    'post': import_posts,
+    'comment': import_comments,
+    'like': import_likes,
+}
+
+
+def read_chunks(lines, chunk_size):
+    """
+    Chunks of consecutive rows of the same type, so the whole file is never
+    held in memory. Rows must go after the rows they refer to, as export_blog
+    writes them: users, tags, posts, comments, likes.
+    """
+    rows = (json.loads(line) for line in lines if line.strip())
+    for row_type, same_type_rows in groupby(rows, key=lambda row: row['type']):
+        chunk = []
+        for row in same_type_rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield row_type, chunk
+                chunk = []
+        if chunk:
+            yield row_type, chunk
+
+
+class Command(BaseCommand):
+    help = 'Загружает пользователей, теги, посты, комментарии и лайки ' \
+           'из JSON Lines пачками через bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Откуда читать, "-" — stdin')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--skip-recount', action='store_true',
+                            help='Не пересчитывать счётчики после загрузки')
+
+    def handle(self, *args, **options):
+        source = sys.stdin if options['path'] == '-' \
+            else open(options['path'], encoding='utf-8')
+        started_at = time.monotonic()
+        rows_amount = 0
+        warnings_amount = 0
+        try:
+            for row_type, chunk in read_chunks(source, options['chunk_size']):
+                if row_type not in IMPORTERS:
+                    raise CommandError(f'Неизвестный тип строки: {row_type}')
+                try:
+                    with transaction.atomic():
+                        warnings = IMPORTERS[row_type](chunk) or []
+                except KeyError as error:
+                    raise CommandError(
+                        f'{row_type}: не найден {error} — строка ссылается '
+                        f'на объект, которого нет выше в файле и в БД')
+                for warning in warnings:
+                    self.stderr.write(self.style.WARNING(
+                        f'{row_type}: {warning}'))
+                rows_amount += len(chunk)
+                warnings_amount += len(warnings)
+                duration = time.monotonic() - started_at
+                self.stderr.write(
+                    f'{row_type}: всего {rows_amount} строк, '
+                    f'{rows_amount / max(duration, 1e-6):.0f} строк/с')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        # счётчики пересчитываются один раз в конце, а не на каждую строку
+        if not options['skip_recount']:
+            call_command('recount_counters', stdout=self.stdout)
+        invalidate_everything()
+        duration = time.monotonic() - started_at
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {rows_amount} за {duration:.1f} с, '
+            f'{rows_amount / max(duration, 1e-6):.0f} строк/с, '
+            f'предупреждений: {warnings_amount}'))
@@ -0,0 +1,31 @@
+import time
+
+from blog.prerender import get_prerender_root, prerender_site
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Рендерит главную, страницы постов, тегов и контактов ' \
+           'в статические html-файлы. Повторный запуск перерисовывает ' \
+           'только страницы, на которых что-то изменилось'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                            help='Папка для страниц, по умолчанию '
+                                 'PRERENDER_ROOT')
+        parser.add_argument('--full', action='store_true',
+                            help='Перерисовать все страницы')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Процессов, по умолчанию по числу ядер')
+
+    def handle(self, *args, **options):
+        started_at = time.monotonic()
+        root = options['output'] or get_prerender_root()
+        rendered, errors, removed = prerender_site(
+            root, options['full'], options['workers'])
+        for file_name, error in errors.items():
+            self.stderr.write(f'{file_name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{root}: отрисовано страниц {len(rendered)}, '
+            f'с ошибкой {len(errors)}, удалено {len(removed)}, '
+            f'{time.monotonic() - started_at:.1f} с'))
@@ -0,0 +1,77 @@
+import glob
+import os
+from collections import Counter
+
+from blog.profiling import (CATEGORIES, get_interval, get_profile_path,
+                            get_profile_root, read_stacks)
+from django.core.management.base import BaseCommand, CommandError
+
+
+def get_hotspots(stacks):
+    """
+    (self samples, total samples) of every frame. A recursive frame
+    is counted in the total once per stack.
+    """
+    self_samples, total_samples = Counter(), Counter()
+    for stack, amount in stacks.items():
+        frame_names = stack.split(';')[1:]
+        if not frame_names:
+            continue
+        self_samples[frame_names[-1]] += amount
+        for frame_name in set(frame_names):
+            total_samples[frame_name] += amount
+    return self_samples, total_samples
+
+
+class Command(BaseCommand):
+    help = 'Печатает, на что уходит время вьюх по стекам, собранным ' \
+           'ProfilingMiddleware: доли ORM, шаблонов и сериализации ' \
+           'и самые горячие функции'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url_names', nargs='*',
+                            help='Имена url, по умолчанию все с профилями')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--root', default=None,
+                            help='Папка профилей, по умолчанию PROFILE_ROOT')
+        parser.add_argument('--clear', action='store_true',
+                            help='Удалить профили после печати')
+
+    def handle(self, *args, **options):
+        root = options['root'] or get_profile_root()
+        paths = [get_profile_path(url_name, root)
+                 for url_name in options['url_names']] or \
+            sorted(glob.glob(os.path.join(root, '*.folded')))
+        paths = [path for path in paths if os.path.exists(path)]
+        if not paths:
+            raise CommandError(f'В {root} нет профилей')
+
+        for path in paths:
+            self.print_profile(path, options['top'])
+            if options['clear']:
+                os.remove(path)
+
+    def print_profile(self, path, top):
+        url_name = os.path.basename(path)[:-len('.folded')]
+        stacks = read_stacks(path)
+        samples_amount = sum(stacks.values())
+        if not samples_amount:
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'{url_name}: {samples_amount} сэмплов, '
+            f'~{samples_amount * get_interval():.1f} с'))
+
+        by_category = Counter()
+        for stack, amount in stacks.items():
+            by_category[stack.split(';', 1)[0]] += amount
+        self.stdout.write('  ' + ', '.join(
+            f'{category} {by_category[category] / samples_amount:.0%}'
+            for category in CATEGORIES))
+
+        self_samples, total_samples = get_hotspots(stacks)
+        self.stdout.write(f'  {"свои":>6} {"всего":>6}  функция')
+        for frame_name, amount in self_samples.most_common(top):
+            self.stdout.write(
+                f'  {amount / samples_amount:>6.1%} '
+                f'{total_samples[frame_name] / samples_amount:>6.1%}  '
+                f'{frame_name}')
@@ -0,0 +1,17 @@
+from blog.cache import invalidate_everything
+from blog.models import PopularPost, PopularTag
+from blog.ranking import rebuild_rankings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересобирает топы постов по лайкам и тегов ' \
+           'по количеству постов. Запускайте по расписанию, например ' \
+           'раз в час, чтобы исправить накопившийся дрейф'
+
+    def handle(self, *args, **options):
+        rebuild_rankings()
+        invalidate_everything()
+        self.stdout.write(self.style.SUCCESS(
+            f'В топе постов: {PopularPost.objects.count()}, '
+            f'тегов: {PopularTag.objects.count()}'))
@@ -0,0 +1,30 @@
+from blog.models import Post, Tag
+from blog.ranking import rebuild_rankings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает хранимые счётчики лайков, комментариев и тегов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Сколько id постов пересчитывать за UPDATE')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        bounds = Post.objects.aggregate(first_id=Min('id'), last_id=Max('id'))
+        posts_amount = 0
+        if bounds['first_id'] is not None:
+            for start in range(bounds['first_id'], bounds['last_id'] + 1,
+                               batch_size):
+                with transaction.atomic():
+                    posts_amount += Post.objects.filter(
+                        id__gte=start, id__lt=start + batch_size). \
+                        update_counters()
+        with transaction.atomic():
+            tags_amount = Tag.objects.update_posts_count()
+        rebuild_rankings()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано постов: {posts_amount}, тегов: {tags_amount}'))
@@ -0,0 +1,16 @@
+from blog.trending import refresh_trending
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинг постов в тренде по почасовым лайкам ' \
+           'и комментариям. Запускайте по расписанию, например раз ' \
+           'в 10 минут'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        trending_amount = refresh_trending(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов в тренде: {trending_amount}'))
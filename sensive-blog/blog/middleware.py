@@ -0,0 +1,163 @@
+import hashlib
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from blog.cache import get_site_version
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started_at
+            self.count += 1
+            self.statements[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self):
+        return sum(amount - 1 for amount in self.statements.values())
+
+    def get_server_timing(self, total_duration):
+        return f'db;dur={self.duration * 1000:.1f};' \
+               f'desc="{self.count} queries, {self.duplicates} duplicates", ' \
+               f'app;dur={total_duration * 1000:.1f}'
+
+
+def get_query_budget(request, url_name):
+    """
+    Budget of the url name from settings.QUERY_BUDGETS plus the session
+    and user queries when the request carries a session cookie.
+    None when the view has no budget.
+    """
+    budget = getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+    if budget is None:
+        return None
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        budget += getattr(settings, 'QUERY_BUDGET_SESSION_QUERIES', 2)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts SQL queries of every view and compares them with the budget
+    declared for its url name in settings.QUERY_BUDGETS. Over budget view
+    is logged, or fails with QueryBudgetExceeded when QUERY_BUDGET_STRICT
+    is on, as in check_query_budgets command.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        started_at = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        total_duration = time.perf_counter() - started_at
+
+        request.query_stats = stats
+        response['Server-Timing'] = stats.get_server_timing(total_duration)
+        self.check_budget(request, stats)
+        return response
+
+    def check_budget(self, request, stats):
+        url_name = getattr(request.resolver_match, 'url_name', None)
+        budget = get_query_budget(request, url_name)
+        if budget is None:
+            return
+        if stats.count <= budget and not stats.duplicates:
+            return
+        message = f'{url_name} ({request.path}): {stats.count} queries ' \
+                  f'of {budget} allowed, {stats.duplicates} duplicates, ' \
+                  f'{stats.duration * 1000:.1f} ms in DB'
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class PageCacheMiddleware:
+    """
+    Whole responses of blog pages cached under the site version, so any
+    change of posts, comments, tags or likes makes new keys. Only anonymous
+    visitors are served from it, one copy per URL: pages of logged-in users
+    are rendered by the views from the blocks cached in blog.cache.
+    ETag and Last-Modified come from the site version as well and repeated
+    requests are answered with 304 before the view runs.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_cacheable_request(request):
+            return self.get_response(request)
+
+        version = get_site_version()
+        etag = f'"{version:x}"'
+        last_modified = version // 1000
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return self.add_headers(response, etag, last_modified)
+
+        path_hash = hashlib.md5(
+            request.get_full_path().encode()).hexdigest()
+        key = f'blog:page:{version}:{request.method}:{path_hash}'
+        response = cache.get(key)
+        if response is None:
+            response = self.get_response(request)
+            if not self.is_cacheable_response(response):
+                return response
+            cache.set(key, response,
+                      getattr(settings, 'PAGE_CACHE_TIMEOUT', 600))
+        return self.add_headers(response, etag, last_modified)
+
+    def is_cacheable_request(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        # копия страницы на каждого пользователя растила бы кеш без предела
+        if request.user.is_authenticated:
+            return False
+        try:
+            url_name = resolve(request.path_info).url_name
+        except Resolver404:
+            return False
+        return url_name in getattr(settings, 'PAGE_CACHE_URL_NAMES', ())
+
+    def is_cacheable_response(self, response):
+        return response.status_code == 200 and not response.cookies and \
+            not response.streaming and \
+            'private' not in response.get('Cache-Control', '')
+
+    def add_headers(self, response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'public, no-cache'
+        # после входа браузер и прокси не должны отдать анонимную копию
+        patch_vary_headers(response, ('Cookie',))
+        return response
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:00
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, outer_field):
+    counts = model.objects.filter(**{outer_field: OuterRef('pk')}). \
+        order_by().values(outer_field).annotate(amount=Count('*')). \
+        values('amount')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Tag = apps.get_model('blog', 'Tag')
+    Comment = apps.get_model('blog', 'Comment')
+    Post.objects.update(
+        likes_count=count_subquery(Post.likes.through, 'post'),
+        comments_count=count_subquery(Comment, 'post'),
+    )
+    Tag.objects.update(
+        posts_count=count_subquery(Post.tags.through, 'tag'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_auto_20191213_2352'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество лайков'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество постов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:03
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def make_slugs_unique(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    duplicated_slugs = Post.objects.values('slug').annotate(
+        amount=Count('id')).filter(amount__gt=1).values_list('slug', flat=True)
+    for slug in duplicated_slugs:
+        # первый пост сохраняет адрес, остальные получают суффикс с id
+        duplicates = Post.objects.filter(slug=slug).order_by('id')[1:]
+        for post in duplicates:
+            post.slug = f'{slug[:190]}-{post.id}'
+            post.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(make_slugs_unique, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='post',
+            name='slug',
+            field=models.SlugField(max_length=200, unique=True, verbose_name='Название в виде url'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'published_at', 'id'], name='comment_post_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['published_at', 'id'], name='post_published_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['likes_count'], name='post_likes_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['posts_count'], name='tag_posts_count_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+RANKING_SIZE = 50
+
+
+def fill_rankings(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Tag = apps.get_model('blog', 'Tag')
+    PopularPost = apps.get_model('blog', 'PopularPost')
+    PopularTag = apps.get_model('blog', 'PopularTag')
+    PopularPost.objects.bulk_create([
+        PopularPost(post_id=pk, likes_count=likes_count)
+        for pk, likes_count in Post.objects.order_by('-likes_count', 'id').
+        values_list('id', 'likes_count')[:RANKING_SIZE]
+    ])
+    PopularTag.objects.bulk_create([
+        PopularTag(tag_id=pk, posts_count=posts_count)
+        for pk, posts_count in Tag.objects.order_by('-posts_count', 'id').
+        values_list('id', 'posts_count')[:RANKING_SIZE]
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='blog.post', verbose_name='Пост')),
+                ('likes_count', models.PositiveIntegerField(verbose_name='Количество лайков')),
+            ],
+            options={
+                'verbose_name': 'популярный пост',
+                'verbose_name_plural': 'популярные посты',
+            },
+        ),
+        migrations.CreateModel(
+            name='PopularTag',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='blog.tag', verbose_name='Тег')),
+                ('posts_count', models.PositiveIntegerField(verbose_name='Количество постов')),
+            ],
+            options={
+                'verbose_name': 'популярный тег',
+                'verbose_name_plural': 'популярные теги',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='populartag',
+            index=models.Index(fields=['posts_count'], name='popular_tag_posts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='popularpost',
+            index=models.Index(fields=['likes_count'], name='popular_post_likes_idx'),
+        ),
+        migrations.RunPython(fill_rankings, migrations.RunPython.noop),
+    ]
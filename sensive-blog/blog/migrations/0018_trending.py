@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0017_rankings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='Час')),
+                ('likes', models.IntegerField(default=0, verbose_name='Лайки')),
+                ('comments', models.IntegerField(default=0, verbose_name='Комментарии')),
+            ],
+            options={
+                'verbose_name': 'активность поста за час',
+                'verbose_name_plural': 'активность постов по часам',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Рейтинг в тренде'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['trending_score'], name='post_trending_score_idx'),
+        ),
+        migrations.AddField(
+            model_name='postactivity',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='blog.post', verbose_name='Пост'),
+        ),
+        migrations.AddIndex(
+            model_name='postactivity',
+            index=models.Index(fields=['hour'], name='post_activity_hour_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='postactivity',
+            unique_together={('post', 'hour')},
+        ),
+    ]
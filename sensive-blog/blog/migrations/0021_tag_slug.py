@@ -0,0 +1,57 @@
+from django.db import migrations, models
+from django.utils.text import slugify
+
+TRANSLITERATION = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+})
+
+
+# копия blog.models.make_slugs на момент миграции: её правки
+# не должны менять уже применённую миграцию
+def make_slugs(titles, taken_slugs):
+    taken_slugs = set(taken_slugs)
+    slugs = {}
+    for title in titles:
+        base = slugify(title.lower().translate(TRANSLITERATION)) or 'tag'
+        slug, number = base, 1
+        while slug in taken_slugs:
+            number += 1
+            slug = f'{base}-{number}'
+        taken_slugs.add(slug)
+        slugs[title] = slug
+    return slugs
+
+
+def fill_tag_slugs(apps, schema_editor):
+    Tag = apps.get_model('blog', 'Tag')
+    tags = list(Tag.objects.order_by('id'))
+    slugs = make_slugs([tag.title for tag in tags], [])
+    for tag in tags:
+        tag.slug = slugs[tag.title]
+    Tag.objects.bulk_update(tags, ['slug'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0020_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='slug',
+            field=models.SlugField(blank=True, default='', max_length=100, verbose_name='Название в виде url'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_tag_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=100, unique=True, verbose_name='Название в виде url'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0022_related_posts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['published_at', 'id'], name='comment_published_at_idx'),
+        ),
+    ]
@@ -1,8 +1,27 @@
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models import Count
-from django.db.models.query import Prefetch
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.urls import reverse
+from django.utils.text import slugify
+
+TRANSLITERATION = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+})
+
+
+def count_subquery(queryset, outer_field):
+    """
+    Correlated COUNT(*) over the rows of queryset pointing to OuterRef('pk').
+    Used to recompute stored counters right inside UPDATE statement.
+    """
+    counts = queryset.filter(**{outer_field: OuterRef('pk')}).order_by(). \
+        values(outer_field).annotate(amount=Count('*')).values('amount')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
 
 
 class PostQuerySet(models.QuerySet):
@@ -11,18 +30,30 @@ class PostQuerySet(models.QuerySet):
         return self.order_by('-published_at')[:5]
 
     def popular(self):
-        return self.annotate(
-            likes_count=Count('likes')).order_by('-likes_count')[:5]
+        return self.filter(popularity__isnull=False). \
+            order_by('-popularity__likes_count', 'id')[:5]
+
+    def trending(self):
+        return self.filter(trending_score__gt=0). \
+            order_by('-trending_score', 'id')[:5]
+
+    def prefetch_tags(self):
+        return self.prefetch_related('tags')
 
-    def prefetch_with_tags_and_likes(self):
-        return self.prefetch_related(
-            Prefetch('tags', queryset=Tag.objects.annotate(
-                posts_with_tag=Count('posts', distinct=True)))). \
-            annotate(likes_count=Count('likes'))
+    def update_likes_count(self):
+        return self.update(likes_count=count_subquery(
+            Post.likes.through.objects.all(), 'post'))
 
-    def add_comments_count(self):
-        return self.annotate(
-            comments_count=Count('post_comments', distinct=True))
+    def update_comments_count(self):
+        return self.update(comments_count=count_subquery(
+            Comment.objects.all(), 'post'))
+
+    def update_counters(self):
+        return self.update(
+            likes_count=count_subquery(
+                Post.likes.through.objects.all(), 'post'),
+            comments_count=count_subquery(Comment.objects.all(), 'post'),
+        )
 
 
 class Post(models.Model):
@@ -30,8 +61,14 @@ class Post(models.Model):
     objects = PostQuerySet.as_manager()
     title = models.CharField("Заголовок", max_length=200)
     text = models.TextField("Текст")
-    slug = models.SlugField("Название в виде url", max_length=200)
+    slug = models.SlugField("Название в виде url", max_length=200,
+                            unique=True)
     image = models.ImageField("Картинка")
+    # {'source': имя картинки, 'width', 'height', 'variants': [{'name',
+    # 'width', 'height', 'format'}]}, заполняет blog.images
+    image_variants = models.JSONField("Уменьшенные копии картинки",
+                                      default=dict, blank=True,
+                                      editable=False)
     published_at = models.DateTimeField("Дата и время публикации")
 
     author = models.ForeignKey(User, on_delete=models.CASCADE,
@@ -40,31 +77,75 @@ class Post(models.Model):
     likes = models.ManyToManyField(User, related_name="liked_posts",
                                    verbose_name="Кто лайкнул", blank=True)
     tags = models.ManyToManyField("Tag", related_name="posts",
-                                  verbose_name="Теги")
+                                  through="PostTag", verbose_name="Теги")
+
+    likes_count = models.PositiveIntegerField("Количество лайков", default=0,
+                                              editable=False)
+    comments_count = models.PositiveIntegerField("Количество комментариев",
+                                                 default=0, editable=False)
+    trending_score = models.FloatField("Рейтинг в тренде", default=0,
+                                       editable=False)
 
     def __str__(self):
         return self.title
 
     def get_absolute_url(self):
-        return reverse('post_detail', args={'slug': self.slug})
+        return reverse('post_detail', kwargs={'slug': self.slug})
 
     class Meta:
         ordering = ['-published_at']
+        indexes = [
+            models.Index(fields=['published_at', 'id'],
+                         name='post_published_at_idx'),
+            models.Index(fields=['likes_count'], name='post_likes_count_idx'),
+            models.Index(fields=['trending_score'],
+                         name='post_trending_score_idx'),
+        ]
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
 
 
+def make_slugs(titles, taken_slugs):
+    """
+    Latin slugs for titles which are not among taken_slugs
+    and differ from each other.
+    """
+    taken_slugs = set(taken_slugs)
+    slugs = {}
+    for title in titles:
+        base = slugify(title.lower().translate(TRANSLITERATION)) or 'tag'
+        slug, number = base, 1
+        while slug in taken_slugs:
+            number += 1
+            slug = f'{base}-{number}'
+        taken_slugs.add(slug)
+        slugs[title] = slug
+    return slugs
+
+
 class TagQuerySet(models.QuerySet):
 
     def popular(self):
-        return self.annotate(tag_posts_count=Count('posts')). \
-            order_by('-tag_posts_count')
+        return self.filter(popularity__isnull=False). \
+            order_by('-popularity__posts_count', 'id')
+
+    def update_posts_count(self):
+        return self.update(posts_count=count_subquery(
+            Post.tags.through.objects.all(), 'tag'))
+
+    def make_slugs(self, titles, reserved_slugs=()):
+        return make_slugs(titles, [*self.values_list('slug', flat=True),
+                                   *reserved_slugs])
 
 
 class Tag(models.Model):
 
     objects = TagQuerySet.as_manager()
     title = models.CharField("Тег", max_length=20, unique=True)
+    slug = models.SlugField("Название в виде url", max_length=100,
+                            unique=True, blank=True)
+    posts_count = models.PositiveIntegerField("Количество постов", default=0,
+                                              editable=False)
 
     def __str__(self):
         return self.title
@@ -72,15 +153,57 @@ class Tag(models.Model):
     def clean(self):
         self.title = self.title.lower()
 
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = Tag.objects.exclude(pk=self.pk). \
+                make_slugs([self.title])[self.title]
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
-        return reverse('tag_filter', args={'tag_title': self.slug})
+        return reverse('tag_filter', kwargs={'tag_slug': self.slug})
 
     class Meta:
         ordering = ["title"]
+        indexes = [
+            models.Index(fields=['posts_count'], name='tag_posts_count_idx'),
+        ]
         verbose_name = 'тег'
         verbose_name_plural = 'теги'
 
 
+class PostTag(models.Model):
+    """
+    Tag of a post with a copy of its publication date, so the posts of
+    a tag are read from newest along one index without sorting them.
+    """
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             verbose_name='Пост')
+    # отдельный индекс по тегу не нужен: tag_id начинает индекс по дате
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, db_index=False,
+                            verbose_name='Тег')
+    # дату переписывает сигнал сохранения поста
+    published_at = models.DateTimeField("Дата и время публикации поста")
+
+    def __str__(self):
+        return f'{self.post_id}: {self.tag_id}'
+
+    def save(self, *args, **kwargs):
+        if self.published_at is None:
+            self.published_at = self.post.published_at
+        super().save(*args, **kwargs)
+
+    class Meta:
+        db_table = 'blog_post_tags'
+        unique_together = [['post', 'tag']]
+        indexes = [
+            models.Index(fields=['tag', 'published_at', 'post'],
+                         name='post_tag_published_at_idx'),
+        ]
+        verbose_name = 'тег поста'
+        verbose_name_plural = 'теги постов'
+
+
 class Comment(models.Model):
 
     post = models.ForeignKey("Post", on_delete=models.CASCADE,
@@ -96,5 +219,93 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['published_at']
+        indexes = [
+            models.Index(fields=['post', 'published_at', 'id'],
+                         name='comment_post_published_idx'),
+            models.Index(fields=['published_at', 'id'],
+                         name='comment_published_at_idx'),
+        ]
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
+
+
+class PopularPost(models.Model):
+    """
+    Top of posts by likes, updated on every like and rebuilt
+    by rebuild_rankings command, so popular() never sorts all posts.
+    """
+
+    post = models.OneToOneField(Post, on_delete=models.CASCADE,
+                                primary_key=True, related_name='popularity',
+                                verbose_name='Пост')
+    likes_count = models.PositiveIntegerField("Количество лайков")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['likes_count'],
+                         name='popular_post_likes_idx'),
+        ]
+        verbose_name = 'популярный пост'
+        verbose_name_plural = 'популярные посты'
+
+
+class PopularTag(models.Model):
+
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE,
+                               primary_key=True, related_name='popularity',
+                               verbose_name='Тег')
+    posts_count = models.PositiveIntegerField("Количество постов")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['posts_count'],
+                         name='popular_tag_posts_idx'),
+        ]
+        verbose_name = 'популярный тег'
+        verbose_name_plural = 'популярные теги'
+
+
+class PostActivity(models.Model):
+    """
+    Likes and comments of a post got during one hour. Trending scores
+    are recomputed from these buckets by refresh_trending command.
+    """
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='activity', verbose_name='Пост')
+    hour = models.DateTimeField("Час")
+    likes = models.IntegerField("Лайки", default=0)
+    comments = models.IntegerField("Комментарии", default=0)
+
+    class Meta:
+        unique_together = [['post', 'hour']]
+        indexes = [
+            models.Index(fields=['hour'], name='post_activity_hour_idx'),
+        ]
+        verbose_name = 'активность поста за час'
+        verbose_name_plural = 'активность постов по часам'
+
+
+class RelatedPost(models.Model):
+    """
+    Precomputed neighbours of a post by shared tags and co-likes, built
+    by build_related_posts command, so the post page reads them
+    with one indexed lookup.
+    """
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='related_posts',
+                             verbose_name='Пост')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE,
+                                related_name='+',
+                                verbose_name='Похожий пост')
+    score = models.FloatField("Похожесть")
+
+    class Meta:
+        unique_together = [['post', 'related']]
+        indexes = [
+            models.Index(fields=['post', 'score', 'related'],
+                         name='related_post_score_idx'),
+        ]
+        verbose_name = 'похожий пост'
+        verbose_name_plural = 'похожие посты'
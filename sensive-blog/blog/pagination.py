@@ -0,0 +1,135 @@
+import base64
+import binascii
+
+from django.core.paginator import Paginator
+from django.db.models import Max, Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+def encode_cursor(published_at, pk):
+    raw = f'{published_at.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        published_at, pk = raw.decode().split('|')
+        published_at = parse_datetime(published_at)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise Http404('Неверный курсор страницы')
+    if published_at is None:
+        raise Http404('Неверный курсор страницы')
+    return published_at, pk
+
+
+def seek(queryset, cursor, descending=True, id_field='id'):
+    """
+    Rows strictly after the cursor in (published_at, id_field) order.
+    Seeking by index works the same for the first and the last page.
+    """
+    order = ('-published_at', f'-{id_field}') if descending else \
+        ('published_at', id_field)
+    queryset = queryset.order_by(*order)
+    if cursor is None:
+        return queryset
+    published_at, pk = decode_cursor(cursor)
+    # лишнее условие на published_at даёт SQLite диапазон по индексу,
+    # одно OR он читает с начала индекса
+    if descending:
+        return queryset.filter(
+            Q(published_at__lt=published_at) |
+            Q(published_at=published_at, **{f'{id_field}__lt': pk}),
+            published_at__lte=published_at)
+    return queryset.filter(
+        Q(published_at__gt=published_at) |
+        Q(published_at=published_at, **{f'{id_field}__gt': pk}),
+        published_at__gte=published_at)
+
+
+def paginate_by_keyset(queryset, cursor=None, page_size=5, descending=True):
+    """
+    Returns (rows, next_cursor). One extra row is fetched instead
+    of COUNT(*) to find out whether the next page exists.
+    Rows may be model instances or values() dicts with published_at and id.
+    """
+    rows = list(seek(queryset, cursor, descending)[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    last_row = rows[-1]
+    if isinstance(last_row, dict):
+        return rows, encode_cursor(last_row['published_at'], last_row['id'])
+    return rows, encode_cursor(last_row.published_at, last_row.id)
+
+
+# дальше страницы без курсора не открываются: OFFSET читает все
+# предыдущие записи индекса, а ссылки сайта всегда несут курсор
+MAX_OFFSET_PAGE = 20
+
+
+def find_page_cursor(queryset, page, page_size=5, descending=True,
+                     id_field='id'):
+    """
+    Cursor of the page by its number for links without cursor,
+    e.g. typed by hand. Walks only (published_at, id) index entries,
+    so pages past MAX_OFFSET_PAGE are not found.
+    """
+    if page <= 1:
+        return None
+    if page > MAX_OFFSET_PAGE:
+        raise Http404('Такой страницы нет')
+    offset = (page - 1) * page_size
+    boundary = seek(queryset, None, descending, id_field). \
+        values_list('published_at', id_field)[offset - 1:offset]
+    boundary = list(boundary)
+    if not boundary:
+        raise Http404('Такой страницы нет')
+    return encode_cursor(*boundary[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists over big tables. The whole table is
+    counted by its largest id, which is one index lookup and may only
+    overestimate it by deleted rows, a filtered list is counted
+    up to max_count rows. A page reaching past the last row makes
+    the count exact, a page past all rows is replaced by the last one.
+    """
+
+    max_count = 10000
+
+    is_estimated = False
+    is_capped = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        if not queryset.query.where:
+            self.is_estimated = True
+            return queryset.aggregate(last_id=Max('pk'))['last_id'] or 0
+        count = queryset[:self.max_count + 1].count()
+        self.is_capped = count > self.max_count
+        return min(count, self.max_count)
+
+    def set_exact_count(self, count):
+        self.count = count
+        self.is_estimated = False
+        # число страниц уже посчитано по оценке
+        self.__dict__.pop('num_pages', None)
+
+    def page(self, number):
+        page = super().page(number)
+        if not self.is_estimated or not self.count or \
+                len(page) == self.per_page:
+            return page
+        if len(page):
+            # строки кончились на этой странице
+            self.set_exact_count(page.start_index() - 1 + len(page))
+            return page
+        # оценку завысили удалённые строки, и до этой страницы их не хватило
+        self.set_exact_count(self.object_list.count())
+        return super().page(self.num_pages)
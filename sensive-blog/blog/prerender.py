@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from blog import views
+from blog.models import Comment, Post, RelatedPost, Tag
+from blog.related import get_related_amount
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+MANIFEST_NAME = '.prerender.json'
+
+PAGE_VIEWS = {
+    'index': views.index,
+    'post_detail': views.post_detail,
+    'tag_filter': views.tag_filter,
+    'contacts': views.contacts,
+}
+
+
+def get_prerender_root():
+    return getattr(settings, 'PRERENDER_ROOT',
+                   os.path.join(settings.BASE_DIR, 'prerendered'))
+
+
+def get_digest(value):
+    dump = json.dumps(value, default=str, sort_keys=True)
+    return hashlib.md5(dump.encode()).hexdigest()
+
+
+def get_file_name(url):
+    """
+    /post/slug -> post/slug.html, / and /contacts/ -> .../index.html,
+    so a web server finds the file by $uri.html or $uri/index.html.
+    """
+    path = url.split('?')[0].strip('/')
+    if not path or url.split('?')[0].endswith('/'):
+        return os.path.join(path, 'index.html')
+    return f'{path}.html'
+
+
+class SiteState:
+    """
+    Everything pages are rendered from, read in a few streaming queries:
+    a digest of every post and tag, of the first comments page of every
+    post, digests of the blocks shared by many pages and the list
+    of pages with the ids each of them shows.
+    """
+
+    def __init__(self):
+        self.posts = {}
+        self.tags = {}
+        self.comments = {}
+        self.blocks = {}
+        self.pages = {}
+
+    def load(self):
+        ordered_posts = self.load_posts()
+        post_tags = self.load_tags()
+        self.load_comments()
+        self.load_blocks()
+        self.add_index_page(ordered_posts, post_tags)
+        self.add_post_pages(ordered_posts, post_tags)
+        self.add_tag_pages(ordered_posts, post_tags)
+        self.add_page('contacts', {}, [], [], [])
+        return self
+
+    def load_posts(self):
+        rows = Post.objects.order_by('-published_at', '-id').values_list(
+            'id', 'slug', 'title', 'text', 'image', 'image_variants',
+            'published_at', 'author__username', 'likes_count',
+            'comments_count')
+        ordered_posts = []
+        for row in rows.iterator():
+            post_id, slug, published_at = row[0], row[1], row[6]
+            self.posts[str(post_id)] = get_digest(row)
+            ordered_posts.append((post_id, slug, published_at))
+        return ordered_posts
+
+    def load_tags(self):
+        for row in Tag.objects.values_list('id', 'slug', 'title',
+                                           'posts_count'):
+            self.tags[str(row[0])] = get_digest(row)
+        post_tags = defaultdict(list)
+        tag_rows = Post.tags.through.objects.order_by(). \
+            values_list('post_id', 'tag_id')
+        for post_id, tag_id in tag_rows.iterator():
+            post_tags[post_id].append(tag_id)
+        return post_tags
+
+    def load_comments(self):
+        """
+        The post page shows its first COMMENTS_PAGE_SIZE comments and
+        a link to the next ones if there is one more.
+        """
+        rows = Comment.objects.order_by('post_id', 'published_at', 'id'). \
+            values_list('post_id', 'id', 'text', 'author__username',
+                        'published_at')
+        post_comments = defaultdict(list)
+        for row in rows.iterator():
+            page_rows = post_comments[row[0]]
+            if len(page_rows) <= views.COMMENTS_PAGE_SIZE:
+                page_rows.append(row[1:])
+        for post_id, page_rows in post_comments.items():
+            self.comments[str(post_id)] = get_digest(page_rows)
+
+    def load_blocks(self):
+        self.blocks['sidebar'] = get_digest(
+            [views.get_sidebar_posts(), views.get_sidebar_tags()])
+        self.blocks['tag_cloud'] = get_digest(views.get_tag_cloud())
+
+    def add_page(self, url_name, kwargs, post_ids, tag_ids, blocks,
+                 has_next=False, comment_post_ids=()):
+        url = reverse(url_name, kwargs=kwargs)
+        self.pages[get_file_name(url)] = {
+            'url': url,
+            'url_name': url_name,
+            'kwargs': kwargs,
+            'posts': [str(post_id) for post_id in post_ids],
+            'tags': sorted({str(tag_id) for tag_id in tag_ids}),
+            'comments': [str(post_id) for post_id in comment_post_ids],
+            'blocks': blocks,
+            'has_next': has_next,
+        }
+
+    def add_list_page(self, url_name, kwargs, posts, post_tags, blocks,
+                      tag_ids=()):
+        """
+        Only the first page of PAGE_SIZE cards: links of the site open
+        the next ones by cursor in the query string, and such requests
+        are left to Django.
+        """
+        page_posts = posts[:views.PAGE_SIZE]
+        self.add_page(
+            url_name, kwargs, [post_id for post_id, _, _ in page_posts],
+            [*tag_ids, *(tag_id for post_id, _, _ in page_posts
+                         for tag_id in post_tags[post_id])],
+            blocks, has_next=len(posts) > views.PAGE_SIZE)
+
+    def add_index_page(self, ordered_posts, post_tags):
+        self.add_list_page('index', {}, ordered_posts, post_tags,
+                           ['sidebar'])
+
+    def add_post_pages(self, ordered_posts, post_tags):
+        related_amount = get_related_amount()
+        related_ids = defaultdict(list)
+        related_rows = RelatedPost.objects. \
+            order_by('post_id', '-score', '-related_id'). \
+            values_list('post_id', 'related_id')
+        for post_id, related_id in related_rows.iterator():
+            if len(related_ids[post_id]) < related_amount:
+                related_ids[post_id].append(related_id)
+        for post_id, slug, _ in ordered_posts:
+            self.add_page('post_detail', {'slug': slug},
+                          [post_id, *related_ids[post_id]],
+                          post_tags[post_id], ['sidebar'],
+                          comment_post_ids=[post_id])
+
+    def add_tag_pages(self, ordered_posts, post_tags):
+        tag_posts = defaultdict(list)
+        for post in ordered_posts:
+            for tag_id in post_tags[post[0]]:
+                if len(tag_posts[tag_id]) <= views.PAGE_SIZE:
+                    tag_posts[tag_id].append(post)
+        for tag_id, slug in Tag.objects.values_list('id', 'slug'):
+            self.add_list_page('tag_filter', {'tag_slug': slug},
+                               tag_posts[tag_id], post_tags,
+                               ['sidebar', 'tag_cloud'], tag_ids=[tag_id])
+
+    def as_manifest(self, pages):
+        return {
+            'posts': self.posts,
+            'tags': self.tags,
+            'comments': self.comments,
+            'blocks': self.blocks,
+            'pages': pages,
+        }
+
+
+def load_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME)) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {'posts': {}, 'tags': {}, 'comments': {}, 'blocks': {},
+                'pages': {}}
+
+
+def save_manifest(root, manifest):
+    path = os.path.join(root, MANIFEST_NAME)
+    with open(f'{path}.tmp', 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(f'{path}.tmp', path)
+
+
+def is_page_changed(root, file_name, page, state, manifest):
+    old_page = manifest['pages'].get(file_name)
+    if old_page != page or \
+            not os.path.exists(os.path.join(root, file_name)):
+        return True
+    return any(
+        manifest.get(kind, {}).get(key) != getattr(state, kind).get(key)
+        for kind in ('posts', 'tags', 'comments', 'blocks')
+        for key in page[kind]
+    )
+
+
+def render_page(root, file_name, page):
+    """
+    Renders the page by its view without middleware, as an anonymous
+    visitor sees it, and writes it in place of the old file.
+    Runs in a worker process.
+    """
+    request = RequestFactory().get(page['url'])
+    request.user = AnonymousUser()
+    request.resolver_match = resolve(request.path_info)
+    try:
+        response = PAGE_VIEWS[page['url_name']](request, **page['kwargs'])
+        if response.status_code != 200:
+            return file_name, f'{page["url"]} ответил {response.status_code}'
+        path = os.path.join(root, file_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.tmp', 'wb') as page_file:
+            page_file.write(response.content)
+        os.replace(f'{path}.tmp', path)
+    except Exception as error:
+        return file_name, error
+    return file_name, None
+
+
+def render_pages(root, pages, workers=None):
+    """
+    Renders {file_name: page} in a process pool.
+    Yields file names with the error if any.
+    """
+    if not pages:
+        return
+    # воркеры открывают свои соединения, а не наследуют родительские
+    connections.close_all()
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(workers) as executor:
+        yield from executor.map(
+            partial(render_page, root), pages, pages.values(),
+            chunksize=max(1, len(pages) // (workers * 4)))
+
+
+def prerender_site(root=None, full=False, workers=None):
+    """
+    Renders pages whose posts, tags, shared blocks or links changed since
+    the last run, removes files of pages that are gone. Returns
+    (rendered file names, errors by file name, removed file names).
+    """
+    root = root or get_prerender_root()
+    os.makedirs(root, exist_ok=True)
+    manifest = load_manifest(root)
+    state = SiteState().load()
+
+    changed_pages = {
+        file_name: page for file_name, page in state.pages.items()
+        if full or is_page_changed(root, file_name, page, state, manifest)
+    }
+    errors = {
+        file_name: error
+        for file_name, error in render_pages(root, changed_pages, workers)
+        if error
+    }
+
+    removed = [file_name for file_name in manifest['pages']
+               if file_name not in state.pages]
+    for file_name in removed:
+        try:
+            os.remove(os.path.join(root, file_name))
+        except FileNotFoundError:
+            pass
+
+    # страницы с ошибкой не попадают в манифест и рендерятся в следующий раз
+    save_manifest(root, state.as_manifest({
+        file_name: page for file_name, page in state.pages.items()
+        if file_name not in errors
+    }))
+    rendered = [file_name for file_name in changed_pages
+                if file_name not in errors]
+    return rendered, errors, removed
@@ -0,0 +1,195 @@
+import atexit
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+MAX_DEPTH = 100
+
+# самый глубокий подходящий кадр стека определяет, на что ушло время
+CATEGORY_MODULES = [
+    ('django.db', 'orm'),
+    ('django.template', 'templates'),
+    ('jinja2', 'templates'),
+    ('marshmallow', 'serialization'),
+]
+SERIALIZATION_PREFIX = 'serialize_'
+CATEGORIES = ['orm', 'templates', 'serialization', 'python']
+
+
+def get_sample_rates():
+    """
+    {url name: fraction of requests to profile} from
+    settings.PROFILE_SAMPLE_RATES, empty by default.
+    """
+    return getattr(settings, 'PROFILE_SAMPLE_RATES', {})
+
+
+def get_interval():
+    return getattr(settings, 'PROFILE_INTERVAL', 0.005)
+
+
+def get_profile_root():
+    return getattr(settings, 'PROFILE_ROOT',
+                   os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def get_frame_name(frame):
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}:{frame.f_code.co_name}'
+
+
+def get_category(frame_names):
+    for frame_name in reversed(frame_names):
+        module, function = frame_name.split(':', 1)
+        if function.startswith(SERIALIZATION_PREFIX) and \
+                module.startswith('blog.'):
+            return 'serialization'
+        for prefix, category in CATEGORY_MODULES:
+            if module == prefix or module.startswith(f'{prefix}.'):
+                return category
+    return 'python'
+
+
+def collapse_stack(frame):
+    """
+    'category;outer frame;...;inner frame', the category goes first,
+    so a flame graph shows time of ORM, templates and serialization
+    as separate towers.
+    """
+    frame_names = []
+    while frame is not None and len(frame_names) < MAX_DEPTH:
+        frame_names.append(get_frame_name(frame))
+        frame = frame.f_back
+    frame_names.reverse()
+    return ';'.join([get_category(frame_names), *frame_names])
+
+
+class Sampler:
+    """
+    One background thread which, while profiled requests run, takes
+    the stacks of their threads every interval. Threads of other
+    requests are not touched, so unprofiled requests cost nothing.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.active = {}
+        self.thread = None
+
+    def start(self, thread_id):
+        with self.lock:
+            self.active[thread_id] = Counter()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True,
+                                               name='blog-profiler')
+                self.thread.start()
+        self.wake.set()
+
+    def stop(self, thread_id):
+        with self.lock:
+            return self.active.pop(thread_id, Counter())
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            time.sleep(get_interval())
+            frames = sys._current_frames()
+            with self.lock:
+                if not self.active:
+                    self.wake.clear()
+                    continue
+                for thread_id, stacks in self.active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse_stack(frame)] += 1
+            del frames
+
+
+class ProfileStore:
+    """
+    Stacks of profiled requests summed by url name in memory and appended
+    to <url name>.folded files once per PROFILE_FLUSH_INTERVAL seconds.
+    Every process appends its own lines, the same stack in several lines
+    is summed by flame graph tools and by profile_hotspots.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stacks = defaultdict(Counter)
+        self.flushed_at = time.monotonic()
+
+    def add(self, url_name, stacks):
+        with self.lock:
+            self.stacks[url_name].update(stacks)
+            flush_interval = getattr(settings, 'PROFILE_FLUSH_INTERVAL', 60)
+            if time.monotonic() - self.flushed_at < flush_interval:
+                return
+            pending, self.stacks = self.stacks, defaultdict(Counter)
+            self.flushed_at = time.monotonic()
+        write_stacks(pending)
+
+    def flush(self):
+        with self.lock:
+            pending, self.stacks = self.stacks, defaultdict(Counter)
+        write_stacks(pending)
+
+
+def get_profile_path(url_name, root=None):
+    return os.path.join(root or get_profile_root(), f'{url_name}.folded')
+
+
+def write_stacks(stacks_by_url_name):
+    if not stacks_by_url_name:
+        return
+    os.makedirs(get_profile_root(), exist_ok=True)
+    for url_name, stacks in stacks_by_url_name.items():
+        lines = ''.join(f'{stack} {amount}\n'
+                        for stack, amount in stacks.items())
+        with open(get_profile_path(url_name), 'a') as profile_file:
+            profile_file.write(lines)
+
+
+def read_stacks(path):
+    stacks = Counter()
+    with open(path) as profile_file:
+        for line in profile_file:
+            stack, _, amount = line.rstrip('\n').rpartition(' ')
+            if stack and amount.isdigit():
+                stacks[stack] += int(amount)
+    return stacks
+
+
+sampler = Sampler()
+profile_store = ProfileStore()
+atexit.register(profile_store.flush)
+
+
+class ProfilingMiddleware:
+    """
+    Samples stacks of a PROFILE_SAMPLE_RATES fraction of requests
+    of every url name. Off while the setting is empty.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        url_name = getattr(request, 'profiled_url_name', None)
+        if url_name is not None:
+            profile_store.add(url_name,
+                              sampler.stop(threading.get_ident()))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        url_name = request.resolver_match.url_name
+        rate = get_sample_rates().get(url_name)
+        if rate and random.random() < rate:
+            request.profiled_url_name = url_name
+            sampler.start(threading.get_ident())
@@ -0,0 +1,87 @@
+from blog.models import Comment, PopularPost, PopularTag, Post, Tag
+from blog.signals import counters_changed
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+
+# модель рейтинга: (модель объектов, поле-ссылка, поле-счётчик)
+RANKINGS = {
+    PopularPost: (Post, 'post', 'likes_count'),
+    PopularTag: (Tag, 'tag', 'posts_count'),
+}
+
+
+def get_ranking_size():
+    """
+    The table keeps more rows than any page shows: members that lost
+    their score stay in it until the next rebuild, so the spare rows
+    keep the shown top exact in between.
+    """
+    return getattr(settings, 'RANKING_SIZE', 50)
+
+
+def rebuild_ranking(ranking_model):
+    model, key_field, score_field = RANKINGS[ranking_model]
+    top = model.objects.order_by(f'-{score_field}', 'id'). \
+        values_list('id', score_field)[:get_ranking_size()]
+    with transaction.atomic():
+        ranking_model.objects.all().delete()
+        ranking_model.objects.bulk_create([
+            ranking_model(**{f'{key_field}_id': pk, score_field: score})
+            for pk, score in top
+        ])
+
+
+def rebuild_rankings():
+    for ranking_model in RANKINGS:
+        rebuild_ranking(ranking_model)
+
+
+def update_ranking(ranking_model, object_ids):
+    """
+    Puts changed objects into the top if they are already there
+    or beat its lowest score, then trims the top to its size.
+    """
+    model, key_field, score_field = RANKINGS[ranking_model]
+    size = get_ranking_size()
+    scores = dict(model.objects.filter(id__in=object_ids).
+                  values_list('id', score_field))
+    if not scores:
+        return
+    with transaction.atomic():
+        ranked = {
+            getattr(row, f'{key_field}_id'): row
+            for row in ranking_model.objects.select_for_update().
+            filter(**{f'{key_field}_id__in': scores})
+        }
+        lowest = list(ranking_model.objects.order_by(score_field).
+                      values_list(score_field, flat=True)[:1])
+        is_full = ranking_model.objects.count() >= size
+
+        changed_rows, new_rows = [], []
+        for pk, score in scores.items():
+            if pk in ranked:
+                setattr(ranked[pk], score_field, score)
+                changed_rows.append(ranked[pk])
+            elif not is_full or not lowest or score > lowest[0]:
+                new_rows.append(
+                    ranking_model(**{f'{key_field}_id': pk,
+                                     score_field: score}))
+        ranking_model.objects.bulk_update(changed_rows, [score_field])
+        ranking_model.objects.bulk_create(new_rows, ignore_conflicts=True)
+
+        if new_rows and is_full:
+            kept_ids = ranking_model.objects.order_by(
+                f'-{score_field}', f'{key_field}_id'). \
+                values_list(f'{key_field}_id', flat=True)[:size]
+            ranking_model.objects.exclude(
+                **{f'{key_field}_id__in': list(kept_ids)}).delete()
+
+
+@receiver(counters_changed)
+def update_rankings(sender, post_ids, tag_ids, **kwargs):
+    # комментарии и привязка тегов не меняют лайки постов
+    if post_ids and not tag_ids and sender is not Comment:
+        update_ranking(PopularPost, post_ids)
+    if tag_ids:
+        update_ranking(PopularTag, tag_ids)
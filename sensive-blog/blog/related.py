@@ -0,0 +1,288 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import chain, islice
+from operator import itemgetter
+
+from blog.models import Post, RelatedPost
+from django.conf import settings
+from django.db import transaction
+
+# столько id в одном IN (...), SQLite ограничивает число параметров
+IDS_CHUNK_SIZE = 900
+
+
+def get_related_amount():
+    return getattr(settings, 'RELATED_POSTS_AMOUNT', 5)
+
+
+def get_max_tag_posts():
+    return getattr(settings, 'RELATED_MAX_TAG_POSTS', 1000)
+
+
+def get_max_user_likes():
+    return getattr(settings, 'RELATED_MAX_USER_LIKES', 1000)
+
+
+def in_chunks(items, chunk_size):
+    items = iter(items)
+    chunk = list(islice(items, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(items, chunk_size))
+
+
+class SimilarityMatrices:
+    """
+    Sparse post × tag and post × user (likes) matrices stored both
+    by rows and by columns as lists of ids. A row of their product
+    with the transposed matrix, shared tags or co-likes of a post with
+    every other post, is then one Counter over the post's columns.
+
+    Columns of tags with too many posts keep only the latest added
+    posts and users who liked too many posts are left out: otherwise
+    a row of the product covers almost the whole blog.
+    """
+
+    def __init__(self):
+        self.post_tags = defaultdict(list)
+        self.tag_posts = defaultdict(list)
+        self.post_likers = defaultdict(list)
+        self.liked_posts = {}
+        self.likes_counts = {}
+
+    def add_tag_cells(self, rows):
+        """
+        Takes (post_id, tag_id) ordered by tag and from the latest post.
+        """
+        max_tag_posts = get_max_tag_posts()
+        for post_id, tag_id in rows:
+            self.post_tags[post_id].append(tag_id)
+            tag_posts = self.tag_posts[tag_id]
+            if len(tag_posts) < max_tag_posts:
+                tag_posts.append(post_id)
+
+    def add_like_cells(self, rows):
+        """
+        Takes (post_id, user_id) ordered by user.
+        """
+        liked_posts = defaultdict(list)
+        for post_id, user_id in rows:
+            self.post_likers[post_id].append(user_id)
+            liked_posts[user_id].append(post_id)
+        max_user_likes = get_max_user_likes()
+        self.liked_posts.update(
+            (user_id, post_ids) for user_id, post_ids in liked_posts.items()
+            if len(post_ids) <= max_user_likes)
+
+    def get_shared_tags(self, post_id):
+        shared_tags = Counter(chain.from_iterable(
+            self.tag_posts[tag_id] for tag_id in self.post_tags[post_id]))
+        shared_tags.pop(post_id, None)
+        return shared_tags
+
+    def get_co_likes(self, post_id):
+        co_likes = Counter(chain.from_iterable(
+            self.liked_posts.get(user_id, ())
+            for user_id in self.post_likers.get(post_id, ())))
+        co_likes.pop(post_id, None)
+        return co_likes
+
+    def get_neighbours(self, post_id, amount):
+        """
+        Top posts by Jaccard similarity of tag sets plus cosine
+        similarity of likers, [(related_id, score)] from the most
+        similar.
+
+        Posts liked by the same users are few and scored first. Then
+        the rest go from the most shared tags: Jaccard of a post sharing
+        k of n tags is at most k / n, so the loop stops as soon as
+        the weakest of the top is no worse than that.
+        """
+        tags_weight = getattr(settings, 'RELATED_TAGS_WEIGHT', 1.0)
+        likes_weight = getattr(settings, 'RELATED_LIKES_WEIGHT', 1.0)
+        tags_amount = len(self.post_tags[post_id])
+        # счётчик лайков мог отстать от таблицы лайков, поэтому не меньше 1
+        likes_amount = max(self.likes_counts.get(post_id, 0), 1)
+        shared_tags = self.get_shared_tags(post_id)
+        co_likes = self.get_co_likes(post_id)
+
+        def get_tags_score(related_id, shared):
+            if not shared:
+                return 0
+            union = tags_amount + len(self.post_tags[related_id]) - shared
+            return tags_weight * shared / union
+
+        top = []
+        for related_id, co_liked in co_likes.items():
+            likes_norm = math.sqrt(
+                likes_amount * max(self.likes_counts.get(related_id, 0), 1))
+            score = get_tags_score(related_id, shared_tags[related_id]) + \
+                likes_weight * co_liked / likes_norm
+            push_neighbour(top, amount, score, related_id)
+
+        for related_id, shared in shared_tags.most_common():
+            if len(top) == amount and \
+                    top[0][0] >= tags_weight * shared / tags_amount:
+                break
+            if related_id not in co_likes:
+                push_neighbour(top, amount,
+                               get_tags_score(related_id, shared), related_id)
+        return [(related_id, score)
+                for score, related_id in sorted(top, reverse=True)]
+
+
+def push_neighbour(top, amount, score, related_id):
+    if len(top) < amount:
+        heapq.heappush(top, (score, related_id))
+    elif (score, related_id) > top[0]:
+        heapq.heapreplace(top, (score, related_id))
+
+
+def load_matrices(chunk_size=5000):
+    """
+    The whole blog: both through tables read once as plain tuples.
+    """
+    matrices = SimilarityMatrices()
+    matrices.add_tag_cells(
+        Post.tags.through.objects.order_by('tag_id', '-post_id').
+        values_list('post_id', 'tag_id').iterator(chunk_size))
+    matrices.add_like_cells(
+        Post.likes.through.objects.order_by('user_id').
+        values_list('post_id', 'user_id').iterator(chunk_size))
+    matrices.likes_counts = {
+        post_id: len(user_ids)
+        for post_id, user_ids in matrices.post_likers.items()
+    }
+    return matrices
+
+
+def load_matrices_for(post_ids):
+    """
+    Only the cells neighbours of post_ids depend on: their tags and
+    likers, the posts sharing them and tags of those posts.
+    """
+    PostTag = Post.tags.through
+    PostLike = Post.likes.through
+    matrices = SimilarityMatrices()
+
+    tag_ids = set(PostTag.objects.filter(post_id__in=post_ids).
+                  values_list('tag_id', flat=True))
+    for tag_id in sorted(tag_ids):
+        matrices.tag_posts[tag_id] = list(
+            PostTag.objects.filter(tag_id=tag_id).order_by('-post_id').
+            values_list('post_id', flat=True)[:get_max_tag_posts()])
+
+    user_ids = set(PostLike.objects.filter(post_id__in=post_ids).
+                   values_list('user_id', flat=True))
+    for chunk in in_chunks(sorted(user_ids), IDS_CHUNK_SIZE):
+        matrices.add_like_cells(
+            PostLike.objects.filter(user_id__in=chunk).order_by('user_id').
+            values_list('post_id', 'user_id'))
+
+    candidate_ids = set(post_ids).union(
+        chain.from_iterable(matrices.tag_posts.values()),
+        chain.from_iterable(matrices.liked_posts.values()))
+    for chunk in in_chunks(sorted(candidate_ids), IDS_CHUNK_SIZE):
+        for post_id, tag_id in PostTag.objects.filter(post_id__in=chunk). \
+                values_list('post_id', 'tag_id'):
+            matrices.post_tags[post_id].append(tag_id)
+        matrices.likes_counts.update(
+            Post.objects.filter(id__in=chunk).order_by().
+            values_list('id', 'likes_count'))
+    return matrices
+
+
+def rebuild_related_posts(chunk_size=5000):
+    """
+    Recomputes neighbours of every post and replaces the whole table.
+    Returns how many posts have related ones.
+    """
+    matrices = load_matrices(chunk_size)
+    amount = get_related_amount()
+    post_ids = sorted(set(matrices.post_tags) | set(matrices.post_likers))
+    rows = (
+        RelatedPost(post_id=post_id, related_id=related_id, score=score)
+        for post_id in post_ids
+        for related_id, score in matrices.get_neighbours(post_id, amount)
+    )
+    with transaction.atomic():
+        RelatedPost.objects.all().delete()
+        for chunk in in_chunks(rows, chunk_size):
+            RelatedPost.objects.bulk_create(chunk)
+    return RelatedPost.objects.values('post_id').distinct().count()
+
+
+def get_stored_neighbours(post_ids):
+    stored = defaultdict(dict)
+    for chunk in in_chunks(sorted(post_ids), IDS_CHUNK_SIZE):
+        for row_id, post_id, related_id, score in RelatedPost.objects. \
+                filter(post_id__in=chunk). \
+                values_list('id', 'post_id', 'related_id', 'score'):
+            stored[post_id][related_id] = (row_id, score)
+    return stored
+
+
+def merge_neighbours(post_id, stored, offered, amount):
+    """
+    Puts offered {related_id: score} into the stored neighbours
+    of the post if they beat its weakest one. Returns ids of rows
+    to delete and rows to create.
+    """
+    scores = {related_id: score
+              for related_id, (_, score) in stored.items()}
+    scores.update(offered)
+    top = dict(heapq.nlargest(amount, scores.items(), key=itemgetter(1, 0)))
+
+    stale_row_ids = [row_id for related_id, (row_id, score) in stored.items()
+                     if top.get(related_id) != score]
+    new_rows = [
+        RelatedPost(post_id=post_id, related_id=related_id, score=score)
+        for related_id, score in top.items()
+        if related_id not in stored or stored[related_id][1] != score
+    ]
+    return stale_row_ids, new_rows
+
+
+def update_related_posts(post_ids):
+    """
+    Computes neighbours of new or changed posts without touching
+    the rest of the table. Similarity is symmetric, so these posts
+    also replace the weakest neighbours of the posts they are close to.
+    """
+    post_ids = set(post_ids)
+    if not post_ids:
+        return
+    matrices = load_matrices_for(post_ids)
+    amount = get_related_amount()
+    neighbours = {post_id: matrices.get_neighbours(post_id, amount)
+                  for post_id in post_ids}
+    offers = defaultdict(dict)
+    for post_id, found in neighbours.items():
+        for related_id, score in found:
+            if related_id not in post_ids:
+                offers[related_id][post_id] = score
+
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=post_ids).delete()
+        new_rows = [
+            RelatedPost(post_id=post_id, related_id=related_id, score=score)
+            for post_id, found in neighbours.items()
+            for related_id, score in found
+        ]
+        stored = get_stored_neighbours(offers)
+        stale_row_ids = []
+        for related_id, offered in sorted(offers.items()):
+            stale, new = merge_neighbours(related_id, stored[related_id],
+                                          offered, amount)
+            stale_row_ids += stale
+            new_rows += new
+        for chunk in in_chunks(stale_row_ids, IDS_CHUNK_SIZE):
+            RelatedPost.objects.filter(id__in=chunk).delete()
+        RelatedPost.objects.bulk_create(new_rows)
+
+
+def get_posts_without_related():
+    return Post.objects.exclude(
+        id__in=RelatedPost.objects.values('post_id')). \
+        order_by('id').values_list('id', flat=True)
@@ -0,0 +1,183 @@
+import re
+
+from blog.models import Post, Tag
+from django.db import connection, connections
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+SEARCH_TABLE = 'blog_post_search'
+MAX_TERMS = 10
+# заголовок весит больше текста при ранжировании bm25
+TITLE_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+SNIPPET_TOKENS = 24
+# служебные символы вместо <mark>, чтобы экранировать текст поста целиком
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+# внешний контент: индекс хранит только токены, текст берётся из blog_post
+SEARCH_TABLE_SQL = f'''
+CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+    title, text, content='blog_post', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+'''
+SEARCH_TRIGGERS_SQL = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert
+    AFTER INSERT ON blog_post BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete
+    AFTER DELETE ON blog_post BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END
+    ''',
+    # счётчики лайков обновляются постоянно, индекс трогают только
+    # изменения заголовка и текста
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update
+    AFTER UPDATE OF title, text ON blog_post BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO {SEARCH_TABLE}(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    ''',
+]
+
+
+def is_search_supported(using_connection=connection):
+    return using_connection.vendor == 'sqlite'
+
+
+def install_search_triggers(using_connection=connection):
+    with using_connection.cursor() as cursor:
+        for sql in SEARCH_TRIGGERS_SQL:
+            cursor.execute(sql)
+
+
+def install_search_index(using_connection=connection):
+    """
+    Creates the FTS5 table with its triggers and indexes existing posts.
+    """
+    if not is_search_supported(using_connection):
+        return
+    with using_connection.cursor() as cursor:
+        cursor.execute(SEARCH_TABLE_SQL)
+    install_search_triggers(using_connection)
+    rebuild_search_index(using_connection)
+
+
+def drop_search_index(using_connection=connection):
+    if not is_search_supported(using_connection):
+        return
+    with using_connection.cursor() as cursor:
+        for suffix in ('insert', 'delete', 'update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{suffix}')
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+def rebuild_search_index(using_connection=connection):
+    with using_connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')")
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    """
+    SQLite rebuilds blog_post on some schema changes and its triggers
+    are dropped with the old table, so they are put back after migrate.
+    """
+    if sender.name != 'blog':
+        return
+    using_connection = connections[using]
+    if not is_search_supported(using_connection):
+        return
+    if SEARCH_TABLE in using_connection.introspection.table_names():
+        install_search_triggers(using_connection)
+
+
+def make_match_query(query):
+    """
+    Words of the query as quoted prefix terms, so user input
+    never breaks the FTS5 syntax and word forms still match.
+    """
+    terms = re.findall(r'\w+', query.lower())[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def highlight(text):
+    return mark_safe(escape(text).
+                     replace(MARK_START, '<mark>').
+                     replace(MARK_END, '</mark>'))
+
+
+def get_tag_filter_sql(tag_titles):
+    """
+    One EXISTS per tag checked on the unique (post, tag) index. With
+    rowid IN (...) instead SQLite drives the search by the tag's posts
+    and runs MATCH for every one of them.
+    """
+    through_table = Post.tags.through._meta.db_table
+    tag_table = Tag._meta.db_table
+    tag_filter = f'''
+        AND EXISTS (
+            SELECT 1 FROM {through_table} AS post_tags
+            INNER JOIN {tag_table} AS tag ON tag.id = post_tags.tag_id
+            WHERE post_tags.post_id = {SEARCH_TABLE}.rowid
+            AND tag.title = %s
+        )
+    '''
+    return tag_filter * len(tag_titles)
+
+
+def search_posts(query, tag_titles=(), page=1, page_size=5):
+    """
+    Posts matching all words of the query and having all given tags,
+    best matches first. Returns found posts of the page with
+    highlighted title and snippet, and whether there is a next page.
+    """
+    match_query = make_match_query(query)
+    if not match_query:
+        return [], False
+    tag_titles = sorted(set(tag_titles))
+
+    sql = f'''
+        SELECT {SEARCH_TABLE}.rowid,
+               bm25({SEARCH_TABLE}, %s, %s) AS rank,
+               highlight({SEARCH_TABLE}, 0, %s, %s),
+               snippet({SEARCH_TABLE}, 1, %s, %s, '…', %s)
+        FROM {SEARCH_TABLE}
+        WHERE {SEARCH_TABLE} MATCH %s
+    '''
+    params = [TITLE_WEIGHT, TEXT_WEIGHT, MARK_START, MARK_END,
+              MARK_START, MARK_END, SNIPPET_TOKENS, match_query]
+    if tag_titles:
+        sql += get_tag_filter_sql(tag_titles)
+        params += tag_titles
+    sql += ' ORDER BY rank LIMIT %s OFFSET %s'
+    params += [page_size + 1, (page - 1) * page_size]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    found = [
+        {
+            'id': post_id,
+            'rank': rank,
+            'title': highlight(title),
+            'snippet': highlight(snippet),
+        }
+        for post_id, rank, title, snippet in rows[:page_size]
+    ]
+    return found, len(rows) > page_size
@@ -0,0 +1,130 @@
+from blog.models import Comment, Post, PostTag, Tag
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import Signal, receiver
+
+# Отправляется после любого изменения лайков, комментариев и тегов постов.
+# Аргументы: post_ids и tag_ids — множества затронутых id.
+counters_changed = Signal()
+
+
+def recount_posts(post_ids, sender=Post):
+    if post_ids:
+        Post.objects.filter(id__in=post_ids).update_counters()
+        counters_changed.send(sender=sender, post_ids=set(post_ids),
+                              tag_ids=set())
+
+
+def recount_tags(tag_ids, post_ids=(), sender=Tag):
+    if tag_ids:
+        Tag.objects.filter(id__in=tag_ids).update_posts_count()
+        counters_changed.send(sender=sender, post_ids=set(post_ids),
+                              tag_ids=set(tag_ids))
+
+
+def get_changed_ids(sender, instance, action, reverse, pk_set, related_name):
+    """
+    Returns (post_ids, related_ids) touched by m2m change of Post field.
+    On clear the pk_set is empty, so cleared ids are remembered on pre_clear.
+    """
+    if action == 'pre_clear':
+        lookup, column = ('post_id', f'{related_name}_id') if not reverse \
+            else (f'{related_name}_id', 'post_id')
+        instance._cleared_ids = set(sender.objects.filter(
+            **{lookup: instance.pk}).values_list(column, flat=True))
+        return set(), set()
+    if action == 'post_clear':
+        changed_ids = getattr(instance, '_cleared_ids', set())
+    elif action in ('post_add', 'post_remove'):
+        changed_ids = set(pk_set or ())
+    else:
+        return set(), set()
+    if reverse:
+        return changed_ids, {instance.pk}
+    return {instance.pk}, changed_ids
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def update_likes_count(sender, instance, action, reverse, pk_set, **kwargs):
+    post_ids, _ = get_changed_ids(sender, instance, action, reverse, pk_set,
+                                  'user')
+    recount_posts(post_ids)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_posts_count(sender, instance, action, reverse, pk_set, **kwargs):
+    post_ids, tag_ids = get_changed_ids(sender, instance, action, reverse,
+                                        pk_set, 'tag')
+    recount_tags(tag_ids, post_ids)
+
+
+@receiver(post_save, sender=Comment)
+def increase_comments_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.objects.filter(id=instance.post_id). \
+            update(comments_count=F('comments_count') + 1)
+        counters_changed.send(sender=Comment, post_ids={instance.post_id},
+                              tag_ids=set())
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_post(sender, instance, raw=False, **kwargs):
+    if instance.pk is None or raw:
+        return
+    instance._previous_post_id = Comment.objects.filter(pk=instance.pk). \
+        values_list('post_id', flat=True).first()
+
+
+@receiver(post_save, sender=Comment)
+def move_comment(sender, instance, created, raw=False, **kwargs):
+    """
+    Comment moved to another post changes counters of both posts.
+    """
+    previous_post_id = getattr(instance, '_previous_post_id', None)
+    if created or raw or previous_post_id in (None, instance.post_id):
+        return
+    recount_posts({previous_post_id, instance.post_id}, sender=Comment)
+
+
+@receiver(post_delete, sender=Comment)
+def decrease_comments_count(sender, instance, **kwargs):
+    Post.objects.filter(id=instance.post_id, comments_count__gt=0). \
+        update(comments_count=F('comments_count') - 1)
+    counters_changed.send(sender=Comment, post_ids={instance.post_id},
+                          tag_ids=set())
+
+
+@receiver(post_save, sender=Post)
+def update_post_tags_date(sender, instance, created, raw=False, **kwargs):
+    # страницы тегов идут по копии даты поста в PostTag
+    if created or raw:
+        return
+    PostTag.objects.filter(post_id=instance.pk). \
+        exclude(published_at=instance.published_at). \
+        update(published_at=instance.published_at)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_tags(sender, instance, **kwargs):
+    # строки through-таблиц удаляются каскадом без m2m_changed
+    instance._deleted_tag_ids = set(
+        instance.tags.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def update_deleted_post_tags(sender, instance, **kwargs):
+    recount_tags(getattr(instance, '_deleted_tag_ids', set()),
+                 {instance.pk}, sender=Post)
+
+
+@receiver(pre_delete, sender=User)
+def remember_liked_posts(sender, instance, **kwargs):
+    instance._liked_post_ids = set(
+        instance.liked_posts.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=User)
+def update_deleted_user_likes(sender, instance, **kwargs):
+    recount_posts(getattr(instance, '_liked_post_ids', set()), sender=User)
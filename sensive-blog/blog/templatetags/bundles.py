@@ -0,0 +1,27 @@
+from blog.assets import AssetStorage, get_bundles
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+register = template.Library()
+
+TAGS = {
+    '.css': '<link rel="stylesheet" href="{}">',
+    '.js': '<script src="{}"></script>',
+}
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    {% bundle 'css/bundle.css' %} gives one tag of the hashed bundle
+    built by collectstatic, or tags of its sources while they are served
+    one by one, as runserver does.
+    """
+    if isinstance(staticfiles_storage, AssetStorage):
+        paths = [name]
+    else:
+        paths = get_bundles()[name]
+    tag = TAGS[name[name.rindex('.'):]]
+    return format_html_join('\n', tag, ((static(path),) for path in paths))
@@ -0,0 +1,11 @@
+from blog import async_views
+from django.urls import path
+from sensive_blog.urls import urlpatterns as site_urlpatterns
+
+urlpatterns = [
+    path('page/<int:page>', async_views.index, name='index'),
+    path('post/<slug:slug>', async_views.post_detail, name='post_detail'),
+    path('tag/<str:tag_slug>', async_views.tag_filter, name='tag_filter'),
+    path('', async_views.index, name='index'),
+    *site_urlpatterns,
+]
@@ -0,0 +1,133 @@
+from unittest import mock
+
+from blog.admin import PostAdmin
+from blog.models import Post
+from blog.pagination import EstimatedCountPaginator
+from blog.tests.utils import TEST_SETTINGS, create_blog
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Max
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+DEFERRED_TEXT_LOAD = 'SELECT "blog_post"."id", "blog_post"."text" FROM'
+
+
+@override_settings(**TEST_SETTINGS)
+class PostAdminTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog(posts=5)
+        cls.admin = User.objects.create_superuser('admin', password='admin')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def get_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in context.captured_queries]
+
+    def test_changelist_does_not_load_text(self):
+        queries = self.get_queries(reverse('admin:blog_post_changelist'))
+        post_queries = [sql for sql in queries if 'FROM "blog_post"' in sql]
+        self.assertTrue(post_queries)
+        for sql in post_queries:
+            self.assertNotIn('"blog_post"."text"', sql)
+
+    def test_change_form_loads_text_with_post(self):
+        post = Post.objects.first()
+        queries = self.get_queries(
+            reverse('admin:blog_post_change', args=[post.id]))
+        self.assertFalse([sql for sql in queries
+                          if sql.startswith(DEFERRED_TEXT_LOAD)])
+
+    def test_change_form_shows_post_tags(self):
+        post = Post.objects.exclude(tags=None).first()
+        response = self.client.get(
+            reverse('admin:blog_post_change', args=[post.id]))
+        self.assertContains(
+            response, 'name="posttag_set-TOTAL_FORMS" value="'
+                      f'{post.tags.count() + 1}"')
+
+
+@override_settings(**TEST_SETTINGS)
+class EstimatedCountTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog(posts=10)
+        cls.admin = User.objects.create_superuser('admin', password='admin')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        patcher = mock.patch.object(PostAdmin, 'list_per_page', 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_changelist(self, query=''):
+        response = self.client.get(
+            reverse('admin:blog_post_changelist') + query)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_whole_table_count_is_estimated(self):
+        Post.objects.filter(id=Post.objects.order_by('id').first().id). \
+            delete()
+        last_id = Post.objects.aggregate(last_id=Max('pk'))['last_id']
+        response = self.client.get(reverse('admin:blog_post_changelist'))
+        self.assertTrue(response.context['cl'].paginator.is_estimated)
+        self.assertEqual(response.context['cl'].result_count, last_id)
+        self.assertContains(response, f'около {last_id} посты')
+
+    def test_page_past_rows_shows_last_page(self):
+        Post.objects.filter(id__in=Post.objects.order_by('id').
+                            values('id')[:4]).delete()
+        # оценка по Max(pk) не меньше 10, строк осталось 6: четвёртой
+        # страницы нет
+        cl = self.get_changelist('?p=4')
+        self.assertFalse(cl.paginator.is_estimated)
+        self.assertEqual(cl.result_count, 6)
+        self.assertEqual(cl.page_num, 2)
+        self.assertEqual(len(cl.result_list), 3)
+
+    def test_short_page_makes_count_exact(self):
+        Post.objects.filter(id__in=Post.objects.order_by('id').
+                            values('id')[:2]).delete()
+        cl = self.get_changelist('?p=3')
+        self.assertFalse(cl.paginator.is_estimated)
+        self.assertEqual(cl.result_count, 8)
+        self.assertEqual(cl.paginator.num_pages, 3)
+
+    def test_filtered_count_is_capped(self):
+        with mock.patch.object(EstimatedCountPaginator, 'max_count', 4):
+            response = self.client.get(
+                reverse('admin:blog_post_changelist') +
+                '?published_at__gte=2000-01-01')
+        cl = response.context['cl']
+        self.assertTrue(cl.paginator.is_capped)
+        self.assertEqual(cl.result_count, 4)
+        self.assertContains(response, 'больше 4 посты')
+
+    def test_filtered_count_is_exact(self):
+        cl = self.get_changelist('?published_at__gte=2000-01-01')
+        self.assertFalse(cl.paginator.is_capped)
+        self.assertEqual(cl.result_count, 10)
+
+    def test_recount_counters_action(self):
+        Post.objects.update(likes_count=0, comments_count=0)
+        post_ids = list(Post.objects.values_list('id', flat=True)[:2])
+        response = self.client.post(
+            reverse('admin:blog_post_changelist'),
+            {'action': 'recount_counters', '_selected_action': post_ids},
+            follow=True)
+        self.assertContains(response, 'Пересчитано постов: 2')
+        for post in Post.objects.filter(id__in=post_ids):
+            self.assertEqual(post.likes_count, post.likes.count())
+            self.assertEqual(post.comments_count,
+                             post.post_comments.count())
+        self.assertFalse(Post.objects.exclude(id__in=post_ids).
+                         exclude(likes_count=0).exists())
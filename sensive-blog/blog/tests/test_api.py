@@ -0,0 +1,112 @@
+from blog.api import MAX_LIMIT
+from blog.models import Comment, Post, Tag
+from blog.tests.utils import LOCMEM_CACHES, TEST_SETTINGS, create_blog
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+@override_settings(**TEST_SETTINGS)
+class ApiTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog(posts=12)
+
+    def walk(self, url):
+        results = []
+        while url:
+            data = self.client.get(url).json()
+            results.extend(data['results'])
+            url = data['next']
+        return results
+
+    def test_posts_cursor_covers_all_posts(self):
+        results = self.walk(reverse('api_posts') + '?limit=5')
+        expected = Post.objects.order_by('-published_at', '-id'). \
+            values_list('slug', flat=True)
+        self.assertEqual([post['slug'] for post in results], list(expected))
+        self.assertNotIn('text', results[0])
+
+    def test_sparse_fields_select_only_their_columns(self):
+        with CaptureQueriesContext(connection) as context:
+            data = self.client.get(
+                reverse('api_posts') + '?fields=title,slug&limit=3').json()
+        self.assertEqual(set(data['results'][0]), {'title', 'slug'})
+        self.assertIn('fields=title%2Cslug', data['next'])
+        sql, = [query['sql'] for query in context.captured_queries]
+        self.assertNotIn('"text"', sql)
+        self.assertNotIn('auth_user', sql)
+
+    def test_unknown_field_and_bad_limit(self):
+        response = self.client.get(reverse('api_posts') + '?fields=secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['error'])
+        response = self.client.get(reverse('api_posts') + '?limit=many')
+        self.assertEqual(response.status_code, 400)
+        data = self.client.get(reverse('api_posts') + '?limit=1000').json()
+        self.assertLessEqual(len(data['results']), MAX_LIMIT)
+
+    def test_post_detail(self):
+        post = Post.objects.exclude(tags=None).first()
+        data = self.client.get(
+            reverse('api_post', kwargs={'slug': post.slug})).json()
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['likes_amount'], post.likes_count)
+        self.assertEqual({tag['slug'] for tag in data['tags']},
+                         set(post.tags.values_list('slug', flat=True)))
+        response = self.client.get(
+            reverse('api_post', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_comments_cursor(self):
+        post = Post.objects.order_by('-comments_count').first()
+        results = self.walk(
+            reverse('api_post_comments', kwargs={'slug': post.slug}) +
+            '?limit=4&fields=text')
+        expected = Comment.objects.filter(post=post). \
+            order_by('published_at', 'id').values_list('text', flat=True)
+        self.assertEqual(results, [{'text': text} for text in expected])
+
+    def test_tags_cursor(self):
+        results = self.walk(reverse('api_tags') + '?limit=4')
+        self.assertEqual(
+            [tag['title'] for tag in results],
+            list(Tag.objects.order_by('title').
+                 values_list('title', flat=True)))
+
+    def test_only_get(self):
+        response = self.client.post(reverse('api_posts'))
+        self.assertEqual(response.status_code, 405)
+
+
+@override_settings(**{**TEST_SETTINGS, 'CACHES': LOCMEM_CACHES})
+class ApiConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog(posts=3)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_not_modified_until_site_changes(self):
+        response = self.client.get(reverse('api_posts'))
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('api_posts'),
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            reverse('api_posts'),
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        post = Post.objects.first()
+        post.title = 'Новый заголовок'
+        post.save()
+        response = self.client.get(reverse('api_posts'),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
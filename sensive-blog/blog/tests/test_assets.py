@@ -0,0 +1,95 @@
+import json
+import os
+from io import StringIO
+from tempfile import TemporaryDirectory
+
+from blog.assets import bundle_css, minify_css, minify_js, rebase_css_urls
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+PRODUCTION_STATIC = {
+    'STATICFILES_STORAGE': 'blog.assets.AssetStorage',
+    'STATICFILES_FINDERS': [
+        'blog.assets.ReferencedFilesFinder',
+        'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    ],
+}
+
+
+class CollectstaticTest(SimpleTestCase):
+
+    def test_collectstatic_with_admin(self):
+        self.assertIn('django.contrib.admin', settings.INSTALLED_APPS)
+        with TemporaryDirectory() as static_root, \
+                override_settings(**PRODUCTION_STATIC,
+                                  STATIC_ROOT=static_root):
+            call_command('collectstatic', interactive=False, clear=True,
+                         stdout=StringIO())
+            with open(os.path.join(static_root, 'staticfiles.json')) as file:
+                paths = json.load(file)['paths']
+            for name in ('admin/css/rtl.css', *settings.STATIC_BUNDLES):
+                with self.subTest(name=name):
+                    self.assertIn(name, paths)
+                    self.assertTrue(os.path.exists(
+                        os.path.join(static_root, paths[name])))
+            self.assertTrue(os.path.exists(os.path.join(
+                static_root, f'{paths["css/bundle.css"]}.gz')))
+
+
+class MinifyTest(SimpleTestCase):
+
+    def test_minify_css(self):
+        css = """
+            /* шапка */
+            .header  >  a ,
+            .header b {
+                color : red;
+                margin: 0 auto;
+            }
+        """
+        self.assertEqual(minify_css(css),
+                         '.header>a,.header b{color : red;margin: 0 auto}')
+
+    def test_minify_css_keeps_strings(self):
+        css = '.a::before { content: "  /* не комментарий */ ; " }'
+        self.assertEqual(minify_css(css),
+                         '.a::before{content: "  /* не комментарий */ ; "}')
+
+    def test_minify_js_keeps_line_breaks(self):
+        js = 'function f() {\n    return 1\n\n}\n    f()\n'
+        self.assertEqual(minify_js(js), 'function f() {\nreturn 1\n}\nf()')
+
+    def test_minify_js_skips_multiline_strings(self):
+        for js in ('var html = `<p>\n    текст\n</p>`\n',
+                   'var text = "строка \\\n    продолжение"\n',
+                   'var text = "строка \\\r\n    продолжение"\r\n'):
+            with self.subTest(js=js):
+                self.assertEqual(minify_js(js), js)
+
+
+class BundleCssTest(SimpleTestCase):
+
+    def test_rebase_relative_urls(self):
+        css = ('a { background: url(../img/bg.png?v=1#top) } '
+               'b { background: url("icons/a.svg") }')
+        self.assertEqual(
+            rebase_css_urls(css, 'theme/css/main.css', 'css/bundle.css'),
+            'a { background: url(../theme/img/bg.png?v=1#top) } '
+            'b { background: url("../theme/css/icons/a.svg") }')
+
+    def test_external_urls_stay(self):
+        css = ('a { background: url(data:image/png;base64,AAA) } '
+               'b { background: url(/static/a.png) } '
+               'c { background: url(\'https://example.com/a.png\') }')
+        self.assertEqual(
+            rebase_css_urls(css, 'theme/css/main.css', 'css/bundle.css'),
+            css)
+
+    def test_bundle_moves_imports_to_top(self):
+        bundle = bundle_css([
+            ('css/a.css', 'a { color: red }'),
+            ('theme/b.css', '@import url(fonts.css);\nb { color: blue }'),
+        ], 'css/bundle.css')
+        self.assertEqual(bundle, '@import url(../theme/fonts.css);'
+                                 'a { color: red }\n\nb { color: blue }')
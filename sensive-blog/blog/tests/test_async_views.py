@@ -0,0 +1,34 @@
+import re
+
+from blog.models import Post, Tag
+from blog.tests.utils import TEST_SETTINGS, create_blog
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+SERVER_TIMING_QUERIES = re.compile(r'"(\d+) queries')
+
+
+@override_settings(**TEST_SETTINGS, QUERY_BUDGET_STRICT=True,
+                   ROOT_URLCONF='blog.tests.async_urls')
+class AsyncViewsQueryStatsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog(posts=10)
+        cls.urls = {
+            'index': reverse('index'),
+            'post_detail': Post.objects.first().get_absolute_url(),
+            'tag_filter': Tag.objects.first().get_absolute_url(),
+        }
+
+    async def test_middleware_counts_queries_of_async_views(self):
+        for url_name, url in self.urls.items():
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                queries_amount = int(SERVER_TIMING_QUERIES.search(
+                    response['Server-Timing']).group(1))
+                self.assertGreater(queries_amount, 0)
+                self.assertLessEqual(queries_amount,
+                                     settings.QUERY_BUDGETS[url_name])
@@ -0,0 +1,32 @@
+from unittest import mock
+
+from blog import cache as blog_cache
+from blog.cache import drop, get_or_build
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+
+class GetOrBuildTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_value_is_built_once(self):
+        build = mock.Mock(return_value=[1])
+        self.assertEqual(get_or_build('test:block', build), [1])
+        self.assertEqual(get_or_build('test:block', build), [1])
+        build.assert_called_once()
+
+    def test_invalidation_during_build_is_not_overwritten(self):
+        def build():
+            drop('test:block')
+            return ['stale']
+
+        self.assertEqual(get_or_build('test:block', build), ['stale'])
+        self.assertIsNone(cache.get('test:block'))
+
+    @mock.patch.object(blog_cache, 'LOCK_TIMEOUT', 0.1)
+    def test_foreign_lock_is_kept_after_waiting(self):
+        cache.add('test:block:lock', True, 10)
+        self.assertEqual(get_or_build('test:block', lambda: [1]), [1])
+        self.assertTrue(cache.get('test:block:lock'))
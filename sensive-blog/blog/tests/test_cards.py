@@ -0,0 +1,45 @@
+from blog.cards import TEASER_LENGTH, load_post_cards, load_queryset_cards
+from blog.models import Post
+from blog.tests.utils import create_blog
+from django.test import TestCase
+
+
+class PostCardsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog(posts=10)
+
+    def test_cards_in_order_of_ids_in_two_queries(self):
+        post_ids = list(Post.objects.order_by('?').
+                        values_list('id', flat=True)[:5])
+        with self.assertNumQueries(2):
+            cards = load_post_cards([*post_ids, 0])
+        self.assertEqual([card['id'] for card in cards], post_ids)
+
+    def test_card_content(self):
+        post = Post.objects.select_related('author').prefetch_related(
+            'tags').exclude(tags=None).first()
+        card, = load_post_cards([post.id])
+        self.assertEqual(card['title'], post.title)
+        self.assertEqual(card['teaser_text'], post.text[:TEASER_LENGTH])
+        self.assertEqual(card['author'], post.author.username)
+        self.assertEqual(card['likes_amount'], post.likes_count)
+        self.assertEqual(card['comments_amount'], post.comments_count)
+        tags = sorted(post.tags.all(), key=lambda tag: tag.title)
+        self.assertEqual([tag['slug'] for tag in card['tags']],
+                         [tag.slug for tag in tags])
+        self.assertEqual(card['first_tag_slug'], tags[0].slug)
+        self.assertEqual(card['tags'][0]['posts_with_tag'],
+                         tags[0].posts_count)
+
+    def test_no_ids_no_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(load_post_cards([]), [])
+
+    def test_queryset_cards_keep_its_order(self):
+        posts = Post.objects.order_by('-likes_count', 'id')[:4]
+        with self.assertNumQueries(2):
+            cards = load_queryset_cards(posts)
+        self.assertEqual([card['id'] for card in cards],
+                         [post.id for post in posts])
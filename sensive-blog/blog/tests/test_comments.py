@@ -0,0 +1,46 @@
+from blog.models import Comment, Post
+from blog.tests.utils import TEST_SETTINGS, create_blog
+from blog.views import COMMENTS_PAGE_SIZE
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+@override_settings(**TEST_SETTINGS)
+class CommentBatchesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog(posts=10)
+        cls.post = Post.objects.order_by('-comments_count').first()
+
+    def test_batches_cover_comments_in_order(self):
+        self.assertGreater(self.post.comments_count, COMMENTS_PAGE_SIZE)
+        url = reverse('post_comments', kwargs={'slug': self.post.slug})
+        texts = []
+        while url:
+            with self.assertNumQueries(1):
+                data = self.client.get(url).json()
+            self.assertLessEqual(len(data['comments']), COMMENTS_PAGE_SIZE)
+            texts.extend(comment['text'] for comment in data['comments'])
+            url = data['next_url']
+        expected = Comment.objects.filter(post=self.post). \
+            order_by('published_at', 'id').values_list('text', flat=True)
+        self.assertEqual(texts, list(expected))
+
+    def test_post_without_comments(self):
+        post = Post.objects.create(
+            title='Без комментариев', text='', slug='no-comments',
+            author=self.post.author, published_at=self.post.published_at)
+        response = self.client.get(
+            reverse('post_comments', kwargs={'slug': post.slug}))
+        self.assertEqual(response.json(),
+                         {'comments': [], 'next_url': None})
+
+    def test_missing_post_and_broken_cursor(self):
+        response = self.client.get(
+            reverse('post_comments', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            reverse('post_comments', kwargs={'slug': self.post.slug}) +
+            '?after=broken')
+        self.assertEqual(response.status_code, 404)
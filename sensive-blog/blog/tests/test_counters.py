@@ -0,0 +1,40 @@
+from blog.models import Comment, Post
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+
+class CommentCountersTest(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create(username='author', is_staff=True)
+        self.first_post, self.second_post = [
+            Post.objects.create(title=title, text='text', slug=title,
+                                published_at=timezone.now(),
+                                author=self.author)
+            for title in ('first', 'second')
+        ]
+
+    def get_comments_counts(self):
+        return [Post.objects.get(pk=post.pk).comments_count
+                for post in (self.first_post, self.second_post)]
+
+    def test_new_comment_is_counted(self):
+        Comment.objects.create(post=self.first_post, author=self.author,
+                               text='text', published_at=timezone.now())
+        self.assertEqual(self.get_comments_counts(), [1, 0])
+
+    def test_moved_comment_is_recounted_on_both_posts(self):
+        comment = Comment.objects.create(
+            post=self.first_post, author=self.author, text='text',
+            published_at=timezone.now())
+        comment.post = self.second_post
+        comment.save()
+        self.assertEqual(self.get_comments_counts(), [0, 1])
+
+    def test_deleted_comment_is_uncounted(self):
+        comment = Comment.objects.create(
+            post=self.first_post, author=self.author, text='text',
+            published_at=timezone.now())
+        comment.delete()
+        self.assertEqual(self.get_comments_counts(), [0, 0])
@@ -0,0 +1,69 @@
+from io import StringIO
+
+from blog.models import Comment, Post
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+
+def generate(prefix, seed):
+    call_command('generate_fake_data', posts=20, users=15, tags=5,
+                 comments=100, likes=150, seed=seed, vocabulary=100,
+                 prefix=prefix, stdout=StringIO())
+
+
+def get_snapshot(prefix):
+    """
+    Generated data without ids, timestamps and the prefix.
+    """
+    posts = Post.objects.filter(slug__startswith=f'{prefix}-post-')
+
+    def strip(value):
+        return value.replace(prefix, '', 1)
+
+    return {
+        'posts': [
+            (strip(post.slug), post.title, post.text, strip(
+                post.author.username), post.likes_count, post.comments_count,
+             sorted(strip(tag.title) for tag in post.tags.all()))
+            for post in posts.select_related('author').
+            prefetch_related('tags').order_by('slug')
+        ],
+        'order': [strip(slug) for slug in posts.order_by(
+            '-published_at', 'slug').values_list('slug', flat=True)],
+        'comments': sorted(
+            (strip(post_slug), strip(username), text)
+            for post_slug, username, text in Comment.objects.filter(
+                post__in=posts).values_list(
+                'post__slug', 'author__username', 'text')),
+        'likes': sorted(
+            (strip(post_slug), strip(username))
+            for post_slug, username in Post.likes.through.objects.filter(
+                post__in=posts).values_list('post__slug', 'user__username')),
+        'staff': sorted(strip(username) for username in User.objects.filter(
+            username__startswith=prefix, is_staff=True).
+            values_list('username', flat=True)),
+    }
+
+
+class GenerateFakeDataTest(TestCase):
+
+    def test_same_seed_same_data(self):
+        generate('first', seed=1)
+        generate('second', seed=1)
+        first = get_snapshot('first')
+        self.assertEqual(len(first['posts']), 20)
+        self.assertEqual(len(first['comments']), 100)
+        self.assertEqual(first, get_snapshot('second'))
+
+    def test_other_seed_other_data(self):
+        generate('first', seed=1)
+        generate('second', seed=2)
+        self.assertNotEqual(get_snapshot('first')['posts'],
+                            get_snapshot('second')['posts'])
+
+    def test_counters_match_rows(self):
+        generate('fake', seed=1)
+        for post in Post.objects.all():
+            self.assertEqual(post.likes_count, post.likes.count())
+            self.assertEqual(post.comments_count, post.post_comments.count())
@@ -0,0 +1,133 @@
+from datetime import datetime, timezone
+
+from blog.models import Post, Tag
+from blog.tests.utils import LOCMEM_CACHES, TEST_SETTINGS
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+def get_month_url(year, month):
+    return reverse('sitemap_posts', kwargs={'year': year, 'month': month})
+
+
+@override_settings(**{**TEST_SETTINGS, 'CACHES': LOCMEM_CACHES})
+class FeedsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.garden = Tag.objects.create(title='сад', slug='sad')
+        cls.kitchen = Tag.objects.create(title='кухня', slug='kukhnya')
+        cls.apples = cls.create_post('apples', 'Яблони', 2024, 1, cls.garden)
+        cls.pears = cls.create_post('pears', 'Груши', 2024, 1, cls.garden)
+        cls.soup = cls.create_post('soup', 'Суп', 2024, 2, cls.kitchen)
+
+    @classmethod
+    def create_post(cls, slug, title, year, month, tag):
+        published_at = datetime(year, month, 10, tzinfo=timezone.utc)
+        post = Post.objects.create(
+            slug=slug, title=title, text=f'Про {title}', author=cls.author,
+            published_at=published_at)
+        post.tags.add(tag, through_defaults={'published_at': published_at})
+        return post
+
+    def setUp(self):
+        cache.clear()
+
+    def assertNotModified(self, url, queries):
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def get_content(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_tag_feeds_list_only_posts_of_tag(self):
+        for url_name in ('tag_rss_feed', 'tag_atom_feed'):
+            with self.subTest(url_name=url_name):
+                content = self.get_content(
+                    reverse(url_name, kwargs={'tag_slug': 'sad'}))
+                self.assertIn('Блог им. Юрия Григорьевича: сад', content)
+                self.assertIn('/post/apples', content)
+                self.assertIn('/post/pears', content)
+                self.assertNotIn('/post/soup', content)
+                self.assertLess(content.index('/post/pears'),
+                                content.index('/post/apples'))
+
+    def test_sitemap_lists_months(self):
+        content = self.get_content(reverse('sitemap'))
+        self.assertIn(get_month_url(2024, 1), content)
+        self.assertIn(get_month_url(2024, 2), content)
+        self.assertIn('<lastmod>2024-02-10T00:00:00+00:00</lastmod>',
+                      content)
+
+    def test_month_sitemap_lists_posts_of_month(self):
+        content = self.get_content(get_month_url(2024, 1))
+        self.assertIn('/post/apples', content)
+        self.assertIn('/post/pears', content)
+        self.assertNotIn('/post/soup', content)
+
+    def test_repeated_requests_are_not_modified(self):
+        # для ETag фиды тега читают сам тег, а месяц — число своих постов
+        for url, queries in (
+                (reverse('rss_feed'), 0), (reverse('sitemap'), 0),
+                (reverse('tag_rss_feed', kwargs={'tag_slug': 'sad'}), 1),
+                (reverse('tag_atom_feed', kwargs={'tag_slug': 'sad'}), 1),
+                (get_month_url(2024, 1), 1)):
+            with self.subTest(url=url):
+                self.assertNotModified(url, queries)
+
+    def test_post_of_other_tag_keeps_tag_feed(self):
+        url = reverse('tag_rss_feed', kwargs={'tag_slug': 'sad'})
+        etag = self.client.get(url)['ETag']
+        self.create_post('borscht', 'Борщ', 2024, 2, self.kitchen)
+        self.soup.title = 'Суп с грибами'
+        self.soup.save()
+        self.assertEqual(self.client.get(url)['ETag'], etag)
+
+        self.create_post('plums', 'Сливы', 2024, 2, self.garden)
+        new_etag = self.client.get(url)['ETag']
+        self.assertNotEqual(new_etag, etag)
+        self.apples.title = 'Яблони весной'
+        self.apples.save()
+        self.assertNotEqual(self.client.get(url)['ETag'], new_etag)
+
+    def test_renamed_tag_changes_tag_feeds(self):
+        url = reverse('tag_atom_feed', kwargs={'tag_slug': 'sad'})
+        etag = self.client.get(url)['ETag']
+        self.kitchen.title = 'кулинария'
+        self.kitchen.save()
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+    def test_post_of_other_month_keeps_month_sitemap(self):
+        url = get_month_url(2024, 1)
+        etag = self.client.get(url)['ETag']
+        self.create_post('borscht', 'Борщ', 2024, 2, self.kitchen)
+        self.soup.slug = 'mushroom-soup'
+        self.soup.save()
+        self.assertEqual(self.client.get(url)['ETag'], etag)
+
+        self.apples.slug = 'apple-trees'
+        self.apples.save()
+        new_etag = self.client.get(url)['ETag']
+        self.assertNotEqual(new_etag, etag)
+        self.pears.delete()
+        self.assertNotEqual(self.client.get(url)['ETag'], new_etag)
+
+    def test_missing_pages_are_not_found(self):
+        for url in (reverse('tag_rss_feed', kwargs={'tag_slug': 'nope'}),
+                    reverse('tag_atom_feed', kwargs={'tag_slug': 'nope'}),
+                    get_month_url(2024, 3),
+                    get_month_url(2024, 13),
+                    get_month_url(2024, 1) + '?page=0',
+                    get_month_url(2024, 1) + '?page=abc',
+                    get_month_url(2024, 1) + '?page=2'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_NONE_MATCH='*').status_code, 404)
@@ -0,0 +1,113 @@
+import io
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+from blog.images import HASHED_NAME, make_variants, serialize_image
+from blog.models import Post
+from blog.tests.utils import TEST_SETTINGS
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image, features
+
+
+def make_image(size, mode='RGB', image_format='PNG'):
+    content = io.BytesIO()
+    Image.new(mode, size, 'red').save(content, image_format)
+    return ContentFile(content.getvalue())
+
+
+class ImageVariantsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings = override_settings(
+            **TEST_SETTINGS, MEDIA_ROOT=cls.media_root,
+            THUMBNAIL_WIDTHS=[320, 640, 1024])
+        cls.settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        shutil.rmtree(cls.media_root)
+        super().tearDownClass()
+
+    def create_post(self, image):
+        post = Post(slug='post', title='Пост', text='Текст',
+                    author=User.objects.create(username='author'),
+                    published_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        post.image.save('photo.png', image, save=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        post.refresh_from_db()
+        return post
+
+    def test_variants_are_built_below_original_width(self):
+        post = self.create_post(make_image((800, 400)))
+        image_variants = post.image_variants
+        self.assertEqual(image_variants['source'], post.image.name)
+        self.assertEqual((image_variants['width'], image_variants['height']),
+                         (800, 400))
+
+        formats = ['jpeg', 'webp'] if features.check('webp') else ['jpeg']
+        variants = image_variants['variants']
+        self.assertEqual(
+            [(variant['width'], variant['height'], variant['format'])
+             for variant in variants],
+            [(width, width // 2, image_format)
+             for width in (320, 640) for image_format in formats])
+        for variant in variants:
+            self.assertRegex(variant['name'], HASHED_NAME)
+            with Image.open(post.image.storage.open(variant['name'])) as image:
+                self.assertEqual(image.width, variant['width'])
+                self.assertEqual(image.format.lower(), variant['format'])
+
+    def test_transparent_image_is_saved_as_png(self):
+        post = self.create_post(make_image((400, 200), 'RGBA'))
+        self.assertEqual(post.image_variants['variants'][0]['format'], 'png')
+
+    def test_same_content_reuses_files(self):
+        first = make_variants(self.create_post(make_image((400, 200))).
+                              image.name)
+        second = make_variants(first['source'])
+        self.assertEqual(first['variants'], second['variants'])
+
+    def test_small_image_has_no_variants(self):
+        post = self.create_post(make_image((200, 100)))
+        self.assertEqual(post.image_variants['variants'], [])
+        self.assertEqual(
+            serialize_image(post.image.name, post.image_variants)
+            ['image_srcset'], '')
+
+    def test_srcset(self):
+        post = self.create_post(make_image((800, 400)))
+        image = serialize_image(post.image.name, post.image_variants)
+        names = {(variant['width'], variant['format']): variant['name']
+                 for variant in post.image_variants['variants']}
+        self.assertEqual(image['image_url'], f'/media/{post.image.name}')
+        self.assertEqual(
+            image['image_srcset'],
+            f'/media/{names[320, "jpeg"]} 320w, '
+            f'/media/{names[640, "jpeg"]} 640w, '
+            f'/media/{post.image.name} 800w')
+        if features.check('webp'):
+            self.assertEqual(
+                image['image_webp_srcset'],
+                f'/media/{names[320, "webp"]} 320w, '
+                f'/media/{names[640, "webp"]} 640w')
+        self.assertEqual((image['image_width'], image['image_height']),
+                         (800, 400))
+
+    def test_stale_variants_are_ignored(self):
+        post = self.create_post(make_image((800, 400)))
+        image = serialize_image('other.png', post.image_variants)
+        self.assertEqual(image['image_url'], '/media/other.png')
+        self.assertEqual(image['image_srcset'], '')
+        self.assertEqual(image['image_webp_srcset'], '')
+        self.assertIsNone(image['image_width'])
+
+    def test_no_image(self):
+        self.assertIsNone(serialize_image('', None)['image_url'])
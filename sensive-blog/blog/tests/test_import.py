@@ -0,0 +1,57 @@
+import json
+from io import StringIO
+from tempfile import NamedTemporaryFile
+
+from blog.models import Post, Tag
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class ImportTagsTest(TestCase):
+
+    def import_rows(self, rows):
+        with NamedTemporaryFile('w', suffix='.jsonl') as dump:
+            dump.writelines(json.dumps(row) + '\n' for row in rows)
+            dump.flush()
+            stderr = StringIO()
+            call_command('import_blog', dump.name, skip_recount=True,
+                         stdout=StringIO(), stderr=stderr)
+        return stderr.getvalue()
+
+    def test_generated_slug_skips_explicit_slug_of_chunk(self):
+        self.import_rows([
+            {'type': 'tag', 'title': 'python'},
+            {'type': 'tag', 'title': 'питон', 'slug': 'python'},
+        ])
+        self.assertEqual(
+            dict(Tag.objects.values_list('title', 'slug')),
+            {'python': 'python-2', 'питон': 'python'})
+
+    def test_tag_with_taken_slug_is_reported(self):
+        Tag.objects.create(title='django', slug='django')
+        stderr = self.import_rows([
+            {'type': 'tag', 'title': 'джанго', 'slug': 'django'},
+            {'type': 'tag', 'title': 'flask', 'slug': 'flask'},
+        ])
+        self.assertIn('джанго', stderr)
+        self.assertNotIn('flask', stderr)
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_posts_of_skipped_tag_are_imported_without_it(self):
+        Tag.objects.create(title='django', slug='django')
+        stderr = self.import_rows([
+            {'type': 'user', 'username': 'author'},
+            {'type': 'tag', 'title': 'джанго', 'slug': 'django'},
+            {'type': 'tag', 'title': 'flask', 'slug': 'flask'},
+            {'type': 'post', 'slug': 'first', 'title': 'Первый',
+             'text': 'текст', 'published_at': '2024-01-01T10:00:00+00:00',
+             'author': 'author', 'tags': ['джанго', 'flask']},
+            {'type': 'post', 'slug': 'second', 'title': 'Второй',
+             'text': 'текст', 'published_at': '2024-01-02T10:00:00+00:00',
+             'author': 'author', 'tags': ['flask']},
+        ])
+        self.assertIn('first: нет тега «джанго»', stderr)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(
+            list(Post.objects.get(slug='first').tags.values_list(
+                'slug', flat=True)), ['flask'])
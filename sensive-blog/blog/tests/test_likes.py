@@ -0,0 +1,103 @@
+from unittest import mock
+
+from blog.likes import LikeBuffer, save_likes
+from blog.models import Post
+from blog.tests.utils import create_blog
+from django.contrib.auth.models import User
+from django.db import IntegrityError, OperationalError
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+PostLike = Post.likes.through
+
+
+class SaveLikesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog(posts=3)
+        cls.post = Post.objects.first()
+        cls.user = User.objects.exclude(
+            id__in=PostLike.objects.filter(post=cls.post).
+            values('user_id')).first()
+
+    def get_likes_count(self):
+        return Post.objects.get(id=self.post.id).likes_count
+
+    def test_like_and_unlike(self):
+        likes_count = self.get_likes_count()
+        deltas = save_likes({(self.post.id, self.user.id): True})
+        self.assertEqual(deltas, {self.post.id: 1})
+        self.assertEqual(self.get_likes_count(), likes_count + 1)
+        save_likes({(self.post.id, self.user.id): False})
+        self.assertEqual(self.get_likes_count(), likes_count)
+
+    def test_like_inserted_by_concurrent_writer_is_counted_once(self):
+        likes_count = self.get_likes_count()
+        bulk_create = PostLike.objects.bulk_create
+
+        def bulk_create_after_concurrent_like(likes, **kwargs):
+            # другой процесс успел записать тот же лайк со своим +1
+            PostLike.objects.create(post=self.post, user=self.user)
+            Post.objects.filter(id=self.post.id). \
+                update(likes_count=F('likes_count') + 1)
+            return bulk_create(likes, **kwargs)
+
+        with mock.patch.object(PostLike.objects, 'bulk_create',
+                               bulk_create_after_concurrent_like):
+            save_likes({(self.post.id, self.user.id): True})
+        self.assertEqual(self.get_likes_count(), likes_count + 1)
+        self.assertEqual(self.get_likes_count(),
+                         PostLike.objects.filter(post=self.post).count())
+
+
+@override_settings(LIKES_FLUSH_INTERVAL=60)
+class LikeBufferTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog(posts=3)
+        cls.user = User.objects.create(username='reader')
+
+    def setUp(self):
+        self.buffer = LikeBuffer()
+        # без фонового потока лайки пишет только flush() теста
+        patcher = mock.patch.object(self.buffer, 'start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_like_of_deleted_post_is_dropped(self):
+        post, deleted_post = Post.objects.all()[:2]
+        self.buffer.add(post.id, self.user.id, True)
+        self.buffer.add(deleted_post.id, self.user.id, True)
+        deleted_post.delete()
+        with self.assertLogs('blog.likes', 'WARNING'):
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(self.buffer.pending, {})
+        self.assertEqual(list(PostLike.objects.filter(user=self.user).
+                              values_list('post_id', flat=True)), [post.id])
+
+    def test_like_of_deleted_user_is_dropped(self):
+        post = Post.objects.first()
+        self.buffer.add(post.id, self.user.id, True)
+        self.user.delete()
+        with self.assertLogs('blog.likes', 'WARNING'):
+            self.buffer.flush()
+        self.assertEqual(self.buffer.pending, {})
+
+    def test_failed_batch_is_not_retried(self):
+        post = Post.objects.first()
+        self.buffer.add(post.id, self.user.id, True)
+        with mock.patch('blog.likes.save_likes', side_effect=IntegrityError), \
+                self.assertLogs('blog.likes', 'ERROR'):
+            self.buffer.flush()
+        self.assertEqual(self.buffer.pending, {})
+
+    def test_busy_database_batch_is_retried(self):
+        post = Post.objects.first()
+        self.buffer.add(post.id, self.user.id, True)
+        with mock.patch('blog.likes.save_likes',
+                        side_effect=OperationalError), \
+                self.assertRaises(OperationalError):
+            self.buffer.flush()
+        self.assertEqual(self.buffer.pending, {(post.id, self.user.id): True})
@@ -0,0 +1,36 @@
+from blog.tests.utils import LOCMEM_CACHES, TEST_SETTINGS, create_blog
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+@override_settings(**{**TEST_SETTINGS, 'CACHES': LOCMEM_CACHES})
+class PageCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog(posts=10)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_page_keys(self):
+        return [key for key in cache._cache if ':blog:page:' in key]
+
+    def test_anonymous_pages_are_shared(self):
+        first = self.client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('index'))
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertIn('Cookie', second['Vary'])
+        self.assertEqual(len(self.get_page_keys()), 1)
+
+    def test_logged_in_users_bypass_page_cache(self):
+        for user in User.objects.all()[:3]:
+            self.client.force_login(user)
+            response = self.client.get(reverse('index'))
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('ETag', response)
+        self.assertEqual(self.get_page_keys(), [])
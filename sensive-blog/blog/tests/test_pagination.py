@@ -0,0 +1,47 @@
+from blog.models import Post
+from blog.pagination import (MAX_OFFSET_PAGE, find_page_cursor,
+                             paginate_by_keyset)
+from blog.tests.utils import TEST_SETTINGS, create_blog
+from django.http import Http404
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+@override_settings(**TEST_SETTINGS)
+class KeysetPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog(posts=MAX_OFFSET_PAGE * 5 + 5)
+
+    def test_cursor_pages_cover_all_posts(self):
+        seen_ids, cursor = [], None
+        while True:
+            rows, cursor = paginate_by_keyset(Post.objects.all(), cursor)
+            seen_ids.extend(post.id for post in rows)
+            if cursor is None:
+                break
+        expected_ids = Post.objects.order_by('-published_at', '-id'). \
+            values_list('id', flat=True)
+        self.assertEqual(seen_ids, list(expected_ids))
+
+    def test_page_number_matches_cursor_chain(self):
+        cursor = None
+        for _ in range(2):
+            _, cursor = paginate_by_keyset(Post.objects.all(), cursor)
+        self.assertEqual(find_page_cursor(Post.objects.all(), 3), cursor)
+
+    def test_deep_page_without_cursor_is_not_found(self):
+        with self.assertRaises(Http404):
+            find_page_cursor(Post.objects.all(), MAX_OFFSET_PAGE + 1)
+        response = self.client.get(
+            reverse('index', kwargs={'page': MAX_OFFSET_PAGE + 1}))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            reverse('index', kwargs={'page': MAX_OFFSET_PAGE}))
+        self.assertEqual(response.status_code, 200)
+
+    def test_broken_cursor_is_not_found(self):
+        response = self.client.get(reverse('index', kwargs={'page': 2}) +
+                                   '?after=broken')
+        self.assertEqual(response.status_code, 404)
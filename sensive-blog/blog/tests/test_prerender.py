@@ -0,0 +1,136 @@
+import os
+import tempfile
+from unittest import mock
+
+from blog.models import Comment, Post, Tag
+from blog.prerender import (SiteState, load_manifest, prerender_site,
+                            render_page)
+from blog.tests.utils import TEST_SETTINGS, create_blog
+from blog.views import (COMMENTS_PAGE_SIZE, PAGE_SIZE, get_sidebar_posts,
+                        get_sidebar_tags)
+from django.db.models import Count
+from django.test import TestCase, override_settings
+
+
+def render_in_process(root, pages, workers=None):
+    # пул процессов не видит тестовую базу в памяти
+    for file_name, page in pages.items():
+        yield render_page(root, file_name, page)
+
+
+@override_settings(**TEST_SETTINGS)
+class SiteStateTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog()
+
+    def test_only_first_list_pages(self):
+        pages = SiteState().load().pages
+        self.assertFalse([file_name for file_name in pages
+                          if file_name.startswith('page/')])
+        self.assertFalse([page['url'] for page in pages.values()
+                          if '?' in page['url']])
+
+    def test_index_page(self):
+        index = SiteState().load().pages['index.html']
+        latest_ids = Post.objects.order_by('-published_at', '-id'). \
+            values_list('id', flat=True)[:PAGE_SIZE]
+        self.assertEqual(index['posts'], [str(pk) for pk in latest_ids])
+        self.assertTrue(index['has_next'])
+
+
+@override_settings(**TEST_SETTINGS)
+class PrerenderSiteTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        patcher = mock.patch('blog.prerender.render_pages',
+                             render_in_process)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        prerender_site(self.root)
+
+    def prerender(self):
+        rendered, errors, removed = prerender_site(self.root)
+        self.assertEqual(errors, {})
+        return set(rendered), removed
+
+    def get_pages_with(self, kind, key):
+        return {file_name for file_name, page in
+                load_manifest(self.root)['pages'].items()
+                if str(key) in page[kind]}
+
+    def test_first_run_renders_every_page(self):
+        pages = load_manifest(self.root)['pages']
+        self.assertEqual(len(pages), Post.objects.count() +
+                         Tag.objects.count() + 2)
+        for file_name in pages:
+            self.assertTrue(os.path.exists(os.path.join(self.root,
+                                                        file_name)))
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.prerender(), (set(), []))
+
+    def test_post_change_renders_pages_showing_it(self):
+        sidebar_ids = {post['id'] for post in get_sidebar_posts()}
+        post = Post.objects.exclude(id__in=sidebar_ids).first()
+        post.title = 'Новый заголовок'
+        post.save()
+        rendered, _ = self.prerender()
+        self.assertIn(f'post/{post.slug}.html', rendered)
+        self.assertEqual(rendered, self.get_pages_with('posts', post.id))
+
+    def test_tag_change_renders_pages_showing_it(self):
+        sidebar_slugs = {tag['slug'] for tag in get_sidebar_tags()}
+        tag = Tag.objects.exclude(slug__in=sidebar_slugs).first()
+        tag.title = 'новый тег'
+        tag.save()
+        rendered, _ = self.prerender()
+        # облако тегов есть на страницах всех тегов
+        tag_pages = {file_name for file_name in
+                     load_manifest(self.root)['pages']
+                     if file_name.startswith('tag/')}
+        self.assertEqual(rendered,
+                         self.get_pages_with('tags', tag.id) | tag_pages)
+
+    def get_commented_post(self):
+        return Post.objects.annotate(amount=Count('post_comments')). \
+            filter(amount__gt=COMMENTS_PAGE_SIZE + 1).first()
+
+    def test_comment_change_renders_its_post_page(self):
+        post = self.get_commented_post()
+        comment = Comment.objects.filter(post=post). \
+            order_by('published_at', 'id').first()
+        comment.text = 'Исправленный комментарий'
+        comment.save()
+        self.assertEqual(self.prerender(), ({f'post/{post.slug}.html'}, []))
+
+    def test_comment_after_first_page_is_ignored(self):
+        post = self.get_commented_post()
+        comment = Comment.objects.filter(post=post). \
+            order_by('published_at', 'id')[COMMENTS_PAGE_SIZE + 1]
+        comment.text = 'Исправленный комментарий'
+        comment.save()
+        self.assertEqual(self.prerender(), (set(), []))
+
+    def test_deleted_post_file_is_removed(self):
+        post = Post.objects.order_by('published_at').first()
+        file_name = f'post/{post.slug}.html'
+        post.delete()
+        rendered, removed = self.prerender()
+        self.assertEqual(removed, [file_name])
+        self.assertNotIn(file_name, rendered)
+        self.assertFalse(os.path.exists(os.path.join(self.root, file_name)))
+        self.assertNotIn(file_name, load_manifest(self.root)['pages'])
+
+    def test_full_renders_every_page(self):
+        rendered, _, _ = prerender_site(self.root, full=True)
+        self.assertEqual(set(rendered),
+                         set(load_manifest(self.root)['pages']))
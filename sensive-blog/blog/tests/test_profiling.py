@@ -0,0 +1,152 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from types import SimpleNamespace
+
+from blog.management.commands.profile_hotspots import get_hotspots
+from blog.profiling import (MAX_DEPTH, ProfileStore, collapse_stack,
+                            get_category, get_profile_path, read_stacks)
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+
+
+def make_frame(*frame_names):
+    """
+    Fake stack of 'module:function' frames, the last one is innermost.
+    """
+    frame = None
+    for frame_name in frame_names:
+        module, function = frame_name.split(':')
+        frame = SimpleNamespace(f_globals={'__name__': module},
+                                f_code=SimpleNamespace(co_name=function),
+                                f_back=frame)
+    return frame
+
+
+class CategoryTest(SimpleTestCase):
+
+    def test_deepest_matching_frame_wins(self):
+        for frame_names, category in (
+                (['blog.views:index', 'django.db.models.query:__iter__'],
+                 'orm'),
+                (['blog.views:index', 'django.template.base:render'],
+                 'templates'),
+                (['blog.views:index', 'jinja2.environment:render'],
+                 'templates'),
+                (['blog.api:post_detail', 'blog.api:serialize_post'],
+                 'serialization'),
+                (['django.template.base:render', 'blog.api:serialize_post',
+                  'django.db.models.query:__iter__'], 'orm'),
+                (['django.db.models.query:__iter__', 'blog.cards:get_tags'],
+                 'orm'),
+                (['blog.views:index', 'blog.cards:get_tags'], 'python')):
+            with self.subTest(frame_names=frame_names):
+                self.assertEqual(get_category(frame_names), category)
+
+    def test_prefixes_match_whole_modules(self):
+        self.assertEqual(get_category(['django.dbx:query']), 'python')
+        self.assertEqual(get_category(['django.db:connection']), 'orm')
+        self.assertEqual(get_category(['json.encoder:serialize_post']),
+                         'python')
+
+
+class CollapseStackTest(SimpleTestCase):
+
+    def test_category_and_frames_from_outer_to_inner(self):
+        frame = make_frame('blog.views:index', 'blog.cards:get_cards',
+                           'django.db.models.query:__iter__')
+        self.assertEqual(collapse_stack(frame),
+                         'orm;blog.views:index;blog.cards:get_cards;'
+                         'django.db.models.query:__iter__')
+
+    def test_deep_stack_is_cut(self):
+        frame = make_frame(*[f'blog.views:f{index}'
+                             for index in range(MAX_DEPTH + 10)])
+        frame_names = collapse_stack(frame).split(';')
+        self.assertEqual(frame_names[0], 'python')
+        self.assertEqual(len(frame_names), MAX_DEPTH + 1)
+        self.assertEqual(frame_names[-1], f'blog.views:f{MAX_DEPTH + 9}')
+
+
+class ProfileStoreTest(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.settings = override_settings(PROFILE_ROOT=self.root,
+                                          PROFILE_FLUSH_INTERVAL=60)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def test_stacks_are_summed_until_flush(self):
+        store = ProfileStore()
+        store.add('index', {'orm;a;b': 2, 'python;a': 1})
+        store.add('index', {'orm;a;b': 3})
+        store.add('post_detail', {'templates;c': 4})
+        self.assertEqual(os.listdir(self.root), [])
+
+        store.flush()
+        self.assertEqual(read_stacks(get_profile_path('index')),
+                         {'orm;a;b': 5, 'python;a': 1})
+        self.assertEqual(read_stacks(get_profile_path('post_detail')),
+                         {'templates;c': 4})
+
+        store.flush()
+        store.add('index', {'orm;a;b': 1})
+        store.flush()
+        self.assertEqual(read_stacks(get_profile_path('index')),
+                         {'orm;a;b': 6, 'python;a': 1})
+
+    @override_settings(PROFILE_FLUSH_INTERVAL=0)
+    def test_add_flushes_after_interval(self):
+        ProfileStore().add('index', {'orm;a': 1})
+        self.assertEqual(read_stacks(get_profile_path('index')), {'orm;a': 1})
+
+    def test_broken_lines_are_skipped(self):
+        path = get_profile_path('index')
+        with open(path, 'w') as profile_file:
+            profile_file.write('orm;a 2\nbroken\npython;b x\norm;a 1\n')
+        self.assertEqual(read_stacks(path), {'orm;a': 3})
+
+
+class ProfileHotspotsTest(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        with open(get_profile_path('index', self.root), 'w') as profile:
+            profile.write('orm;blog.views:index;django.db:execute 6\n'
+                          'templates;blog.views:index;'
+                          'django.template:render 3\n'
+                          'python;blog.views:index 1\n')
+
+    def call_command(self, *args):
+        stdout = StringIO()
+        call_command('profile_hotspots', *args, root=self.root,
+                     stdout=stdout)
+        return stdout.getvalue()
+
+    def test_recursive_frame_is_counted_once(self):
+        self_samples, total_samples = get_hotspots(
+            {'python;a;b;a': 2, 'python;a': 1, 'python': 5})
+        self.assertEqual(self_samples, {'a': 3})
+        self.assertEqual(total_samples, {'a': 3, 'b': 2})
+
+    @override_settings(PROFILE_INTERVAL=0.01)
+    def test_categories_and_hot_functions(self):
+        output = self.call_command('index')
+        self.assertIn('index: 10 сэмплов, ~0.1 с', output)
+        self.assertIn('orm 60%, templates 30%, serialization 0%, '
+                      'python 10%', output)
+        lines = output.splitlines()
+        self.assertEqual(lines[3].split(),
+                         ['60.0%', '60.0%', 'django.db:execute'])
+        self.assertEqual(lines[-1].split(),
+                         ['10.0%', '100.0%', 'blog.views:index'])
+
+    def test_clear_removes_profiles(self):
+        self.call_command('--clear', '--top', '1')
+        self.assertEqual(os.listdir(self.root), [])
+        with self.assertRaises(CommandError):
+            self.call_command()
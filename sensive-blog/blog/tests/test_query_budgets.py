@@ -0,0 +1,78 @@
+from unittest import mock
+
+from blog.likes import like_buffer
+from blog.management.commands.check_query_plans import get_view_urls
+from blog.middleware import QueryBudgetExceeded
+from blog.models import Post
+from blog.tests.utils import TEST_SETTINGS, create_blog
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+
+@override_settings(**TEST_SETTINGS, QUERY_BUDGET_STRICT=True)
+class QueryBudgetsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog()
+
+    def assertWithinBudget(self, url_name, request):
+        budget = settings.QUERY_BUDGETS[url_name]
+        if settings.SESSION_COOKIE_NAME in self.client.cookies:
+            budget += settings.QUERY_BUDGET_SESSION_QUERIES
+        with CaptureQueriesContext(connection) as context:
+            response = request()
+        queries = [query['sql'] for query in context.captured_queries]
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{url_name}: {len(queries)} queries of {budget} allowed:\n' +
+            '\n'.join(queries))
+        self.assertEqual(len(queries), len(set(queries)),
+                         f'{url_name}: duplicate queries')
+        return response
+
+    def test_pages(self):
+        for url in get_view_urls():
+            url_name = resolve(url.split('?')[0]).url_name
+            with self.subTest(url=url):
+                response = self.assertWithinBudget(
+                    url_name, lambda: self.client.get(url))
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Server-Timing', response)
+
+    def test_pages_of_logged_in_user(self):
+        self.client.force_login(User.objects.first())
+        self.test_pages()
+
+    def test_like_and_unlike(self):
+        self.client.force_login(User.objects.first())
+        slug = Post.objects.values_list('slug', flat=True).first()
+        with mock.patch.object(like_buffer, 'add') as add:
+            for url_name in ('like_post', 'unlike_post'):
+                with self.subTest(url_name=url_name):
+                    url = reverse(url_name, kwargs={'slug': slug})
+                    response = self.assertWithinBudget(
+                        url_name, lambda: self.client.post(url))
+                    self.assertEqual(response.status_code, 202)
+        self.assertEqual(add.call_count, 2)
+
+    def test_every_page_has_budget(self):
+        url_names = {resolve(url.split('?')[0]).url_name
+                     for url in get_view_urls()}
+        self.assertEqual(url_names - set(settings.QUERY_BUDGETS), set())
+
+    @override_settings(QUERY_BUDGETS={'index': 1})
+    def test_strict_mode_fails_over_budget(self):
+        with self.assertLogs('django.request', 'ERROR'):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('index'))
+
+    @override_settings(QUERY_BUDGETS={'index': 1}, QUERY_BUDGET_STRICT=False)
+    def test_over_budget_is_logged(self):
+        with self.assertLogs('blog.middleware', 'WARNING'):
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
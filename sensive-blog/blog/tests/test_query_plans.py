@@ -0,0 +1,98 @@
+from blog.management.commands.check_query_plans import (
+    capture_queries, check_url, explain, find_full_scans, get_view_urls)
+from blog.models import Post, PostTag, Tag
+from blog.tests.utils import TEST_SETTINGS, create_blog
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import resolve
+
+
+def get_tables():
+    return set(connection.introspection.table_names())
+
+
+@override_settings(**TEST_SETTINGS)
+class QueryPlansTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog()
+
+    def test_pages_do_not_scan_tables(self):
+        for url in get_view_urls():
+            with self.subTest(url=url):
+                _, failures = check_url(url, get_tables())
+                self.assertEqual(failures, [])
+
+    def test_pages_stay_within_query_budgets(self):
+        for url in get_view_urls():
+            with self.subTest(url=url):
+                queries_amount, _ = check_url(url, get_tables())
+                url_name = resolve(url.split('?')[0]).url_name
+                self.assertLessEqual(queries_amount,
+                                     settings.QUERY_BUDGETS[url_name])
+
+    def test_second_pages_are_checked(self):
+        urls = get_view_urls()
+        self.assertTrue(any(url.startswith('/page/2?after=') for url in urls))
+        self.assertTrue(any(url.startswith('/tag/') and '?after=' in url
+                            for url in urls))
+
+    def test_tag_page_reads_posts_along_tag_index(self):
+        tag = Tag.objects.popular().first()
+        plans = [explain(sql, params) for sql, params in
+                 capture_queries(tag.get_absolute_url())
+                 if '"blog_post_tags"' in sql and ' LIMIT ' in sql]
+        self.assertEqual(len(plans), 1)
+        self.assertTrue(any('post_tag_published_at_idx (tag_id=?)' in line
+                            for line in plans[0]))
+
+    def test_post_tags_follow_post_date(self):
+        post = Post.objects.exclude(tags=None).first()
+        post.published_at = post.published_at.replace(year=2000)
+        post.save()
+        self.assertEqual(
+            set(PostTag.objects.filter(post=post).
+                values_list('published_at', flat=True)),
+            {post.published_at})
+
+    def test_covering_index_scan_is_full_scan(self):
+        scans = find_full_scans('SELECT "slug" FROM "blog_tag"', [],
+                                {'blog_tag'})
+        self.assertEqual(len(scans), 1)
+        self.assertIn('USING COVERING INDEX', scans[0])
+
+    def test_filtered_index_scan_is_full_scan(self):
+        scans = find_full_scans(
+            'SELECT "id" FROM "blog_post" WHERE "text" LIKE %s '
+            'ORDER BY "published_at" DESC, "id" DESC LIMIT 5', ['%день%'],
+            {'blog_post'})
+        self.assertEqual(len(scans), 1)
+
+    def test_top_rows_by_index_are_not_full_scan(self):
+        scans = find_full_scans(
+            'SELECT "id" FROM "blog_post" '
+            'ORDER BY "published_at" DESC, "id" DESC LIMIT 5', [],
+            {'blog_post'})
+        self.assertEqual(scans, [])
+
+
+@override_settings(**TEST_SETTINGS)
+class SmallBlogQueryPlansTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog(posts=3)
+
+    def test_pages_without_second_page(self):
+        urls = get_view_urls()
+        self.assertFalse(any('?after=' in url for url in urls))
+        for url in urls:
+            with self.subTest(url=url):
+                _, failures = check_url(url, get_tables())
+                self.assertEqual(failures, [])
+
+    def test_empty_blog(self):
+        Post.objects.all().delete()
+        self.assertNotIn('?after=', ' '.join(get_view_urls()))
@@ -0,0 +1,67 @@
+from blog.likes import save_likes
+from blog.models import PopularPost, PopularTag, Post, Tag
+from blog.ranking import rebuild_rankings
+from blog.tests.utils import TEST_SETTINGS, create_blog
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+RANKING_SIZE = 5
+
+
+@override_settings(**TEST_SETTINGS, RANKING_SIZE=RANKING_SIZE)
+class RankingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog()
+        rebuild_rankings()
+
+    def get_top_posts(self):
+        return list(Post.objects.order_by('-likes_count', 'id').
+                    values_list('id', 'likes_count')[:RANKING_SIZE])
+
+    def get_ranked_posts(self):
+        return list(PopularPost.objects.order_by('-likes_count', 'post_id').
+                    values_list('post_id', 'likes_count'))
+
+    def test_rebuild_keeps_top_k(self):
+        self.assertEqual(self.get_ranked_posts(), self.get_top_posts())
+        top_tags = list(Tag.objects.order_by('-posts_count', 'id').
+                        values_list('id', flat=True)[:RANKING_SIZE])
+        self.assertEqual(
+            list(Tag.objects.popular().values_list('id', flat=True)),
+            top_tags)
+        self.assertEqual(PopularTag.objects.count(), RANKING_SIZE)
+
+    def test_liked_post_enters_top_and_table_is_trimmed(self):
+        lowest_likes = self.get_ranked_posts()[-1][1]
+        post = Post.objects.exclude(popularity__isnull=False). \
+            order_by('-likes_count').first()
+        likers = User.objects.exclude(
+            id__in=post.likes.values('id'))[:lowest_likes - post.likes_count
+                                             + 1]
+        save_likes({(post.id, user.id): True for user in likers})
+
+        self.assertEqual(PopularPost.objects.count(), RANKING_SIZE)
+        self.assertIn(post.id, dict(self.get_ranked_posts()))
+        self.assertEqual(self.get_ranked_posts(), self.get_top_posts())
+
+    def test_unliked_post_keeps_its_row_until_rebuild(self):
+        post_id, likes_count = self.get_ranked_posts()[0]
+        likers = Post.likes.through.objects.filter(post_id=post_id). \
+            values_list('user_id', flat=True)[:2]
+        save_likes({(post_id, user_id): False for user_id in likers})
+        self.assertEqual(dict(self.get_ranked_posts())[post_id],
+                         likes_count - 2)
+
+    def test_tagging_updates_tag_top(self):
+        tag = Tag.objects.exclude(popularity__isnull=False). \
+            order_by('-posts_count').first()
+        top_count = Tag.objects.popular().first().posts_count
+        posts = Post.objects.exclude(tags=tag)[:top_count - tag.posts_count
+                                               + 1]
+        for post in posts:
+            post.tags.add(tag, through_defaults={
+                'published_at': post.published_at})
+        self.assertEqual(Tag.objects.popular().first(), tag)
+        self.assertEqual(PopularTag.objects.count(), RANKING_SIZE)
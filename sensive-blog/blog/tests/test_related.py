@@ -0,0 +1,128 @@
+from io import StringIO
+
+from blog.models import Post, PostTag, RelatedPost, Tag
+from blog.related import (SimilarityMatrices, merge_neighbours,
+                          rebuild_related_posts)
+from blog.tests.utils import TEST_SETTINGS, create_blog
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+
+def make_matrices(post_tags, likes):
+    """
+    Matrices of {post_id: [tag_id]} and [(post_id, user_id)] likes.
+    """
+    matrices = SimilarityMatrices()
+    matrices.add_tag_cells(sorted(
+        ((post_id, tag_id) for post_id, tag_ids in post_tags.items()
+         for tag_id in tag_ids),
+        key=lambda cell: (cell[1], -cell[0])))
+    matrices.add_like_cells(sorted(likes, key=lambda cell: cell[1]))
+    for post_id, _ in likes:
+        matrices.likes_counts[post_id] = \
+            matrices.likes_counts.get(post_id, 0) + 1
+    return matrices
+
+
+def get_table():
+    return {(post_id, related_id, round(score, 9))
+            for post_id, related_id, score in RelatedPost.objects.
+            values_list('post_id', 'related_id', 'score')}
+
+
+class NeighboursTest(SimpleTestCase):
+
+    post_tags = {1: [10, 11], 2: [10, 11], 3: [10], 4: [12]}
+
+    def test_shared_tags_and_co_likes_are_summed(self):
+        matrices = make_matrices(self.post_tags, [(1, 100), (3, 100)])
+        # 3: один общий тег из двух и один общий лайкнувший, 2: те же теги
+        self.assertEqual(matrices.get_neighbours(1, 3), [(3, 1.5), (2, 1.0)])
+
+    def test_amount_keeps_most_similar(self):
+        matrices = make_matrices(self.post_tags, [])
+        self.assertEqual(matrices.get_neighbours(1, 1), [(2, 1.0)])
+        self.assertEqual(matrices.get_neighbours(4, 3), [])
+
+    @override_settings(RELATED_TAGS_WEIGHT=0.5, RELATED_LIKES_WEIGHT=2)
+    def test_weights(self):
+        matrices = make_matrices(self.post_tags, [(1, 100), (3, 100)])
+        self.assertEqual(matrices.get_neighbours(1, 3),
+                         [(3, 2.25), (2, 0.5)])
+
+    @override_settings(RELATED_MAX_USER_LIKES=1)
+    def test_users_liking_too_many_posts_are_skipped(self):
+        matrices = make_matrices({}, [(1, 100), (3, 100)])
+        self.assertEqual(matrices.get_neighbours(1, 3), [])
+
+    @override_settings(RELATED_MAX_TAG_POSTS=2)
+    def test_crowded_tag_keeps_latest_posts(self):
+        matrices = make_matrices(self.post_tags, [])
+        self.assertEqual(matrices.tag_posts[10], [3, 2])
+
+
+class MergeNeighboursTest(SimpleTestCase):
+
+    def test_offer_replaces_weakest(self):
+        stored = {5: (100, 0.9), 6: (101, 0.2)}
+        stale_row_ids, new_rows = merge_neighbours(1, stored, {7: 0.5}, 2)
+        self.assertEqual(stale_row_ids, [101])
+        self.assertEqual([(row.post_id, row.related_id, row.score)
+                          for row in new_rows], [(1, 7, 0.5)])
+
+    def test_weak_offer_changes_nothing(self):
+        stored = {5: (100, 0.9), 6: (101, 0.2)}
+        self.assertEqual(merge_neighbours(1, stored, {7: 0.1}, 2), ([], []))
+
+    def test_changed_score_rewrites_row(self):
+        stored = {5: (100, 0.9)}
+        stale_row_ids, new_rows = merge_neighbours(1, stored, {5: 0.3}, 2)
+        self.assertEqual(stale_row_ids, [100])
+        self.assertEqual([(row.related_id, row.score) for row in new_rows],
+                         [(5, 0.3)])
+
+
+@override_settings(**TEST_SETTINGS)
+class BuildRelatedPostsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog()
+
+    def build(self, *args):
+        call_command('build_related_posts', *args, stdout=StringIO())
+
+    def get_closest_id(self, post):
+        return RelatedPost.objects.filter(post=post).order_by('-score'). \
+            values_list('related_id', flat=True).first()
+
+    def test_rebuild_stores_neighbours(self):
+        self.assertEqual(rebuild_related_posts(),
+                         Post.objects.exclude(related_posts=None).count())
+        for post_id in Post.objects.values_list('id', flat=True):
+            related = RelatedPost.objects.filter(post_id=post_id)
+            self.assertLessEqual(related.count(), 5)
+            self.assertFalse(related.filter(related_id=post_id).exists())
+
+    def test_new_posts_match_full_rebuild(self):
+        self.build()
+        full_table = get_table()
+        post_ids = list(Post.objects.order_by('id').
+                        values_list('id', flat=True)[:3])
+        RelatedPost.objects.filter(post_id__in=post_ids).delete()
+        self.build('--new', '--batch-size', '2')
+        self.assertEqual(get_table(), full_table)
+
+    def test_new_post_joins_neighbours_of_others(self):
+        self.build()
+        source = Post.objects.exclude(tags=None).exclude(likes=None).first()
+        post = Post.objects.create(
+            title='Новый', text='Текст', slug='new', image='',
+            author=source.author, published_at=source.published_at)
+        # копия поста с теми же тегами и лайками ближе всех к нему
+        for tag in Tag.objects.filter(posts=source):
+            PostTag.objects.create(post=post, tag=tag)
+        post.likes.add(*source.likes.all())
+        self.build('--new')
+        self.assertEqual(self.get_closest_id(post), source.id)
+        self.assertEqual(self.get_closest_id(source), post.id)
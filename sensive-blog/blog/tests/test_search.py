@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+
+from blog.models import Post, Tag
+from blog.search import MARK_END, MARK_START, make_match_query, search_posts
+from blog.tests.utils import TEST_SETTINGS
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+
+def create_post(slug, title, text, author):
+    return Post.objects.create(
+        slug=slug, title=title, text=text, author=author,
+        published_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+
+def get_found_ids(query, tag_titles=()):
+    posts, _ = search_posts(query, tag_titles)
+    return [post['id'] for post in posts]
+
+
+class MatchQueryTest(SimpleTestCase):
+
+    def test_words_become_quoted_prefix_terms(self):
+        self.assertEqual(make_match_query('Кошки и собаки'),
+                         '"кошки"* "и"* "собаки"*')
+
+    def test_fts_syntax_is_dropped(self):
+        self.assertEqual(make_match_query('a" OR title:b* NEAR(c'),
+                         '"a"* "or"* "title"* "b"* "near"* "c"*')
+        self.assertEqual(make_match_query('"*():^-'), '')
+
+    def test_terms_are_limited(self):
+        self.assertEqual(len(make_match_query(' '.join('abcdefghijklmnop')).
+                             split()), 10)
+
+
+@override_settings(**TEST_SETTINGS)
+class SearchIndexTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.post = create_post('garden', 'Сад весной',
+                               'Как посадить яблони', cls.author)
+
+    def test_insert_is_indexed(self):
+        self.assertEqual(get_found_ids('яблони'), [self.post.id])
+        self.assertEqual(get_found_ids('ябл'), [self.post.id])
+
+    def test_update_reindexes_title_and_text(self):
+        self.post.title = 'Огород летом'
+        self.post.text = 'Как вырастить томаты'
+        self.post.save()
+        self.assertEqual(get_found_ids('яблони'), [])
+        self.assertEqual(get_found_ids('сад'), [])
+        self.assertEqual(get_found_ids('огород томаты'), [self.post.id])
+
+    def test_counter_update_keeps_index(self):
+        Post.objects.filter(id=self.post.id).update(likes_count=10)
+        self.assertEqual(get_found_ids('яблони'), [self.post.id])
+
+    def test_delete_is_removed_from_index(self):
+        self.post.delete()
+        self.assertEqual(get_found_ids('яблони'), [])
+
+    def test_title_ranks_higher_and_is_highlighted(self):
+        other = create_post('orchard', 'Яблони', 'Уход за садом', self.author)
+        posts, has_next = search_posts('яблони')
+        self.assertEqual([post['id'] for post in posts],
+                         [other.id, self.post.id])
+        self.assertFalse(has_next)
+        self.assertEqual(posts[0]['title'], '<mark>Яблони</mark>')
+        self.assertNotIn(MARK_START, posts[1]['snippet'])
+        self.assertNotIn(MARK_END, posts[1]['snippet'])
+
+    def test_text_is_escaped(self):
+        create_post('html', '<script>', 'яблони <b>', self.author)
+        posts, _ = search_posts('яблони')
+        self.assertTrue(all('<b>' not in post['snippet'] for post in posts))
+
+    def test_tag_filter(self):
+        tag = Tag.objects.create(title='сад')
+        other = create_post('orchard', 'Яблони', 'Уход', self.author)
+        other.tags.add(tag, through_defaults={
+            'published_at': other.published_at})
+        self.assertEqual(get_found_ids('яблони', ['сад']), [other.id])
+        self.assertEqual(get_found_ids('яблони', ['сад', 'огород']), [])
+
+    def test_search_page(self):
+        response = self.client.get(reverse('search') + '?q=яблони"')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('search') + '?q=*')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,37 @@
+import os
+import tempfile
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+from sensive_blog import settings_production
+
+
+@override_settings(SQLITE_PRAGMAS=settings_production.SQLITE_PRAGMAS)
+class SqlitePragmasTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # WAL не включается у базы в памяти, поэтому нужен файл
+        self.connection = DatabaseWrapper(
+            {**connection.settings_dict,
+             'NAME': os.path.join(directory.name, 'db.sqlite3')},
+            alias='pragmas')
+        self.addCleanup(self.connection.close)
+
+    def get_pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_production_pragmas_apply_to_new_connection(self):
+        self.assertEqual(self.get_pragma('journal_mode'), 'wal')
+        # 1 — NORMAL, 2 — MEMORY
+        self.assertEqual(self.get_pragma('synchronous'), 1)
+        self.assertEqual(self.get_pragma('temp_store'), 2)
+        self.assertEqual(self.get_pragma('cache_size'), -64 * 1024)
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_no_pragmas_keep_defaults(self):
+        self.assertEqual(self.get_pragma('journal_mode'), 'delete')
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from blog.models import Post, PostActivity
+from blog.tests.utils import TEST_SETTINGS, create_blog
+from blog.trending import (compute_trending_scores, get_current_hour,
+                           refresh_trending)
+from django.contrib.auth.models import User
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+
+TRENDING_SETTINGS = {
+    'TRENDING_WINDOW_HOURS': 48,
+    'TRENDING_HALF_LIFE_HOURS': 10,
+    'TRENDING_COMMENT_WEIGHT': 2,
+}
+
+
+@override_settings(**TEST_SETTINGS, **TRENDING_SETTINGS)
+class TrendingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_blog(posts=5)
+        PostActivity.objects.all().delete()
+        cls.first, cls.second = Post.objects.order_by('id')[:2]
+
+    def get_likes_activity(self, post):
+        return PostActivity.objects.filter(post=post). \
+            aggregate(likes=Sum('likes'))['likes'] or 0
+
+    def test_likes_are_tracked(self):
+        users = User.objects.exclude(id__in=self.first.likes.values('id'))
+        liker, stranger = users[:2]
+        self.first.likes.add(liker)
+        self.assertEqual(self.get_likes_activity(self.first), 1)
+        # снятие лайка, которого не было, активность не меняет
+        self.first.likes.remove(liker, stranger)
+        self.assertEqual(self.get_likes_activity(self.first), 0)
+        # со стороны пользователя
+        liker.liked_posts.add(self.first)
+        self.assertEqual(self.get_likes_activity(self.first), 1)
+        liker.liked_posts.remove(self.first, self.second)
+        self.assertEqual(self.get_likes_activity(self.first), 0)
+        self.assertEqual(self.get_likes_activity(self.second), 0)
+
+    def test_decayed_scores(self):
+        now = get_current_hour() + timedelta(minutes=30)
+        hour = get_current_hour()
+        PostActivity.objects.bulk_create([
+            PostActivity(post=self.first, hour=hour, likes=4, comments=1),
+            PostActivity(post=self.first, hour=hour - timedelta(hours=10),
+                         likes=8, comments=0),
+            PostActivity(post=self.second, hour=hour - timedelta(hours=20),
+                         likes=4, comments=0),
+            # за пределами окна
+            PostActivity(post=self.second, hour=hour - timedelta(hours=60),
+                         likes=100, comments=0),
+        ])
+        with self.assertNumQueries(1):
+            scores = compute_trending_scores(now)
+        weight = 0.5 ** (0.5 / 10)
+        self.assertAlmostEqual(scores[self.first.id],
+                               (4 + 2) * weight + 8 * weight / 2)
+        self.assertAlmostEqual(scores[self.second.id], 4 * weight / 4)
+
+    def test_refresh_trending(self):
+        hour = get_current_hour()
+        PostActivity.objects.bulk_create([
+            PostActivity(post=self.first, hour=hour, likes=1, comments=0),
+            PostActivity(post=self.second, hour=hour, likes=5, comments=0),
+            PostActivity(post=self.second, hour=hour - timedelta(hours=60),
+                         likes=1, comments=0),
+        ])
+        self.assertEqual(refresh_trending(), 2)
+        self.assertEqual(list(Post.objects.trending()),
+                         [self.second, self.first])
+        # вёдра старше окна удаляются
+        self.assertEqual(PostActivity.objects.count(), 2)
@@ -0,0 +1,43 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+
+# шаблоны сайта не лежат в репозитории, вьюхам в тестах хватает пустых
+PAGE_TEMPLATES = {
+    name: '{{ post.title }}{% for post in page_posts %}{{ post.title }}'
+          '{% endfor %}{% for post in posts %}{{ post.title }}{% endfor %}'
+    for name in ('index.html', 'post-details.html', 'posts-list.html',
+                 'contacts.html')
+}
+
+TEST_TEMPLATES = [{
+    **settings.TEMPLATES[0],
+    'DIRS': [],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.locmem.Loader', PAGE_TEMPLATES),
+            'django.template.loaders.app_directories.Loader',
+        ],
+    },
+}]
+
+TEST_SETTINGS = {
+    'TEMPLATES': TEST_TEMPLATES,
+    'CACHES': {'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+    'LIKES_FLUSH_INTERVAL': 0,
+    'THUMBNAIL_WORKERS': 0,
+}
+
+
+LOCMEM_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_blog(posts=30):
+    call_command('generate_fake_data', posts=posts, users=40, tags=6,
+                 comments=posts * 10, likes=posts * 20, seed=0,
+                 vocabulary=200, stdout=StringIO())
@@ -0,0 +1,119 @@
+from datetime import timedelta
+
+from blog.cache import invalidate_trending_posts
+from blog.models import Comment, Post, PostActivity
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, FloatField, Sum, Value, When
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+
+def get_current_hour():
+    return timezone.now().replace(minute=0, second=0, microsecond=0)
+
+
+def add_activity(post_ids, likes=0, comments=0):
+    """
+    Adds likes and comments to the current hour bucket of each post,
+    one UPDATE with F() per post and INSERT for the first event of hour.
+    """
+    hour = get_current_hour()
+    for post_id in post_ids:
+        updated = PostActivity.objects.filter(post_id=post_id, hour=hour). \
+            update(likes=F('likes') + likes, comments=F('comments') + comments)
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                PostActivity.objects.create(post_id=post_id, hour=hour,
+                                            likes=likes, comments=comments)
+        except IntegrityError:
+            # ведро этого часа уже создал параллельный запрос
+            PostActivity.objects.filter(post_id=post_id, hour=hour).update(
+                likes=F('likes') + likes, comments=F('comments') + comments)
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def track_likes(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_remove':
+        # в pk_set remove() есть и те, кто этот пост не лайкал
+        lookup, column = ('user_id', 'post_id') if reverse \
+            else ('post_id', 'user_id')
+        instance._removed_like_ids = set(sender.objects.filter(
+            **{lookup: instance.pk, f'{column}__in': pk_set or ()}).
+            values_list(column, flat=True))
+        return
+    if action == 'post_add':
+        changed_ids, sign = pk_set, 1
+    elif action == 'post_remove':
+        changed_ids, sign = getattr(instance, '_removed_like_ids', ()), -1
+    else:
+        return
+    if not changed_ids:
+        return
+    if reverse:
+        add_activity(changed_ids, likes=sign)
+    else:
+        add_activity([instance.pk], likes=sign * len(changed_ids))
+
+
+@receiver(post_save, sender=Comment)
+def track_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add_activity([instance.post_id], comments=1)
+
+
+def get_hour_weights(now, window, half_life):
+    """
+    {hour: weight} for every hour bucket in the window.
+    """
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    weights = {}
+    while hour >= now - timedelta(hours=window):
+        age = max((now - hour).total_seconds() / 3600, 0)
+        weights[hour] = 0.5 ** (age / half_life)
+        hour -= timedelta(hours=1)
+    return weights
+
+
+def compute_trending_scores(now=None):
+    """
+    Sum of likes and weighted comments of every bucket in the window,
+    halved every TRENDING_HALF_LIFE_HOURS, in one aggregate query:
+    the weight of each hour goes to the database as a CASE branch.
+    """
+    now = now or timezone.now()
+    window = getattr(settings, 'TRENDING_WINDOW_HOURS', 72)
+    half_life = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 12)
+    comment_weight = getattr(settings, 'TRENDING_COMMENT_WEIGHT', 2)
+
+    hour_weights = get_hour_weights(now, window, half_life)
+    hour_weight = Case(
+        *(When(hour=hour, then=Value(weight))
+          for hour, weight in hour_weights.items()),
+        default=Value(0.0), output_field=FloatField())
+    scores = PostActivity.objects.filter(
+        hour__gte=now - timedelta(hours=window)).order_by(). \
+        values('post_id').annotate(score=Sum(
+            (F('likes') + F('comments') * comment_weight) * hour_weight,
+            output_field=FloatField())). \
+        filter(score__gt=0).values_list('post_id', 'score')
+    return dict(scores)
+
+
+def refresh_trending(chunk_size=5000):
+    now = timezone.now()
+    window = getattr(settings, 'TRENDING_WINDOW_HOURS', 72)
+    scores = compute_trending_scores(now)
+    with transaction.atomic():
+        Post.objects.filter(trending_score__gt=0).update(trending_score=0)
+        Post.objects.bulk_update(
+            [Post(id=post_id, trending_score=score)
+             for post_id, score in scores.items()],
+            ['trending_score'], batch_size=chunk_size)
+        PostActivity.objects.filter(
+            hour__lt=now - timedelta(hours=window)).delete()
+    invalidate_trending_posts()
+    return len(scores)
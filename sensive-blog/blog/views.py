@@ -1,55 +1,124 @@
-from blog.models import Post, Tag
-from django.db.models import Count
-from django.shortcuts import render, get_object_or_404
+from blog.cache import (POPULAR_POSTS_KEY, POPULAR_TAGS_KEY, TAG_CLOUD_KEY,
+                        TRENDING_POSTS_KEY, get_or_build)
+from blog.cards import (get_card_rows, load_post_cards, load_queryset_cards,
+                        serialize_card_rows)
+from blog.images import HASHED_NAME, serialize_image
+from blog.likes import like_buffer
+from blog.models import Comment, Post, PostTag, RelatedPost, Tag
+from blog.related import get_related_amount
+from blog.pagination import find_page_cursor, paginate_by_keyset, seek
+from blog.search import search_posts
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_POST
+from django.views.static import serve
+
+PAGE_SIZE = 5
+COMMENTS_PAGE_SIZE = 20
 
 
 def get_most_popular_posts():
     """
-    Prefetch and annotate functions so slow and hard for the single request.
-    Good to fetch rational small result first and applying theirs after.
+    Likes and comments amounts are stored in the post row,
+    so the top is read without any GROUP BY joins.
     """
-    popular_posts_ids = [post.id for post in Post.objects.popular()]
-    return Post.objects.filter(id__in=popular_posts_ids). \
-        add_comments_count(). \
-        prefetch_related('author'). \
-        prefetch_with_tags_and_likes(). \
-        order_by('likes_count')
+    return load_queryset_cards(Post.objects.popular())
+
+
+def get_trending_posts():
+    return load_queryset_cards(Post.objects.trending())
+
 
+def get_page_posts(cursor):
+    page_rows, next_cursor = paginate_by_keyset(
+        get_card_rows(Post.objects.all()), cursor, PAGE_SIZE)
+    return serialize_card_rows(page_rows), next_cursor
 
-def get_most_fresh_posts():
+
+def get_tag_posts(tag_slug, cursor=None):
     """
-    Prefetch and annotate functions so slow and hard for the single request.
-    Good to fetch rational small result first and applying theirs after.
+    Posts of the tag from newest, a page per query like on the index.
+    Ids of the page are taken from the (tag, published_at, post) index
+    of PostTag, so the other posts of the tag are neither read nor sorted.
     """
-    fresh_posts_ids = [post.id for post in Post.objects.fresh()]
-    return Post.objects.filter(id__in=fresh_posts_ids). \
-        add_comments_count(). \
-        prefetch_related('author'). \
-        prefetch_with_tags_and_likes()
+    page_post_ids = seek(PostTag.objects.filter(tag__slug=tag_slug), cursor,
+                         id_field='post_id').values('post_id')[:PAGE_SIZE + 1]
+    page_rows, next_cursor = paginate_by_keyset(
+        get_card_rows(Post.objects.filter(id__in=page_post_ids)), None,
+        PAGE_SIZE)
+    return serialize_card_rows(page_rows), next_cursor
+
+
+def get_most_popular_tags():
+    return Tag.objects.popular()[:5]
 
 
-def get_tag_related_posts(tag):
+def get_sidebar_posts():
+    if getattr(settings, 'SIDEBAR_POSTS', 'popular') == 'trending':
+        return get_or_build(TRENDING_POSTS_KEY, get_trending_posts)
+    return get_or_build(POPULAR_POSTS_KEY, get_most_popular_posts)
+
+
+def get_sidebar_tags():
+    return get_or_build(POPULAR_TAGS_KEY, lambda: list(
+        serialize_tags(get_most_popular_tags())))
+
+
+def get_tag_cloud():
     """
-    Prefetch and annotate functions so slow and hard for the single request.
-    Good to fetch rational small result first and applying theirs after.
+    All tags with their stored posts amounts, built once per change.
     """
-    related_posts_ids = [post.id for post in tag.posts.all()[:20]]
-    return Post.objects.filter(id__in=related_posts_ids). \
-        add_comments_count(). \
-        prefetch_related('author'). \
-        prefetch_with_tags_and_likes()
+    return get_or_build(TAG_CLOUD_KEY, lambda: list(
+        serialize_tags(Tag.objects.only('title', 'slug', 'posts_count'))))
 
 
-def get_most_popular_tags():
-    return Tag.objects.popular().order_by('-tag_posts_count')[:5]
+def get_related_posts(slug):
+    """
+    Precomputed neighbours of the post in one query on the index
+    of the related posts table, most similar first.
+    """
+    rows = RelatedPost.objects.filter(post__slug=slug). \
+        order_by('-score', '-related_id'). \
+        values('related__title', 'related__slug', 'related__image',
+               'related__image_variants', 'related__published_at',
+               'related__likes_count', 'related__comments_count')
+    return [
+        {
+            'title': row['related__title'],
+            'slug': row['related__slug'],
+            **serialize_image(row['related__image'],
+                              row['related__image_variants']),
+            'published_at': row['related__published_at'],
+            'likes_amount': row['related__likes_count'],
+            'comments_amount': row['related__comments_count'],
+        }
+        for row in rows[:get_related_amount()]
+    ]
+
+
+def get_comments_page(slug, cursor=None):
+    comments = Comment.objects.filter(post__slug=slug). \
+        values('id', 'text', 'published_at', 'author__username')
+    return paginate_by_keyset(comments, cursor, COMMENTS_PAGE_SIZE,
+                              descending=False)
+
+
+def get_comments_url(slug, cursor):
+    if cursor is None:
+        return None
+    return reverse('post_comments', kwargs={'slug': slug}) + \
+        f'?after={cursor}'
 
 
 def serialize_comments(comments):
     for comment in comments:
         yield {
-            'text': comment.text,
-            'published_at': comment.published_at,
-            'author': comment.author.username,
+            'text': comment['text'],
+            'published_at': comment['published_at'],
+            'author': comment['author__username'],
         }
 
 
@@ -57,83 +126,175 @@ def serialize_tags(tags):
     for tag in tags:
         yield {
             'title': tag.title,
-            'posts_with_tag': tag.tag_posts_count
+            'slug': tag.slug,
+            'posts_with_tag': tag.posts_count
         }
 
 
-def serialize_post(post):
-    return {
-        "title": post.title,
-        "teaser_text": post.text[:200],
-        "author": post.author.username,
-        "comments_amount": post.comments_count,
-        "image_url": post.image.url if post.image else None,
-        "published_at": post.published_at,
-        "slug": post.slug,
-        "tags": post.tags.all(),
-        'first_tag_title': post.tags.first().title,
-        'likes_amount': post.likes_count,
-    }
-
-
-def serialize_post_detail(post, comments):
+def serialize_post_detail(post, comments, comments_next_url=None):
     return {
         "title": post.title,
         "text": post.text,
         "author": post.author.username,
         "comments": list(serialize_comments(comments)),
+        "comments_amount": post.comments_count,
+        "comments_next_url": comments_next_url,
         'likes_amount': post.likes_count,
-        "image_url": post.image.url if post.image else None,
+        **serialize_image(post.image.name, post.image_variants),
         "published_at": post.published_at,
         "slug": post.slug,
-        "tags": post.tags.all(),
+        "tags": list(serialize_tags(post.tags.all())),
     }
 
 
-def index(request):
-    most_popular_posts = get_most_popular_posts()
-    most_fresh_posts = get_most_fresh_posts()
-    most_popular_tags = get_most_popular_tags()
+def get_page_cursor(request, page):
+    return request.GET.get('after') or \
+        find_page_cursor(Post.objects.all(), page, PAGE_SIZE)
+
+
+def get_next_page_url(page, next_cursor):
+    if next_cursor is None:
+        return None
+    return reverse('index', kwargs={'page': page + 1}) + \
+        f'?after={next_cursor}'
+
+
+def index(request, page=1):
+    page_posts, next_cursor = get_page_posts(get_page_cursor(request, page))
+    next_page_url = get_next_page_url(page, next_cursor)
 
     context = {
-        'most_popular_posts': [serialize_post(post) for post in
-                               most_popular_posts],
-        'page_posts': [serialize_post(post) for post in most_fresh_posts][::-1],
-        'popular_tags': list(serialize_tags(most_popular_tags)),
+        'most_popular_posts': get_sidebar_posts(),
+        'page_posts': page_posts,
+        'popular_tags': get_sidebar_tags(),
+        'page': page,
+        'next_page_url': next_page_url,
     }
     return render(request, 'index.html', context)
 
 
 def post_detail(request, slug):
     post = get_object_or_404(Post.objects.select_related('author').
-                             annotate(likes_count=Count('likes')), slug=slug)
-    comments = post.post_comments.prefetch_related('author')
+                             prefetch_tags(), slug=slug)
+    comments, next_cursor = get_comments_page(slug)
 
-    serialized_post = serialize_post_detail(post, comments)
-    most_popular_posts = get_most_popular_posts()
-    most_popular_tags = get_most_popular_tags()
+    serialized_post = serialize_post_detail(
+        post, comments, get_comments_url(slug, next_cursor))
 
     context = {
         'post': serialized_post,
-        'popular_tags': list(serialize_tags(most_popular_tags)),
-        'most_popular_posts': most_popular_posts,
+        'related_posts': get_related_posts(slug),
+        'popular_tags': get_sidebar_tags(),
+        'most_popular_posts': get_sidebar_posts(),
     }
     return render(request, 'post-details.html', context)
 
 
-def tag_filter(request, tag_title):
-    tag = Tag.objects.get(title=tag_title)
-    tag_related_posts = get_tag_related_posts(tag)
+def post_comments(request, slug):
+    comments, next_cursor = get_comments_page(slug, request.GET.get('after'))
+    if not comments and not Post.objects.filter(slug=slug).exists():
+        raise Http404('Такого поста нет')
+    return JsonResponse({
+        'comments': list(serialize_comments(comments)),
+        'next_url': get_comments_url(slug, next_cursor),
+    })
+
+
+def set_like(request, slug, liked):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужно войти'}, status=401)
+    post_id = Post.objects.filter(slug=slug). \
+        values_list('id', flat=True).first()
+    if post_id is None:
+        return JsonResponse({'error': 'Такого поста нет'}, status=404)
+    like_buffer.add(post_id, request.user.pk, liked)
+    # лайк записывается в БД пачкой с другими, поэтому 202
+    return JsonResponse({'liked': liked}, status=202)
+
+
+@require_POST
+def like_post(request, slug):
+    return set_like(request, slug, liked=True)
+
+
+@require_POST
+def unlike_post(request, slug):
+    return set_like(request, slug, liked=False)
+
+
+def get_tag(tag_slug):
+    """
+    Tag by slug or by title, which old links to tag pages contain.
+    """
+    tag = Tag.objects.filter(slug=tag_slug).first() or \
+        Tag.objects.filter(title=tag_slug).first()
+    if tag is None:
+        raise Http404('Такого тега нет')
+    return tag
+
+
+def get_tag_page_url(tag_slug, next_cursor):
+    if next_cursor is None:
+        return None
+    return reverse('tag_filter', kwargs={'tag_slug': tag_slug}) + \
+        f'?after={next_cursor}'
+
 
-    most_popular_tags = get_most_popular_tags()
-    most_popular_posts = get_most_popular_posts()
+def tag_filter(request, tag_slug):
+    tag = get_tag(tag_slug)
+    if tag.slug != tag_slug:
+        return redirect('tag_filter', tag_slug=tag.slug, permanent=True)
+    posts, next_cursor = get_tag_posts(tag_slug, request.GET.get('after'))
 
     context = {
         "tag": tag.title,
-        'popular_tags': list(serialize_tags(most_popular_tags)),
-        'posts': [serialize_post(post) for post in tag_related_posts],
-        'most_popular_posts': [serialize_post(post) for
-                               post in most_popular_posts],
+        'tag_slug': tag.slug,
+        'popular_tags': get_sidebar_tags(),
+        'tag_cloud': get_tag_cloud(),
+        'posts': posts,
+        'most_popular_posts': get_sidebar_posts(),
+        'next_page_url': get_tag_page_url(tag_slug, next_cursor),
+    }
+    return render(request, 'posts-list.html', context)
+
+
+def get_search_results(query, tag_titles, page):
+    found_posts, has_next = search_posts(query, tag_titles, page, PAGE_SIZE)
+    matches = {found['id']: found for found in found_posts}
+    posts = load_post_cards(matches)
+    for post in posts:
+        post['highlighted_title'] = matches[post['id']]['title']
+        post['snippet'] = matches[post['id']]['snippet']
+    return posts, has_next
+
+
+def get_search_page(request):
+    page = request.GET.get('page', '1')
+    if not page.isdigit() or int(page) < 1:
+        raise Http404('Неверный номер страницы')
+    return int(page)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    tag_titles = request.GET.getlist('tag')
+    page = get_search_page(request)
+    posts, has_next = get_search_results(query, tag_titles, page)
+
+    next_page_url = None
+    if has_next:
+        params = request.GET.copy()
+        params['page'] = page + 1
+        next_page_url = f'{reverse("search")}?{params.urlencode()}'
+
+    context = {
+        'query': query,
+        'tags': tag_titles,
+        'posts': posts,
+        'popular_tags': get_sidebar_tags(),
+        'most_popular_posts': get_sidebar_posts(),
+        'page': page,
+        'next_page_url': next_page_url,
     }
     return render(request, 'posts-list.html', context)
 
@@ -142,3 +303,18 @@ def contacts(request):
     # позже здесь будет код для статистики заходов на эту страницу
     # и для записи фидбека
     return render(request, 'contacts.html', {})
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """
+    Uploads for static() in development. Thumbnails have the content hash
+    in their names and never change, so browsers keep them for a year.
+    """
+    response = serve(request, path, document_root, show_indexes)
+    if HASHED_NAME.match(path):
+        patch_cache_control(response, public=True, max_age=365 * 24 * 3600,
+                            immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=getattr(
+            settings, 'MEDIA_CACHE_TIMEOUT', 3600))
+    return response
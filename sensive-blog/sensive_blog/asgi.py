@@ -0,0 +1,18 @@
+"""
+ASGI config for blog project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Pages with sidebar are served by the sync views, async views from
+blog/async_views.py are turned on with ASYNC_VIEWS=true.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "sensive_blog.settings")
+
+application = get_asgi_application()
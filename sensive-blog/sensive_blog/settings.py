@@ -21,16 +21,19 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'debug_toolbar',
-    'blog',
+    'blog.apps.BlogConfig',
 ]
 
 MIDDLEWARE = [
+    'blog.profiling.ProfilingMiddleware',
+    'blog.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'blog.middleware.PageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
@@ -41,7 +44,28 @@ TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
-STATIC_ROOT = ''
+STATIC_ROOT = os.getenv('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+
+# склеиваются при collectstatic с AssetStorage, в шаблонах
+# подключаются тегом {% bundle %}
+STATIC_BUNDLES = {
+    'css/bundle.css': [
+        'vendors/bootstrap/bootstrap.min.css',
+        'vendors/fontawesome/css/all.min.css',
+        'vendors/linericon/style.css',
+        'vendors/owl-carousel/owl.theme.default.min.css',
+        'vendors/owl-carousel/owl.carousel.min.css',
+        'css/style.css',
+    ],
+    'js/bundle.js': [
+        'vendors/jquery/jquery-3.2.1.min.js',
+        'vendors/bootstrap/bootstrap.bundle.min.js',
+        'vendors/owl-carousel/owl.carousel.min.js',
+        'js/jquery.ajaxchimp.min.js',
+        'js/mail-script.js',
+        'js/main.js',
+    ],
+}
 
 TEMPLATES = [
     {
@@ -61,6 +85,13 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'sensive_blog.wsgi.application'
 
+ASGI_APPLICATION = 'sensive_blog.asgi.application'
+
+# Асинхронные вьюхи загружают посты и сайдбар параллельно,
+# sensive_blog/asgi.py включает их по умолчанию
+ASYNC_VIEWS = os.getenv(
+    "ASYNC_VIEWS", "false").lower() in ['yes', '1', 'true']
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -97,8 +128,104 @@ STATIC_URL = '/static/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+MEDIA_CACHE_TIMEOUT = 3600
+# лайки копятся в памяти и пишутся пачками раз в столько секунд
+# или как только их наберётся LIKES_BATCH_SIZE; 0 — писать сразу
+LIKES_FLUSH_INTERVAL = float(os.getenv('LIKES_FLUSH_INTERVAL', 1))
+LIKES_BATCH_SIZE = int(os.getenv('LIKES_BATCH_SIZE', 500))
+# ширины уменьшенных копий картинок постов для srcset
+THUMBNAIL_WIDTHS = [320, 640, 1024]
+# процессов, строящих копии после загрузки; 0 — строить сразу при сохранении
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+
+# куда prerender_site складывает готовые html-страницы
+PRERENDER_ROOT = os.getenv('PRERENDER_ROOT',
+                           os.path.join(BASE_DIR, 'prerendered'))
 
 #for Django Debug Toolbar
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            "CACHE_BACKEND",
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv("CACHE_LOCATION", 'sensive-blog'),
+    }
+}
+
+SIDEBAR_CACHE_TIMEOUT = int(os.getenv("SIDEBAR_CACHE_TIMEOUT", 300))
+
+PAGE_CACHE_TIMEOUT = int(os.getenv("PAGE_CACHE_TIMEOUT", 600))
+
+PAGE_CACHE_URL_NAMES = ['index', 'post_detail', 'post_comments', 'tag_filter',
+                        'contacts']
+
+# Сколько SQL-запросов может сделать вьюха при пустом кеше для анонима
+QUERY_BUDGETS = {
+    'index': 5,
+    'post_detail': 7,
+    'post_comments': 2,
+    'tag_filter': 7,
+    'search': 6,
+    # id поста, сами лайки пишутся в фоне
+    'like_post': 1,
+    'unlike_post': 1,
+    'contacts': 0,
+    'api_posts': 2,
+    'api_post': 2,
+    'api_post_comments': 2,
+    'api_tags': 1,
+    # посты и их теги, для фида тега ещё сам тег
+    'rss_feed': 2,
+    'atom_feed': 2,
+    'tag_rss_feed': 3,
+    'tag_atom_feed': 3,
+    'sitemap': 1,
+    'sitemap_pages': 0,
+    'sitemap_tags': 1,
+    # число и последняя дата постов месяца для ETag, потом сами адреса
+    'sitemap_posts': 2,
+}
+
+# Запросы сессии и пользователя, которые добавляются к бюджету,
+# если у запроса есть кука сессии
+QUERY_BUDGET_SESSION_QUERIES = 2
+
+QUERY_BUDGET_STRICT = os.getenv(
+    "QUERY_BUDGET_STRICT", "false").lower() in ['yes', '1', 'true']
+
+# Доли запросов каждой вьюхи, стеки которых снимает ProfilingMiddleware,
+# например PROFILE_SAMPLE_RATES=post_detail=0.01,index=0.001
+PROFILE_SAMPLE_RATES = {
+    url_name: float(rate)
+    for url_name, rate in (
+        item.split('=') for item in
+        os.getenv("PROFILE_SAMPLE_RATES", "").split(',') if item)
+}
+# как часто снимать стек профилируемого запроса, в секундах
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.005))
+PROFILE_FLUSH_INTERVAL = 60
+PROFILE_ROOT = os.getenv('PROFILE_ROOT', os.path.join(BASE_DIR, 'profiles'))
+
+# Сколько постов и тегов держать в таблицах топов
+RANKING_SIZE = 50
+
+# Какие посты показывать в сайдбаре: popular — по лайкам за всё время,
+# trending — по свежим лайкам и комментариям
+SIDEBAR_POSTS = os.getenv("SIDEBAR_POSTS", 'popular')
+
+TRENDING_WINDOW_HOURS = 72
+TRENDING_HALF_LIFE_HOURS = 12
+TRENDING_COMMENT_WEIGHT = 2
+
+# Похожие посты: сколько показывать и веса похожести по тегам и по лайкам
+RELATED_POSTS_AMOUNT = 5
+RELATED_TAGS_WEIGHT = 1.0
+RELATED_LIKES_WEIGHT = 1.0
+# Теги с большим числом постов и пользователи с большим числом лайков
+# учитываются частично, иначе похожим оказывается почти весь блог
+RELATED_MAX_TAG_POSTS = 1000
+RELATED_MAX_USER_LIKES = 1000
@@ -0,0 +1,59 @@
+"""
+Production profile, selected with
+DJANGO_SETTINGS_MODULE=sensive_blog.settings_production.
+"""
+from sensive_blog.settings import *  # noqa: F401,F403
+
+DEBUG = os.getenv("DEBUG", "false").lower() in ['yes', '1', 'true']
+
+ALLOWED_HOSTS = [host for host in os.getenv("ALLOWED_HOSTS", "").split(',')
+                 if host]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE
+              if not middleware.startswith('debug_toolbar.')]
+
+# шаблоны компилируются один раз на процесс
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [(
+            'django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ],
+        )],
+    },
+}]
+
+# collectstatic собирает только нужные шаблонам файлы темы, сжимает их
+# и даёт им имена с хешем содержимого
+STATICFILES_STORAGE = 'blog.assets.AssetStorage'
+STATICFILES_FINDERS = [
+    'blog.assets.ReferencedFilesFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+]
+
+# соединение живёт между запросами, поэтому PRAGMA выполняются
+# один раз на соединение, а не на каждый запрос
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'CONN_MAX_AGE': int(os.getenv("CONN_MAX_AGE", 600)),
+        'OPTIONS': {'timeout': 20},
+    }
+}
+
+# WAL: читатели не ждут писателя; synchronous=NORMAL в режиме WAL
+# не теряет целостность, только последние транзакции при сбое питания
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    # отрицательное значение — в килобайтах
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
+}
@@ -1,21 +1,49 @@
-from blog import views
+from blog import api, feeds, views
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+# под ASGI страницы с сайдбаром отдают async-версии вьюх
+if settings.ASYNC_VIEWS:
+    from blog import async_views as page_views
+else:
+    page_views = views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('page/<int:page>', views.index, name='index'),
-    path('post/<slug:slug>', views.post_detail, name='post_detail'),
-    path('tag/<slug:tag_title>', views.tag_filter, name='tag_filter'),
+    path('page/<int:page>', page_views.index, name='index'),
+    path('post/<slug:slug>', page_views.post_detail, name='post_detail'),
+    path('post/<slug:slug>/comments', views.post_comments,
+         name='post_comments'),
+    path('post/<slug:slug>/like', views.like_post, name='like_post'),
+    path('post/<slug:slug>/unlike', views.unlike_post, name='unlike_post'),
+    path('tag/<str:tag_slug>', page_views.tag_filter, name='tag_filter'),
+    path('tag/<str:tag_slug>/rss.xml', feeds.tag_rss_feed,
+         name='tag_rss_feed'),
+    path('tag/<str:tag_slug>/atom.xml', feeds.tag_atom_feed,
+         name='tag_atom_feed'),
+    path('rss.xml', feeds.rss_feed, name='rss_feed'),
+    path('atom.xml', feeds.atom_feed, name='atom_feed'),
+    path('sitemap.xml', feeds.sitemap, name='sitemap'),
+    path('sitemap-pages.xml', feeds.sitemap_pages, name='sitemap_pages'),
+    path('sitemap-tags.xml', feeds.sitemap_tags, name='sitemap_tags'),
+    path('sitemap-posts-<int:year>-<int:month>.xml', feeds.sitemap_posts,
+         name='sitemap_posts'),
+    path('search/', views.search, name='search'),
     path('contacts/', views.contacts, name='contacts'),
-    path('', views.index, name='index'),
+    path('api/posts/', api.posts_list, name='api_posts'),
+    path('api/posts/<slug:slug>/', api.post_detail, name='api_post'),
+    path('api/posts/<slug:slug>/comments/', api.post_comments,
+         name='api_post_comments'),
+    path('api/tags/', api.tags_list, name='api_tags'),
+    path('', page_views.index, name='index'),
 ]
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+urlpatterns += static(settings.MEDIA_URL, view=views.serve_media,
+                      document_root=settings.MEDIA_ROOT)
 
 
-if settings.DEBUG:
+if settings.DEBUG and 'debug_toolbar' in settings.INSTALLED_APPS:
     import debug_toolbar
     urlpatterns = [
         path('__debug__/', include(debug_toolbar.urls)),